@@ -0,0 +1,66 @@
+"""
+Throughput of batch email generation.
+
+    python benchmarks/bench_emails.py --leads 10000
+
+Compares the memoized batch generator with the same leads fed one by one through
+email_generator, on a synthetic batch where companies and schools repeat the way
+they do in real search results.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.emails import generate_emails, clean_company_name, company_domain, school_domain, email_local_part  # noqa: E402
+from utils.data_wrangling import email_generator  # noqa: E402
+
+FIRST = ["Jane", "Brian", "Amina", "Kevin", "Faith", "Otieno", "Wanjiru", "Mary", "Peter", "Aisha"]
+LAST = ["Doe", "Kamau", "Mwangi", "Achieng", "Odhiambo", "Njoroge", "Mutua", "Ali", "Hassan", "Kiptoo"]
+COMPANIES = ["Safaricom PLC", "KCB Group", "Equity Bank Ltd", "Andela", "Tesla Motors, Inc.", "Google LLC",
+             "Microsoft Corporation", "Self-Employed", "Company unavailable", "Twiga Foods Limited"]
+SCHOOLS = ["University of Nairobi", "JKUAT", "Strathmore University", "Kenyatta University", "Not available",
+           "Harvard University", "Moi University", "Technical University of Kenya"]
+
+
+def make_leads(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    return [{
+        "name": f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+        "company": rng.choice(COMPANIES),
+        "education": rng.choice(SCHOOLS),
+    } for _ in range(n)]
+
+
+def clear_caches():
+    for fn in (clean_company_name, company_domain, school_domain, email_local_part):
+        fn.cache_clear()
+
+
+def timed(label: str, fn, leads: list, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        clear_caches()
+        started = time.perf_counter()
+        fn(leads)
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<28} {best * 1000:8.1f} ms  {len(leads) / best:12,.0f} leads/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--leads", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    leads = make_leads(args.leads)
+    print(f"{args.leads} leads, best of {args.repeat}")
+    timed("generate_emails (batch)", generate_emails, leads, args.repeat)
+    timed("email_generator (per lead)", lambda batch: [email_generator(lead) for lead in batch], leads, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -56,4 +56,28 @@ YOU ARE ONLY REQUIRED TO RETURN JSON OUTPUT IN THE FOLLOWING FORMAT:
 }}
 ] 
 ENSURE THE OUTPUT IS VALID JSON.
-DO NOT RETURN ANYTHING ELSE OTHER THAN THE JSON OUTPUT.""")
\ No newline at end of file
+DO NOT RETURN ANYTHING ELSE OTHER THAN THE JSON OUTPUT.""")
+
+batch_score_prompt = ChatPromptTemplate.from_template(
+    """You are a lead scoring agent. Your task is to analyze EACH of the provided leads and assign it a lead score based on the following criteria:
+    Compare the keywords and filter parameters with the lead information.
+    Assign only an integer score from 1 to 10, where 1 indicates a low-quality lead and 10 indicates a high-quality lead.
+    Consider factors such as relevance to the specified keywords, timeliness, completeness of information, and alignment with the filter parameters.
+    Score every lead independently. Do not compare the leads against each other.
+    keywords and filters(Can also include a brief summary of the lead generated): {keywords}
+    You are to be very critical and strict in your scoring. Really analyze the leads as per technology human resource sourcing standards. Not all leads should get high scores.
+
+    ### LEADS
+    {leads}
+
+    ### JSON FORMAT
+    Return a JSON array with exactly one object per lead, using the lead's URL exactly as provided as its linkedin_url:
+    [
+    {{
+        "linkedin_url": "https://www.linkedin.com/in/...",
+        "score": 7
+    }}
+    ]
+    ENSURE THE OUTPUT IS VALID JSON.
+    DO NOT RETURN ANYTHING ELSE OTHER THAN THE JSON OUTPUT."""
+)
@@ -1,21 +1,317 @@
+import asyncio
 import logging
+import os
 import re
-from typing import Optional, List
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Awaitable, Callable, Optional, List, Tuple
 
 from models.schemas import GeneralProfile
-from utils.llm_client import platform_detection, calculate_score 
-from utils.apify import apify_search, apify_lead_presentation, enrich_profiles
-from utils.data_wrangling import email_generator, export
-from utils.caching import get_cached_results, save_to_cache
+from utils.llm_client import platform_detection, llm_priority, track_cascade
+from utils.apify import apify_search, apify_lead_presentation, enrich_profiles, item_url_key
+from utils.serper import serper_client
+from utils.relevance import local_scores, top_k_indexes
+from utils.caching import (generate_cache_key, get_cached_results_async, get_cached_json_async, peek_cached_results_async,
+                           save_to_cache_async, get_cached_profiles_async, save_profiles_async)
+from utils.dedup import DedupIndex, SearchDedup, DEDUP_SEED_PAGES, count_duplicates, track_duplicates
+from validators.linkedin import normalize_linkedin_url
+from core.scoring import ScoringStage, LLM_SCORE_MODES, prepare_lead, build_general_profile
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_ENRICHMENT_QUEUE_SIZE = 16
+ENRICHMENT_QUEUE_SIZE = int(os.getenv("ENRICHMENT_QUEUE_SIZE", DEFAULT_ENRICHMENT_QUEUE_SIZE))
+DEFAULT_PREFETCH_MAX_IN_FLIGHT = 2  # background next-page runs per process
+PREFETCH_MAX_IN_FLIGHT = int(os.getenv("PREFETCH_MAX_IN_FLIGHT", DEFAULT_PREFETCH_MAX_IN_FLIGHT))
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() in ("1", "true", "yes")
+
+DEFAULT_SEARCH_PAGE_SIZE = 5  # leads per result page
+DEFAULT_SEARCH_WINDOW_SIZE = 0  # profiles fetched per Apify run and sliced into pages, 0 fetches page by page
+DEFAULT_APIFY_SEARCH_PAGE_SIZE = 25  # results per LinkedIn search page, what the actor's startPage counts in
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", DEFAULT_SEARCH_PAGE_SIZE))
+SEARCH_WINDOW_SIZE = int(os.getenv("SEARCH_WINDOW_SIZE", DEFAULT_SEARCH_WINDOW_SIZE))
+APIFY_SEARCH_PAGE_SIZE = int(os.getenv("APIFY_SEARCH_PAGE_SIZE", DEFAULT_APIFY_SEARCH_PAGE_SIZE))
+DEFAULT_WINDOW_PAGES_KEPT = 256  # fetched window pages kept unscored when the prefetch budget is used up
+WINDOW_PAGES_KEPT = int(os.getenv("WINDOW_PAGES_KEPT", DEFAULT_WINDOW_PAGES_KEPT))
+
+DEFAULT_DISCOVER_SERPER_PAGES = 3  # Google result pages discovered per result page
+DEFAULT_DISCOVER_ENRICH_TOP_N = 10  # best discovered candidates sent to the Apify scraper
+DISCOVER_SERPER_PAGES = int(os.getenv("DISCOVER_SERPER_PAGES", DEFAULT_DISCOVER_SERPER_PAGES))
+DISCOVER_ENRICH_TOP_N = int(os.getenv("DISCOVER_ENRICH_TOP_N", DEFAULT_DISCOVER_ENRICH_TOP_N))
+UNIVERSAL_STANDARD = ["Professional", "Credible", "Complete Profile", "Seniority"]
+_END = object()  # end-of-stream marker passed between enrichment stages
+
 def link_validation(link: str) -> bool:
     pattern = r"^https?://([a-z0-9-]+\.)?linkedin\.com/"
     return bool(re.match(pattern, link, re.IGNORECASE))
 
+def cache_mode(score_mode: str, source: str = "apify") -> str:
+    """Mode part of the search cache key, Apify-sourced searches keep their original keys."""
+    return score_mode if source == "apify" else f"{score_mode}|{source}"
+
+def search_window(page: int, page_size: int, window_size: int, actor_page_size: int) -> Tuple[int, int, int, int]:
+    """
+    Maps a result page onto the fetch window that contains it.
+    Windows are aligned, so every page of a window maps to the same Apify run.
+    Returns (first page of the window, actor startPage, items to skip, maxItems).
+    """
+    pages_per_window = max(1, window_size // page_size)
+    window = (max(1, page) - 1) // pages_per_window
+    offset = window * pages_per_window * page_size
+    skip = offset % actor_page_size
+    return window * pages_per_window + 1, offset // actor_page_size + 1, skip, pages_per_window * page_size + skip
+
 class MainPipeline():
-    async def run_pipeline(self, link: Optional[str] = None, keywords: Optional[str] = None, country: Optional[str] = None, page: Optional[int] = 1):
+    def __init__(self, scoring_stage: Optional[ScoringStage] = None):
+        self.scoring_stage = scoring_stage or ScoringStage()
+        # cache key -> the search run identical concurrent requests wait on
+        self._in_flight = {}
+        # (keywords, country, first page) -> the Apify run fetching that search window
+        self._windows = {}
+        # (keywords, country, page) -> cleaned window pages nobody scored yet, the oldest are dropped
+        self._window_pages = OrderedDict()
+        self._prefetches = set()
+        self._waiters = {}  # run task -> requests currently waiting on it
+        # leads already returned by each search, so later pages skip them (per worker, seeded from the cache)
+        self._dedup = SearchDedup()
+
+    def validate_request(self, link: Optional[str] = None, keywords: Optional[str] = None):
+        """Raises ValueError for requests run_pipeline would reject, before any work starts."""
+        if link:
+            if not link_validation(link):
+                logger.error("Invalid LinkedIn link provided.")
+                raise ValueError("The provided link is not a valid LinkedIn URL.")
+        elif not keywords:
+            raise ValueError("Either a link or keywords must be provided.")
+
+    async def _search_profiles(self, keywords: str, country: Optional[str], page: Optional[int]) -> List[dict]:
+        """Runs the Apify keyword search for one page and returns the cleaned profiles."""
+        search_query = f"{keywords} {country}" if country else keywords
+
+        # Updated: Passed start_page=page to handle pagination correctly
+        raw_profiles = await apify_search(keywords=search_query, max_items=SEARCH_PAGE_SIZE, start_page=page)
+
+        if not raw_profiles:
+            logger.warning("Apify found 0 profiles.")
+            return []
+
+        return apify_lead_presentation(raw_profiles)
+
+    async def _search_window(self, keywords: str, country: Optional[str], page: int) -> Tuple[int, List[List[dict]]]:
+        """
+        Fetches the whole window around `page` in one Apify run and normalizes it once.
+        Returns (first page of the window, cleaned profiles sliced into pages).
+        """
+        first_page, start_page, skip, max_items = search_window(page, SEARCH_PAGE_SIZE, SEARCH_WINDOW_SIZE, APIFY_SEARCH_PAGE_SIZE)
+        search_query = f"{keywords} {country}" if country else keywords
+        logger.info(f"Fetching pages {first_page}-{first_page + (max_items - skip) // SEARCH_PAGE_SIZE - 1} in one Apify run ({max_items} items)")
+
+        raw_profiles = (await apify_search(keywords=search_query, max_items=max_items, start_page=start_page))[skip:]
+        cleaned = apify_lead_presentation(raw_profiles) if raw_profiles else []
+        pages = [cleaned[start:start + SEARCH_PAGE_SIZE] for start in range(0, max_items - skip, SEARCH_PAGE_SIZE)]
+        return first_page, pages
+
+    async def _dedupe_page(self, keywords: str, country: Optional[str], page: Optional[int], mode: str, profiles: List[dict]) -> List[dict]:
+        """
+        Drops leads repeated within the page or already returned by another page of the same search.
+        Earlier pages this worker hasn't seen (served from the cache, or cached before a restart)
+        are loaded into the index first, so a page never repeats what a cached page returned.
+        """
+        page = page or 1
+        index = self._dedup.for_search(keywords, country, mode)
+        for number in range(max(1, page - DEDUP_SEED_PAGES), page):
+            if not index.knows(number):
+                cached = await peek_cached_results_async(keywords, country, number, mode)
+                if cached is not None:
+                    index.seed(cached, owner=number)
+        unique, removed = index.dedupe(profiles, owner=page)
+        if removed:
+            logger.info(f"Removed {removed} duplicate leads from page {page}")
+            count_duplicates(removed)
+        return unique
+
+    async def _score_and_cache(self, keywords: str, country: Optional[str], page: Optional[int], cleaned_profiles: List[dict],
+                               score_mode: str, prefilter_top_k: Optional[int]) -> List[GeneralProfile]:
+        cleaned_profiles = await self._dedupe_page(keywords, country, page, score_mode, cleaned_profiles)
+        if not cleaned_profiles:
+            await save_to_cache_async(keywords, country, page, [], score_mode)
+            return []
+
+        kw_list = keywords.split() if isinstance(keywords, str) else keywords
+        processed_results = await self.scoring_stage.run(cleaned_profiles, kw_list, score_mode, prefilter_top_k)
+        await save_to_cache_async(keywords, country, page, [p.model_dump() for p in processed_results], score_mode)
+        return processed_results
+
+    def _prefetch_budget_left(self) -> bool:
+        return PREFETCH_ENABLED and len(self._prefetches) < PREFETCH_MAX_IN_FLIGHT
+
+    def _keep_window_page(self, page_key: tuple, cleaned: List[dict]):
+        self._window_pages[page_key] = cleaned
+        self._window_pages.move_to_end(page_key)
+        while len(self._window_pages) > WINDOW_PAGES_KEPT:
+            self._window_pages.popitem(last=False)
+
+    async def _page_profiles(self, keywords: str, country: Optional[str], page: Optional[int],
+                             score_mode: str, prefilter_top_k: Optional[int], prefetch: bool = True) -> List[dict]:
+        """
+        Cleaned profiles for one result page.
+        With a search window, one Apify run is shared by every page of the window. While
+        the prefetch budget allows, the other pages are scored and cached in the background,
+        registered as in-flight runs so requests for them wait instead of refetching. The
+        rest, or all of them with prefetch off, are kept unscored until they are requested.
+        """
+        if SEARCH_WINDOW_SIZE <= SEARCH_PAGE_SIZE:
+            return await self._search_profiles(keywords, country, page)
+
+        page = page or 1
+        search_key = (keywords.lower().strip(), (country or "").lower().strip())
+        kept = self._window_pages.pop((*search_key, page), None)
+        if kept is not None:
+            return kept
+
+        first_page = search_window(page, SEARCH_PAGE_SIZE, SEARCH_WINDOW_SIZE, APIFY_SEARCH_PAGE_SIZE)[0]
+        window_key = (*search_key, first_page)
+        fetch = self._windows.get(window_key)
+        leader = fetch is None
+        if leader:
+            fetch = asyncio.ensure_future(self._search_window(keywords, country, page))
+            self._windows[window_key] = fetch
+            fetch.add_done_callback(lambda done: self._finish_flight(window_key, done, self._windows))
+        first_page, pages = await asyncio.shield(fetch)
+        if not leader:
+            return pages[page - first_page]
+
+        for number, cleaned in enumerate(pages, start=first_page):
+            key = generate_cache_key(keywords, country, number, score_mode)
+            if number == page or key in self._in_flight:
+                continue
+            if not (prefetch and self._prefetch_budget_left()):
+                self._keep_window_page((*search_key, number), cleaned)
+                continue
+            task = asyncio.ensure_future(self._in_background(self._score_and_cache(keywords, country, number, cleaned, score_mode, prefilter_top_k)))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done, key=key: self._finish_flight(key, done))
+            # Tracked with the prefetches so shutdown cancels them and they count against the budget
+            self._prefetches.add(task)
+            task.add_done_callback(self._prefetches.discard)
+        return pages[page - first_page]
+
+    async def _in_background(self, coro):
+        """Runs `coro` with bulk LLM priority, the priority only changes inside this task."""
+        llm_priority.set("bulk")
+        return await coro
+
+    async def _search_and_score(self, keywords: str, country: Optional[str], page: Optional[int],
+                                score_mode: str, prefilter_top_k: Optional[int], prefetch: bool = True) -> List[GeneralProfile]:
+        logger.info("Cache MISS. Fetching fresh data from Apify...")
+
+        try:
+            cleaned_profiles = await self._page_profiles(keywords, country, page, score_mode, prefilter_top_k, prefetch)
+            processed_results = await self._score_and_cache(keywords, country, page, cleaned_profiles, score_mode, prefilter_top_k)
+            logger.info("Data processing completed")
+            return processed_results
+
+        except Exception as e:
+            logger.error(f"Error during extraction: {e}")
+            raise
+
+    def _finish_flight(self, key, task: asyncio.Future, registry: Optional[dict] = None):
+        (self._in_flight if registry is None else registry).pop(key, None)
+        # Mark the error as retrieved even when every waiter has gone away
+        if not task.cancelled():
+            task.exception()
+
+    def _start_flight(self, key: str, make_run: Callable[[], Awaitable[List[GeneralProfile]]]) -> asyncio.Future:
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(make_run())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish_flight(key, done))
+        else:
+            logger.info("Identical search already running. Waiting on it instead of starting another.")
+        return task
+
+    async def _single_flight(self, key: str, make_run: Callable[[], Awaitable[List[GeneralProfile]]]) -> List[GeneralProfile]:
+        """
+        Runs one search per cache key at a time, identical concurrent requests await the same run.
+        The run is shielded, so a caller that disconnects does not cancel it for the others.
+        It is only cancelled once nobody is waiting on it anymore.
+        """
+        task = self._start_flight(key, make_run)
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            results = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # The last waiter leaving stops the run (and its Apify actor), background runs are kept
+            if self._waiters[task] == 1 and not task.done() and task not in self._prefetches:
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+        return list(results)
+
+    async def _prefetch(self, keywords: str, country: Optional[str], page: int, score_mode: str, prefilter_top_k: Optional[int]):
+        # Nobody is waiting on a prefetch yet, its LLM calls queue behind interactive ones
+        llm_priority.set("bulk")
+        try:
+            if await get_cached_results_async(keywords, country, page, score_mode) is not None:
+                return
+            logger.info(f"Prefetching page {page} in the background.")
+            key = generate_cache_key(keywords, country, page, score_mode)
+            await self._single_flight(key, lambda: self._search_and_score(keywords, country, page, score_mode, prefilter_top_k))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Prefetch of page {page} failed: {e}")
+
+    def schedule_prefetch(self, keywords: str, country: Optional[str], page: int, score_mode: str = "llm",
+                          prefilter_top_k: Optional[int] = None) -> Optional[asyncio.Task]:
+        """
+        Starts fetching, scoring and caching `page` in the background so the next click is a cache hit.
+        Skipped when prefetching is disabled, the page is already running or the budget is used up.
+        """
+        if not PREFETCH_ENABLED or PREFETCH_MAX_IN_FLIGHT <= 0:
+            return None
+        if generate_cache_key(keywords, country, page, score_mode) in self._in_flight:
+            return None
+        if len(self._prefetches) >= PREFETCH_MAX_IN_FLIGHT:
+            logger.info(f"Prefetch budget used up, not prefetching page {page}.")
+            return None
+
+        task = asyncio.ensure_future(self._prefetch(keywords, country, page, score_mode, prefilter_top_k))
+        self._prefetches.add(task)
+        task.add_done_callback(self._prefetches.discard)
+        return task
+
+    async def cancel_prefetches(self):
+        """Cancels background prefetches, called on shutdown."""
+        tasks = list(self._prefetches)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _make_run(self, keywords: str, country: Optional[str], page: Optional[int], score_mode: str,
+                  prefilter_top_k: Optional[int], source: str, prefetch: bool = True) -> Callable[[], Awaitable[List[GeneralProfile]]]:
+        if source == "discover":
+            return lambda: self._discover_and_enrich(keywords, country, page, score_mode, prefilter_top_k)
+        return lambda: self._search_and_score(keywords, country, page, score_mode, prefilter_top_k, prefetch)
+
+    async def cached_json(self, keywords: Optional[str], country: Optional[str], page: Optional[int],
+                          score_mode: str = "llm", source: str = "apify") -> Optional[bytes]:
+        """
+        Cached results of a keyword search as the stored JSON array, None on a miss.
+        Lets the API answer cache hits without parsing or re-validating a single row.
+        """
+        if not keywords:
+            return None
+        return await get_cached_json_async(keywords, country, page, cache_mode(score_mode, source))
+
+    async def run_pipeline(self, link: Optional[str] = None, keywords: Optional[str] = None, country: Optional[str] = None, page: Optional[int] = 1,
+                           score_mode: str = "llm", prefilter_top_k: Optional[int] = None, prefetch: bool = True, source: str = "apify",
+                           cache_checked: bool = False):
+        """`cache_checked` skips the cache lookup when the caller already missed on cached_json."""
         logger.info("Running main pipeline")
 
         if link:
@@ -28,124 +324,278 @@ class MainPipeline():
             pass 
             
         elif keywords and not link:
-            logger.info("No link provided. Checking cache...")
-            
-            cached_data = get_cached_results(keywords, country, page)
+            mode = cache_mode(score_mode, source)
+            cached_data = None
+            if not cache_checked:
+                logger.info("No link provided. Checking cache...")
+                cached_data = await get_cached_results_async(keywords, country, page, mode)
             if cached_data is not None:
                 logger.info(f"Cache HIT! Found {len(cached_data)} cached profiles.")
-                return [GeneralProfile(**p) for p in cached_data]
-            
-            logger.info("Cache MISS. Fetching fresh data from Apify...")
+                # Rows were validated when they were cached
+                return [GeneralProfile.model_construct(**p) for p in cached_data]
             
+            key = generate_cache_key(keywords, country, page, mode)
+            results = await self._single_flight(key, self._make_run(keywords, country, page, score_mode, prefilter_top_k, source, prefetch))
+            # Discovery pages are cheap to fetch on demand, only Apify searches are prefetched
+            if prefetch and results and source == "apify":
+                self.schedule_prefetch(keywords, country, (page or 1) + 1, score_mode, prefilter_top_k)
+            return results
+
+        else:
+            raise ValueError("Either a link or keywords must be provided.")
+
+    async def stream_pipeline(self, link: Optional[str] = None, keywords: Optional[str] = None, country: Optional[str] = None, page: Optional[int] = 1,
+                              score_mode: str = "llm", prefilter_top_k: Optional[int] = None, prefetch: bool = True,
+                              source: str = "apify") -> AsyncIterator[dict]:
+        """
+        Async-generator version of run_pipeline.
+        Yields {"type": "lead", "index": i, "lead": {...}} frames as each lead is scored,
+        then one {"type": "summary", ...} frame. The results are cached once the stream completes.
+        """
+        logger.info("Running streaming pipeline")
+        started = time.perf_counter()
+        self.validate_request(link, keywords)
+
+        if link:
+            yield {"type": "summary", "count": 0, "cached": False, "elapsed_seconds": 0.0}
+            return
+
+        mode = cache_mode(score_mode, source)
+        cached_data = await get_cached_results_async(keywords, country, page, mode)
+        if cached_data is not None:
+            logger.info(f"Cache HIT! Streaming {len(cached_data)} cached profiles.")
+            for index, profile in enumerate(cached_data):
+                yield {"type": "lead", "index": index, "lead": profile}
+            yield {"type": "summary", "count": len(cached_data), "cached": True,
+                   "elapsed_seconds": round(time.perf_counter() - started, 3)}
+            return
+
+        key = generate_cache_key(keywords, country, page, mode)
+        task = self._in_flight.get(key)
+        # Discovery enriches its shortlist as one batch, so it is streamed once the batch is done
+        if task is not None or source == "discover":
+            if task is not None:
+                logger.info("Identical search already running. Streaming its results once it finishes.")
+                results = await asyncio.shield(task)
+            else:
+                results = await self._single_flight(key, self._make_run(keywords, country, page, score_mode, prefilter_top_k, source, prefetch))
+            for index, lead in enumerate(results):
+                yield {"type": "lead", "index": index, "lead": lead.model_dump()}
+            yield {"type": "summary", "count": len(results), "cached": False,
+                   "elapsed_seconds": round(time.perf_counter() - started, 3)}
+            return
+
+        logger.info("Cache MISS. Fetching fresh data from Apify...")
+        cleaned_profiles = await self._page_profiles(keywords, country, page, score_mode, prefilter_top_k, prefetch)
+        cleaned_profiles = await self._dedupe_page(keywords, country, page, score_mode, cleaned_profiles)
+
+        kw_list = keywords.split() if isinstance(keywords, str) else keywords
+        scored = []
+        async for index, lead in self.scoring_stage.stream(cleaned_profiles, kw_list, score_mode, prefilter_top_k):
+            scored.append((index, lead))
+            yield {"type": "lead", "index": index, "lead": lead.model_dump()}
+
+        processed_results = [lead for _, lead in sorted(scored, key=lambda item: item[0])]
+        await save_to_cache_async(keywords, country, page, [p.model_dump() for p in processed_results], score_mode)
+        if prefetch and processed_results:
+            self.schedule_prefetch(keywords, country, (page or 1) + 1, score_mode, prefilter_top_k)
+        logger.info("Streaming pipeline completed")
+        yield {"type": "summary", "count": len(processed_results), "cached": False,
+               "elapsed_seconds": round(time.perf_counter() - started, 3)}
+
+    async def _enrichment_pipeline(self, cached_items: List[dict], links: List[str], criteria: list, score_mode: str, prefilter_top_k: Optional[int],
+                                   apify_runs: Optional[list] = None, on_lead: Optional[Callable[[int], None]] = None,
+                                   failed_links: Optional[list] = None):
+        """
+        fetch -> normalize + email -> score -> collect, connected by bounded queues.
+        Every stage starts on the first profile while Apify is still streaming the rest.
+        `cached_items` are raw payloads from the profile store, only `links` go to Apify.
+        `on_lead` is called with the number of finished leads every time one is written.
+        Links Apify could not enrich are appended to `failed_links`.
+        Returns (fetched count, leads in fetch order). Exports are streamed from the leads by utils.export.
+        """
+        raw_queue = asyncio.Queue(maxsize=ENRICHMENT_QUEUE_SIZE)
+        lead_queue = asyncio.Queue(maxsize=ENRICHMENT_QUEUE_SIZE)
+        row_queue = asyncio.Queue(maxsize=ENRICHMENT_QUEUE_SIZE)
+        # Local/prefilter scoring ranks the whole batch, so it runs as a single barrier worker
+        score_workers = self.scoring_stage.concurrency if score_mode in LLM_SCORE_MODES else 1
+        batch_size = self.scoring_stage.batch_size
+        fetched = 0
+        results = []
+
+        async def fetch():
+            nonlocal fetched
+            for item in cached_items:
+                await raw_queue.put(item)
+            scraped = {}
             try:
-                search_query = f"{keywords} {country}" if country else keywords
-                
-                # Updated: Passed start_page=page to handle pagination correctly
-                raw_profiles = await apify_search(keywords=search_query, max_items=5, start_page=page)
-                
-                if not raw_profiles:
-                    logger.warning("Apify found 0 profiles.")
-                    save_to_cache(keywords, country, page, [])
-                    return []
-                
-                cleaned_profiles = apify_lead_presentation(raw_profiles)
-                
-                processed_results = []
-                
-                for profile in cleaned_profiles:
-                    company = profile.get("company", "Not available")
-                    
-                    education_list = profile.get("education", [])
-                    education = "Not available"
-                    if education_list and len(education_list) > 0:
-                        education = education_list[0].get("school", "Not available")
-                    
-                    email = email_generator({
-                        "name": profile.get("name"),
-                        "company": company,
-                        "education": education
-                    })
-                    
-                    kw_list = keywords.split() if isinstance(keywords, str) else keywords
-                    score = await calculate_score(profile, kw_list)
-                    
-                    final_profile = GeneralProfile(
-                        name=profile.get("name"),
-                        linkedin_url=profile.get("linkedin_url"),
-                        current_role=profile.get("current_role"),
-                        company=company,
-                        education=education,
-                        country=profile.get("country"),
-                        email=email,
-                        score=score
-                    )
-                    processed_results.append(final_profile)
-
-                logger.info("Data processing completed")
-                save_to_cache(keywords, country, page, [p.model_dump() for p in processed_results])
-                
-                return processed_results
+                async for item in enrich_profiles(links, metadata=apify_runs, failed=failed_links):
+                    fetched += 1
+                    url_key = item_url_key(item)
+                    if url_key:
+                        scraped[url_key] = item
+                    await raw_queue.put(item)
+            finally:
+                # Keep whatever was scraped, even when a later shard failed
+                await save_profiles_async(scraped)
+            await raw_queue.put(_END)
 
+        async def normalize():
+            index = 0
+            seen = DedupIndex()
+            while (item := await raw_queue.get()) is not _END:
+                try:
+                    profile = apify_lead_presentation([item])[0]
+                    # URL variants of one person only show up once scraped, drop them before scoring
+                    if not seen.add(profile):
+                        count_duplicates(1)
+                        continue
+                    lead = prepare_lead(profile)
+                except Exception as e:
+                    logger.error(f"Could not normalize enrichment profile: {e}")
+                    continue
+                await lead_queue.put((index, profile, lead))
+                index += 1
+            for _ in range(score_workers):
+                await lead_queue.put(_END)
+
+        async def emit(index: int, profile: dict, lead: dict, score: int):
+            try:
+                await row_queue.put((index, build_general_profile(profile, lead, score)))
             except Exception as e:
-                logger.error(f"Error during extraction: {e}")
-                raise
+                logger.error(f"Could not build lead for profile {index}: {e}")
 
-        else:
-            raise ValueError("Either a link or keywords must be provided.")
+        async def score():
+            done = False
+            while not done:
+                item = await lead_queue.get()
+                if item is _END:
+                    break
+                chunk = [item]
+                while len(chunk) < batch_size:
+                    try:
+                        item = lead_queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        break
+                    if item is _END:
+                        done = True
+                        break
+                    chunk.append(item)
+                scores = await self.scoring_stage.score_chunk([c[0] for c in chunk], [c[1] for c in chunk], criteria, score_mode)
+                for (index, profile, lead), lead_score in zip(chunk, scores):
+                    await emit(index, profile, lead, lead_score)
+            await row_queue.put(_END)
+
+        async def score_barrier():
+            collected = []
+            while (item := await lead_queue.get()) is not _END:
+                collected.append(item)
+            async for position, scored in self.scoring_stage.stream([c[1] for c in collected], criteria, score_mode, prefilter_top_k):
+                await row_queue.put((collected[position][0], scored))
+            await row_queue.put(_END)
+
+        async def collect():
+            finished = 0
+            while finished < score_workers:
+                item = await row_queue.get()
+                if item is _END:
+                    finished += 1
+                    continue
+                results.append(item)
+                if on_lead is not None:
+                    on_lead(len(results))
+
+        scorers = [score() for _ in range(score_workers)] if score_mode in LLM_SCORE_MODES else [score_barrier()]
+        tasks = [asyncio.ensure_future(stage) for stage in [fetch(), normalize(), *scorers, collect()]]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        processed_results = [lead for _, lead in sorted(results, key=lambda item: item[0])]
+        return fetched, processed_results
+
+    async def _enrich_links(self, links: List[str], criteria: list, score_mode: str, prefilter_top_k: Optional[int],
+                            apify_runs: Optional[list] = None, on_lead: Optional[Callable[[int], None]] = None,
+                            failed_links: Optional[list] = None):
+        """
+        Enriches and scores LinkedIn URLs, known ones come from the profile store and only the rest go to Apify.
+        Returns (profile store hits, fetched count, leads).
+        """
+        valid_links = [url for url in (normalize_linkedin_url(link) for link in links) if url]
+        unique_links = list(dict.fromkeys(valid_links))
+        if len(valid_links) > len(unique_links):
+            logger.info(f"Removed {len(valid_links) - len(unique_links)} duplicate links")
+            count_duplicates(len(valid_links) - len(unique_links))
+        cached_profiles = await get_cached_profiles_async(unique_links)
+        missing_links = [url for url in unique_links if url not in cached_profiles]
+        logger.info(f"Profile store: {len(cached_profiles)} known, {len(missing_links)} to scrape")
+
+        fetched, processed_results = await self._enrichment_pipeline(
+            list(cached_profiles.values()), missing_links, criteria, score_mode, prefilter_top_k, apify_runs, on_lead, failed_links)
+        return len(cached_profiles), fetched, processed_results
+
+    async def _discover_and_enrich(self, keywords: str, country: Optional[str], page: Optional[int],
+                                   score_mode: str, prefilter_top_k: Optional[int]) -> List[GeneralProfile]:
+        """
+        Two-tier sourcing: Serper + profile_discovery find a wide candidate set from Google results,
+        the local relevance engine ranks it and only the top DISCOVER_ENRICH_TOP_N URLs are
+        scraped with Apify and scored.
+        """
+        logger.info("Cache MISS. Discovering candidates through Serper...")
+        try:
+            serper_page = ((page or 1) - 1) * DISCOVER_SERPER_PAGES + 1
+            discovered = await serper_client.discover(keywords, country, pages=DISCOVER_SERPER_PAGES, start_page=serper_page)
+
+            valid = [candidate for candidate in discovered if link_validation(normalize_linkedin_url(candidate.get("linkedin_url") or ""))]
+            unique = await self._dedupe_page(keywords, country, page, cache_mode(score_mode, "discover"), valid)
+            candidates = {normalize_linkedin_url(candidate["linkedin_url"]): candidate for candidate in unique}
+            urls = list(candidates)
+
+            kw_list = keywords.split() if isinstance(keywords, str) else keywords
+            shortlist = [urls[idx] for idx in top_k_indexes(local_scores(list(candidates.values()), kw_list), DISCOVER_ENRICH_TOP_N)]
+            logger.info(f"Discovered {len(urls)} candidates, enriching the top {len(shortlist)}")
+
+            processed_results = []
+            if shortlist:
+                _, _, processed_results = await self._enrich_links(shortlist, kw_list, score_mode, prefilter_top_k)
+            await save_to_cache_async(keywords, country, page, [p.model_dump() for p in processed_results], cache_mode(score_mode, "discover"))
+            return processed_results
 
-    async def run_enrichment(self, links: List[str]):
+        except Exception as e:
+            logger.error(f"Error during discovery: {e}")
+            raise
+
+    async def run_enrichment(self, links: List[str], score_mode: str = "llm", prefilter_top_k: Optional[int] = None,
+                             on_lead: Optional[Callable[[int], None]] = None):
        
         logger.info(f"Starting Enrichment Pipeline for {len(links)} links")
         
         try:
-            raw_profiles = []
-            async for profile in enrich_profiles(links):
-                raw_profiles.append(profile)
+            apify_runs = []
+            failed_links = []
+            with track_cascade() as cascade, track_duplicates() as duplicates:
+                cache_hits, fetched, processed_results = await self._enrich_links(
+                    links, UNIVERSAL_STANDARD, score_mode, prefilter_top_k, apify_runs, on_lead, failed_links)
             
-            if not raw_profiles:
+            if not fetched and not cache_hits:
                 return {"error": "Could not scrape details."}
             
-            cleaned_profiles = apify_lead_presentation(raw_profiles)
-            
-            processed_results = []
-            for profile in cleaned_profiles:
-                company = profile.get("company", "Not available")
-                
-                education_list = profile.get("education", [])
-                education = "Not available"
-                if education_list and len(education_list) > 0:
-                    education = education_list[0].get("school", "Not available")
-                
-                email = email_generator({
-                    "name": profile.get("name"),
-                    "company": company,
-                    "education": education
-                })
-                
-                universal_standard = ["Professional", "Credible", "Complete Profile", "Seniority"]
-                
-                score = await calculate_score(profile, universal_standard)
-
-                final_profile = GeneralProfile(
-                    name=profile.get("name"),
-                    linkedin_url=profile.get("linkedin_url"),
-                    current_role=profile.get("current_role"),
-                    company=company,
-                    education=education,
-                    country=profile.get("country"),
-                    email=email,
-                    score=score  
-                )
-                processed_results.append(final_profile)
-
-            # Updated: export now returns in-memory content, not a filename
-            csv_content = await export([p.model_dump() for p in processed_results])
-            
-            return {
+            result = {
                 "count": len(processed_results),
                 "data": processed_results,
-                "csv_content": csv_content # Updated to return the content directly
+                "cache_hits": cache_hits,
+                "fetched": fetched,
+                "duplicates_removed": duplicates["removed"],
+                # Links whose Apify shard kept failing, they are missing from "data"
+                "failed": len(failed_links),
+                "failed_links": failed_links,
+                "apify_runs": [run.model_dump() for run in apify_runs]
             }
+            if score_mode == "cascade":
+                result["cascade"] = cascade
+            return result
             
         except Exception as e:
             logger.error(f"Error during enrichment: {e}")
@@ -0,0 +1,366 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+
+from models.schemas import EnrichmentRequest, EnrichmentJob
+from utils.llm_client import llm_context
+from validators.linkedin import normalize_linkedin_url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS_DB_FILE = "enrichment_jobs.db"
+DEFAULT_JOB_CONCURRENCY = 2  # enrichment jobs running at once
+DEFAULT_JOB_PROGRESS_INTERVAL_SECONDS = 1.0  # how often running jobs persist their progress
+DEFAULT_JOB_HEARTBEAT_SECONDS = 15  # how often a worker renews the lease of the jobs it runs
+DEFAULT_JOB_LEASE_SECONDS = 120  # a running job whose lease is older belongs to a dead worker
+DEFAULT_JOB_RESULT_TTL_HOURS = 24 * 7  # finished jobs and their results are kept this long
+DEFAULT_JOB_SWEEP_INTERVAL_SECONDS = 300
+JOBS_DB_FILE = os.getenv("JOBS_DB_FILE", DEFAULT_JOBS_DB_FILE)
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", DEFAULT_JOB_CONCURRENCY))
+JOB_PROGRESS_INTERVAL_SECONDS = float(os.getenv("JOB_PROGRESS_INTERVAL_SECONDS", DEFAULT_JOB_PROGRESS_INTERVAL_SECONDS))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", DEFAULT_JOB_HEARTBEAT_SECONDS))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", DEFAULT_JOB_LEASE_SECONDS))
+JOB_RESULT_TTL_HOURS = float(os.getenv("JOB_RESULT_TTL_HOURS", DEFAULT_JOB_RESULT_TTL_HOURS))
+JOB_SWEEP_INTERVAL_SECONDS = float(os.getenv("JOB_SWEEP_INTERVAL_SECONDS", DEFAULT_JOB_SWEEP_INTERVAL_SECONDS))
+
+
+class JobNotFoundError(Exception):
+    pass
+
+class JobNotFinishedError(Exception):
+    pass
+
+
+class JobStore():
+    """
+    Enrichment jobs in their own SQLite file, so they outlive the process and the cache sweeps.
+    Every statement runs on one dedicated thread holding one connection.
+    A running job is leased to the worker that claimed it: `worker_id` plus an `updated_at`
+    heartbeat. Other processes sharing the file only take it over once the lease expires,
+    and writes from a worker that lost its lease are ignored.
+    """
+
+    def __init__(self, db_file: Optional[str] = None, worker_id: Optional[str] = None):
+        self.db_file = db_file or JOBS_DB_FILE
+        self.worker_id = worker_id or uuid.uuid4().hex
+        self._executor = None
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT,
+                    request JSON,
+                    total INTEGER,
+                    processed INTEGER,
+                    result JSON,
+                    error TEXT,
+                    created_at DATETIME,
+                    started_at DATETIME,
+                    finished_at DATETIME
+                )
+            ''')
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+            for column, kind in (("worker_id", "TEXT"), ("updated_at", "DATETIME")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jobs-db")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(self._connection(), *args))
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, sql: str, params: tuple) -> int:
+        rowcount = conn.execute(sql, params).rowcount
+        conn.commit()
+        return rowcount
+
+    async def create(self, job_id: str, request: dict, total: int):
+        await self._run(self._write, "INSERT INTO jobs (id, status, request, total, processed, created_at) VALUES (?, 'queued', ?, ?, 0, ?)",
+                        (job_id, json.dumps(request), total, datetime.now().isoformat()))
+
+    async def claim(self, job_id: str) -> bool:
+        """Atomically leases a queued job to this worker, False when another worker got it first."""
+        now = datetime.now().isoformat()
+        return await self._run(self._write, "UPDATE jobs SET status = 'running', processed = 0, started_at = ?, worker_id = ?, updated_at = ? "
+                                            "WHERE id = ? AND status = 'queued'", (now, self.worker_id, now, job_id)) == 1
+
+    async def heartbeat(self, job_ids: list):
+        """Renews the lease of the jobs this worker is running."""
+        if job_ids:
+            await self._run(self._write, f"UPDATE jobs SET updated_at = ? WHERE worker_id = ? AND status = 'running' "
+                                         f"AND id IN ({','.join('?' * len(job_ids))})",
+                            (datetime.now().isoformat(), self.worker_id, *job_ids))
+
+    async def set_progress(self, job_id: str, processed: int):
+        await self._run(self._write, "UPDATE jobs SET processed = ?, updated_at = ? WHERE id = ? AND status = 'running' AND worker_id = ?",
+                        (processed, datetime.now().isoformat(), job_id, self.worker_id))
+
+    async def finish(self, job_id: str, result: dict):
+        now = datetime.now().isoformat()
+        await self._run(self._write, "UPDATE jobs SET status = 'succeeded', processed = ?, result = ?, finished_at = ?, updated_at = ? "
+                                     "WHERE id = ? AND status = 'running' AND worker_id = ?",
+                        (result.get("count", 0), json.dumps(result, default=str), now, now, job_id, self.worker_id))
+
+    async def fail(self, job_id: str, error: str):
+        now = datetime.now().isoformat()
+        await self._run(self._write, "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, updated_at = ? "
+                                     "WHERE id = ? AND status = 'running' AND worker_id = ?",
+                        (error, now, now, job_id, self.worker_id))
+
+    async def release(self):
+        """Hands this worker's running jobs back to the queue, called on a clean shutdown."""
+        await self._run(self._write, "UPDATE jobs SET status = 'queued', processed = 0, started_at = NULL, worker_id = NULL "
+                                     "WHERE status = 'running' AND worker_id = ?", (self.worker_id,))
+
+    @staticmethod
+    def _get(conn: sqlite3.Connection, job_id: str, columns: str):
+        return conn.execute(f"SELECT {columns} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    async def get(self, job_id: str) -> Optional[EnrichmentJob]:
+        row = await self._run(self._get, job_id, "id, status, total, processed, error, created_at, started_at, finished_at")
+        if row is None:
+            return None
+        return EnrichmentJob(job_id=row["id"], **{k: row[k] for k in row.keys() if k != "id"})
+
+    async def get_request(self, job_id: str) -> Optional[dict]:
+        row = await self._run(self._get, job_id, "request")
+        return json.loads(row["request"]) if row else None
+
+    async def get_result(self, job_id: str) -> Optional[tuple]:
+        """(status, result) of a job, None when it does not exist."""
+        row = await self._run(self._get, job_id, "status, result")
+        if row is None:
+            return None
+        return row["status"], json.loads(row["result"]) if row["result"] else None
+
+    @staticmethod
+    def _recover(conn: sqlite3.Connection, lease_seconds: float) -> list:
+        # Running jobs whose worker stopped renewing the lease start over, live workers keep theirs
+        cutoff = (datetime.now() - timedelta(seconds=lease_seconds)).isoformat()
+        conn.execute("UPDATE jobs SET status = 'queued', processed = 0, started_at = NULL, worker_id = NULL "
+                     "WHERE status = 'running' AND (updated_at IS NULL OR updated_at < ?)", (cutoff,))
+        conn.commit()
+        return [row["id"] for row in conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at")]
+
+    async def recover(self, lease_seconds: Optional[float] = None) -> list:
+        """Ids of the queued jobs, including running jobs whose lease expired, oldest first."""
+        return await self._run(self._recover, lease_seconds if lease_seconds is not None else JOB_LEASE_SECONDS)
+
+    async def purge(self, ttl_hours: Optional[float] = None) -> int:
+        """Deletes finished jobs and their results older than `ttl_hours`, returns how many."""
+        cutoff = (datetime.now() - timedelta(hours=ttl_hours if ttl_hours is not None else JOB_RESULT_TTL_HOURS)).isoformat()
+        return await self._run(self._write, "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?", (cutoff,))
+
+    @staticmethod
+    def _counts(conn: sqlite3.Connection) -> dict:
+        return {row["status"]: row["n"] for row in conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+
+    async def counts(self) -> dict:
+        return await self._run(self._counts)
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def close(self):
+        if self._executor is not None:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._close)
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+class EnrichmentJobQueue():
+    """
+    Runs MainPipeline.run_enrichment in the background, at most `concurrency` jobs at once.
+    Submitting only records the job and returns its id. Jobs are picked up in submission
+    order. Queued jobs, and running jobs whose worker stopped renewing its lease, are picked
+    up on start and by the periodic sweep, which also purges old finished jobs.
+    """
+
+    def __init__(self, pipeline, store: Optional[JobStore] = None, concurrency: Optional[int] = None,
+                 progress_interval: Optional[float] = None, heartbeat_interval: Optional[float] = None,
+                 sweep_interval: Optional[float] = None):
+        self.pipeline = pipeline
+        self.store = store or JobStore()
+        self.concurrency = max(1, concurrency or JOB_CONCURRENCY)
+        self.progress_interval = progress_interval if progress_interval is not None else JOB_PROGRESS_INTERVAL_SECONDS
+        self.heartbeat_interval = heartbeat_interval or JOB_HEARTBEAT_SECONDS
+        self.sweep_interval = sweep_interval or JOB_SWEEP_INTERVAL_SECONDS
+        self.stats = {"purged": 0, "recovered": 0}
+        self._queue = None
+        self._queued = set()  # job ids waiting in the local queue
+        self._workers = []
+        self._progress = {}
+
+    async def start(self):
+        """Starts the workers and re-queues unfinished jobs, called from the FastAPI lifespan."""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        await self._recover()
+        self._workers = [asyncio.ensure_future(self._work()) for _ in range(self.concurrency)]
+        self._workers += [asyncio.ensure_future(self._heartbeat()), asyncio.ensure_future(self._sweep_loop())]
+
+    async def stop(self):
+        """Stops the workers and hands their running jobs back, so the next start picks them up."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._progress.clear()
+        self._queued.clear()
+        await self.store.release()
+        await self.store.close()
+
+    def _enqueue(self, job_id: str):
+        if job_id not in self._queued:
+            self._queued.add(job_id)
+            self._queue.put_nowait(job_id)
+
+    async def _recover(self) -> int:
+        recovered = [job_id for job_id in await self.store.recover() if job_id not in self._queued]
+        for job_id in recovered:
+            self._enqueue(job_id)
+        if recovered:
+            logger.info(f"Queued {len(recovered)} unfinished enrichment jobs.")
+            self.stats["recovered"] += len(recovered)
+        return len(recovered)
+
+    async def sweep(self) -> int:
+        """Picks up jobs abandoned by dead workers and purges finished jobs past their TTL."""
+        await self._recover()
+        purged = await self.store.purge()
+        if purged:
+            logger.info(f"Purged {purged} finished enrichment jobs.")
+            self.stats["purged"] += purged
+        return purged
+
+    async def _sweep_loop(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Enrichment job sweep failed: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.store.heartbeat(list(self._progress))
+            except Exception as e:
+                logger.error(f"Enrichment job heartbeat failed: {e}")
+
+    async def submit(self, request: EnrichmentRequest) -> EnrichmentJob:
+        job_id = uuid.uuid4().hex
+        total = len({url for url in (normalize_linkedin_url(link) for link in request.links) if url})
+        if self._queue is None:
+            await self.start()
+        await self.store.create(job_id, request.model_dump(), total)
+        self._enqueue(job_id)
+        logger.info(f"Queued enrichment job {job_id} for {total} links.")
+        return await self.status(job_id)
+
+    async def status(self, job_id: str) -> EnrichmentJob:
+        job = await self.store.get(job_id)
+        if job is None:
+            raise JobNotFoundError(f"Unknown job {job_id}")
+        if job.status == "running" and job_id in self._progress:
+            # Progress is persisted every few seconds, the live count is fresher
+            job.processed = max(job.processed, self._progress[job_id])
+        return job
+
+    async def result(self, job_id: str) -> dict:
+        """Result of a finished job, exports are streamed from its "data"."""
+        found = await self.store.get_result(job_id)
+        if found is None:
+            raise JobNotFoundError(f"Unknown job {job_id}")
+        status, result = found
+        if status != "succeeded":
+            raise JobNotFinishedError(f"Job {job_id} is {status}")
+        return result
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            try:
+                await self._run_job(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"Enrichment job {job_id} crashed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _on_lead(self, job_id: str):
+        last_write = 0.0
+
+        def on_lead(processed: int):
+            nonlocal last_write
+            self._progress[job_id] = processed
+            now = time.monotonic()
+            if now - last_write >= self.progress_interval:
+                last_write = now
+                asyncio.ensure_future(self.store.set_progress(job_id, processed))
+        return on_lead
+
+    async def _run_job(self, job_id: str):
+        stored = await self.store.get_request(job_id)
+        # Another worker sharing the jobs DB may have claimed it first
+        if stored is None or not await self.store.claim(job_id):
+            return
+        request = EnrichmentRequest(**stored)
+        self._progress[job_id] = 0
+        logger.info(f"Running enrichment job {job_id}")
+        try:
+            # Partner batches are bulk work, interactive searches are served first
+            with llm_context("bulk", owner=job_id):
+                result = await self.pipeline.run_enrichment(request.links, score_mode=request.score_mode,
+                                                            prefilter_top_k=request.prefilter_top_k,
+                                                            on_lead=self._on_lead(job_id))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Enrichment job {job_id} failed: {e}")
+            await self.store.fail(job_id, str(e) or type(e).__name__)
+            return
+        finally:
+            self._progress.pop(job_id, None)
+
+        if result.get("error"):
+            await self.store.fail(job_id, result["error"])
+            return
+        result["data"] = [lead.model_dump() if hasattr(lead, "model_dump") else lead for lead in result.get("data", [])]
+        await self.store.finish(job_id, result)
+        logger.info(f"Enrichment job {job_id} finished with {result.get('count', 0)} leads.")
+
+    async def get_stats(self) -> dict:
+        return {
+            "jobs": await self.store.counts(),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": len(self._progress),
+            "concurrency": self.concurrency,
+            **self.stats,
+        }
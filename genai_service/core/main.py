@@ -1,23 +1,50 @@
 from core.extraction import MainPipeline
-from models.schemas import GeneralProfile, UserInput, EnrichmentRequest
-from fastapi import FastAPI, HTTPException
+from core.jobs import EnrichmentJobQueue, JobNotFoundError, JobNotFinishedError
+from utils.caching import cache_backend, cache_manager
+from utils.apify_gateway import apify_gateway
+from utils.serper import serper_client
+from utils.llm_client import llm_scheduler, llm_context, track_cascade
+from utils.dedup import track_duplicates
+from utils.export import ExportFormat, Columns, ENRICHMENT_COLUMNS, PROFILE_COLUMNS, export_chunks, export_headers, export_text, media_type
+from models.schemas import GeneralProfile, UserInput, EnrichmentRequest, EnrichmentJob
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 import logging
-from typing import List, Dict
+import os
+from typing import List, Dict, Literal
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-import csv
-import io
+import json
+import asyncio
+from contextlib import asynccontextmanager
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO,
                     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 Limiter = Limiter(key_func=get_remote_address)
+DISCONNECT_POLL_SECONDS = 1
+# Deprecated: the CSV inlined in /api/enrich JSON responses, ?format=csv streams it instead
+ENRICH_CSV_CONTENT = os.getenv("ENRICH_CSV_CONTENT", "true").lower() in ("1", "true", "yes")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await cache_manager.prepare()
+    cache_manager.start()
+    apify_gateway.start()
+    await enrichment_jobs.start()
+    yield
+    await enrichment_jobs.stop()
+    await pipeline.cancel_prefetches()
+    await apify_gateway.close()
+    await serper_client.close()
+    await cache_manager.stop()
+    logger.info("Flushing cache writes before shutdown.")
+    await cache_backend.close()
 
 try:
-    app = FastAPI(title="Warm Lead Sourcer", version="2.0", description="A service for sourcing warm leads.")
+    app = FastAPI(title="Warm Lead Sourcer", version="2.0", description="A service for sourcing warm leads.", lifespan=lifespan)
     app.state.limiter = Limiter
     app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
     logger.info("FastAPI application initialized successfully.")
@@ -42,6 +69,7 @@ app.add_middleware(
 )
 
 pipeline = MainPipeline()
+enrichment_jobs = EnrichmentJobQueue(pipeline)
 
 @app.get("/health")
 async def health_check():
@@ -58,15 +86,79 @@ async def check_service():
     return {"status": "Service is running"}
 
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss, eviction and size counters for the SQLite cache."""
+    return await cache_manager.get_stats()
+
+
+@app.get("/llm/stats")
+async def llm_stats():
+    """Queue depth, grants and waits per priority of the LLM scheduler."""
+    return llm_scheduler.get_stats()
+
+
+@app.get("/apify/stats")
+async def apify_stats():
+    """Run counts, outcomes, items and compute units of the Apify actor runs."""
+    return apify_gateway.get_stats()
+
+
+@app.get("/serper/stats")
+async def serper_stats():
+    """Profile discovery totals and the per-batch latency and tokens of the latest discovery."""
+    return serper_client.get_stats()
+
+
+@app.get("/jobs/stats")
+async def job_stats():
+    """Enrichment jobs per status, queue depth and worker count."""
+    return await enrichment_jobs.get_stats()
+
+
+async def cancel_on_disconnect(request: Request, coro):
+    """
+    Awaits the pipeline call while checking whether the client is still connected.
+    If it went away the call is cancelled, which aborts the Apify runs it started.
+    """
+    work = asyncio.ensure_future(coro)
+    while True:
+        done, _ = await asyncio.wait({work}, timeout=DISCONNECT_POLL_SECONDS)
+        if done:
+            return work.result()
+        if await request.is_disconnected():
+            logger.info("Client disconnected. Cancelling its pipeline run.")
+            work.cancel()
+            await asyncio.gather(work, return_exceptions=True)
+            raise HTTPException(status_code=499, detail="Client closed the request.")
+
+
 @app.post("/source_leads", response_model=List[GeneralProfile])
-async def source_leads(user_input: UserInput) -> List[Dict]:
+async def source_leads(user_input: UserInput, request: Request, response: Response) -> List[Dict]:
     try:
+        if not user_input.post_url:
+            cached = await pipeline.cached_json(user_input.keywords, user_input.country, user_input.page,
+                                                user_input.score_mode, user_input.source)
+            if cached is not None:
+                # Stored rows are already validated JSON, send them as they are
+                return Response(content=cached, media_type="application/json", headers={"X-Cache": "HIT"})
+
         logger.info("Running lead sourcing pipeline.")
-        leads = await pipeline.run_pipeline(link=user_input.post_url, keywords=user_input.keywords, country=user_input.country, page=user_input.page)
+        run = pipeline.run_pipeline(link=user_input.post_url, keywords=user_input.keywords, country=user_input.country, page=user_input.page,
+                                    score_mode=user_input.score_mode, prefilter_top_k=user_input.prefilter_top_k,
+                                    prefetch=user_input.prefetch, source=user_input.source, cache_checked=not user_input.post_url)
+        with llm_context("interactive"), track_cascade() as cascade, track_duplicates() as duplicates:
+            leads = await cancel_on_disconnect(request, run)
+        response.headers["X-Duplicates-Removed"] = str(duplicates["removed"])
+        if user_input.score_mode == "cascade":
+            response.headers["X-Cascade-Scored"] = str(cascade["scored"])
+            response.headers["X-Cascade-Escalated"] = str(cascade["escalated"])
         if leads is None:
             logger.warning("Pipeline returned no leads")
             return []
         return leads
+    except HTTPException:
+        raise
     except ValueError as ve:
         logger.warning(f"Validation Error: {ve}")
         raise HTTPException(status_code=400, detail=str(ve))
@@ -77,39 +169,107 @@ async def source_leads(user_input: UserInput) -> List[Dict]:
         logger.exception("Unexpected error during lead sourcing")
         raise HTTPException(status_code=500, detail="An unexpected error occurred.")
 
+@app.post("/source_leads/stream")
+async def stream_leads(user_input: UserInput):
+    """
+    Streaming variant of /source_leads.
+    Responds with NDJSON: one {"type": "lead"} line per lead as soon as it is scored,
+    then a final {"type": "summary"} line.
+    """
+    try:
+        pipeline.validate_request(link=user_input.post_url, keywords=user_input.keywords)
+    except ValueError as ve:
+        logger.warning(f"Validation Error: {ve}")
+        raise HTTPException(status_code=400, detail=str(ve))
+
+    async def frames():
+        try:
+            with llm_context("interactive"), track_cascade() as cascade, track_duplicates() as duplicates:
+                async for frame in pipeline.stream_pipeline(link=user_input.post_url, keywords=user_input.keywords, country=user_input.country, page=user_input.page,
+                                                            score_mode=user_input.score_mode, prefilter_top_k=user_input.prefilter_top_k,
+                                                            prefetch=user_input.prefetch, source=user_input.source):
+                    if frame["type"] == "summary":
+                        frame["duplicates_removed"] = duplicates["removed"]
+                        if user_input.score_mode == "cascade":
+                            frame["cascade"] = dict(cascade)
+                    yield json.dumps(frame) + "\n"
+        except Exception:
+            logger.exception("Unexpected error during streamed lead sourcing")
+            yield json.dumps({"type": "error", "detail": "An unexpected error occurred."}) + "\n"
+
+    return StreamingResponse(frames(), media_type="application/x-ndjson")
+
+def export_response(leads, name: str, format: ExportFormat = "csv", gzip: bool = False,
+                    columns: Columns = ENRICHMENT_COLUMNS) -> StreamingResponse:
+    return StreamingResponse(export_chunks(leads, format, gzip, columns=columns), media_type=media_type(format, gzip),
+                             headers=export_headers(name, format, gzip))
+
 @app.post("/api/enrich")
-async def enrich_leads(request: EnrichmentRequest):
+async def enrich_leads(request: EnrichmentRequest, http_request: Request,
+                       format: Literal["json", "csv", "ndjson"] = "json", gzip: bool = False):
     """
-    Partner Integration: Receives list of URLs -> Returns Enriched CSV/JSON
+    Partner Integration: Receives list of URLs -> Returns Enriched JSON,
+    or streams the leads as a CSV/NDJSON download with ?format=csv|ndjson (&gzip=true)
     """
     if not request.links:
         raise HTTPException(status_code=400, detail="No links provided")
     
     try:
-        result = await pipeline.run_enrichment(request.links)
+        run = pipeline.run_enrichment(request.links, score_mode=request.score_mode, prefilter_top_k=request.prefilter_top_k)
+        # Partner batches are bulk work, interactive searches are served first
+        with llm_context("bulk"):
+            result = await cancel_on_disconnect(http_request, run)
+        if format != "json" and "data" in result:
+            return export_response(result["data"], "enrichment", format, gzip)
+        if ENRICH_CSV_CONTENT and "data" in result:
+            result["csv_content"] = export_text(result["data"])
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Enrichment error: {e}")
         raise HTTPException(status_code=500, detail="An unexpected error occurred during enrichment.")
 
+@app.post("/api/enrich/jobs", response_model=EnrichmentJob, status_code=202)
+async def submit_enrichment_job(request: EnrichmentRequest):
+    """
+    Queues an enrichment batch and returns its job id right away.
+    Poll /api/enrich/jobs/{job_id} and download the leads from /api/enrich/jobs/{job_id}/result.
+    """
+    if not request.links:
+        raise HTTPException(status_code=400, detail="No links provided")
+    return await enrichment_jobs.submit(request)
+
+@app.get("/api/enrich/jobs/{job_id}", response_model=EnrichmentJob)
+async def enrichment_job_status(job_id: str):
+    try:
+        return await enrichment_jobs.status(job_id)
+    except JobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/api/enrich/jobs/{job_id}/result")
+async def enrichment_job_result(job_id: str, format: Literal["json", "csv", "ndjson"] = "json", gzip: bool = False):
+    try:
+        result = await enrichment_jobs.result(job_id)
+    except JobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except JobNotFinishedError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if format != "json":
+        return export_response(result.get("data", []), f"enrichment_{job_id}", format, gzip)
+    return result
+
 @app.post("/export/csv")
-async def export_leads(profiles: List[GeneralProfile]):
+async def export_leads(profiles: List[GeneralProfile], gzip: bool = False):
+    """Streams the profiles as CSV with every GeneralProfile field, gzipped with ?gzip=true."""
     if not profiles:
         raise HTTPException(status_code=400, detail="No profiles provided for export")
-    
-    output = io.StringIO()
-    headers = profiles[0].model_dump().keys()
-    writer = csv.DictWriter(output, fieldnames=headers)
-    writer.writeheader()
-    
-    for profile in profiles:
-        row = profile.model_dump()
-        for key, value in row.items():
-            if isinstance(value, (list,dict)):
-                row[key] = str(value)
-        writer.writerow(row)
-    
-    output.seek(0)
-    return StreamingResponse(iter([output.getvalue()]),
-                                media_type="text/csv",
-                                headers={"Content-Disposition": "attachment; filename=leads.csv"})
\ No newline at end of file
+    return export_response(profiles, "leads", "csv", gzip, PROFILE_COLUMNS)
+
+@app.post("/export")
+async def export_leads_as(profiles: List[GeneralProfile], format: ExportFormat = "csv", gzip: bool = False):
+    """Same as /export/csv, with ?format=ndjson for NDJSON output."""
+    if not profiles:
+        raise HTTPException(status_code=400, detail="No profiles provided for export")
+    return export_response(profiles, "leads", format, gzip, PROFILE_COLUMNS)
\ No newline at end of file
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import os
+from typing import AsyncIterator, List, Optional, Tuple
+
+from models.schemas import GeneralProfile
+from utils.llm_client import calculate_score, calculate_batch_scores, cascade_scores, llm_timeout
+from utils.emails import generate_emails
+from utils.relevance import local_scores, top_k_indexes
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCORING_CONCURRENCY = 8
+DEFAULT_SCORING_TIMEOUT = 30  # seconds per LLM call once the scheduler grants it, queueing is not counted
+DEFAULT_SCORING_BATCH_SIZE = 5  # profiles per LLM call (one search page), 1 disables batched scoring
+DEFAULT_PREFILTER_TOP_K = 10
+DEFAULT_SCORE = 5
+
+SCORING_CONCURRENCY = int(os.getenv("SCORING_CONCURRENCY", DEFAULT_SCORING_CONCURRENCY))
+SCORING_TIMEOUT = float(os.getenv("SCORING_TIMEOUT", DEFAULT_SCORING_TIMEOUT))
+SCORING_BATCH_SIZE = int(os.getenv("SCORING_BATCH_SIZE", DEFAULT_SCORING_BATCH_SIZE))
+PREFILTER_TOP_K = int(os.getenv("PREFILTER_TOP_K", DEFAULT_PREFILTER_TOP_K))
+
+LLM_SCORE_MODES = ("llm", "cascade")  # modes that send every profile to the LLM
+
+
+def _lead_fields(profile: dict) -> dict:
+    company = profile.get("company", "Not available")
+
+    education_list = profile.get("education", [])
+    education = "Not available"
+    if education_list and len(education_list) > 0:
+        education = education_list[0].get("school", "Not available")
+    return {"name": profile.get("name"), "company": company, "education": education}
+
+
+def prepare_leads(profiles: List[dict]) -> List[dict]:
+    """Pulls company/education out of cleaned Apify profiles and generates their emails in one batch."""
+    fields = [_lead_fields(profile) for profile in profiles]
+    emails = generate_emails(fields)
+    return [{"company": f["company"], "education": f["education"], "email": email} for f, email in zip(fields, emails)]
+
+
+def prepare_lead(profile: dict) -> dict:
+    return prepare_leads([profile])[0]
+
+
+def build_general_profile(profile: dict, lead: dict, score: int) -> GeneralProfile:
+    return GeneralProfile(
+        name=profile.get("name"),
+        linkedin_url=profile.get("linkedin_url"),
+        current_role=profile.get("current_role"),
+        company=lead["company"],
+        education=lead["education"],
+        country=profile.get("country"),
+        email=lead["email"],
+        score=score
+    )
+
+
+class ScoringStage():
+    """
+    Scores and enriches many cleaned profiles at once.
+    At most `concurrency` LLM calls are in flight, each one bounded by `timeout` seconds
+    from the moment the scheduler lets it run, so rate limit queueing never costs a score.
+    With `batch_size` > 1 each call scores a block of profiles at once.
+    `score_mode` "local" skips the LLM entirely and "prefilter" only sends the
+    top-k profiles by local relevance to the LLM, the rest keep their local score.
+    "cascade" scores with the fast model first and escalates uncertain leads to the core model.
+    Results keep the input order and a failing profile falls back to DEFAULT_SCORE.
+    """
+
+    def __init__(self, concurrency: Optional[int] = None, timeout: Optional[float] = None, batch_size: Optional[int] = None):
+        self.concurrency = max(1, concurrency or SCORING_CONCURRENCY)
+        self.timeout = timeout or SCORING_TIMEOUT
+        self.batch_size = max(1, batch_size or SCORING_BATCH_SIZE)
+
+    async def _score_one(self, index: int, profile: dict, criteria: list) -> int:
+        try:
+            with llm_timeout(self.timeout):
+                return await calculate_score(profile, criteria)
+        except Exception as e:
+            logger.error(f"Scoring failed for profile {index}: {e}")
+        return DEFAULT_SCORE
+
+    def _timed_out(self, indexes: List[int]) -> List[int]:
+        # The timed out call was cancelled. Re-scoring the block one by one would pay
+        # for a second round of calls that are just as likely to be slow.
+        logger.warning(f"Batch scoring timed out after {self.timeout}s for profiles {indexes}. Defaulting to {DEFAULT_SCORE}.")
+        return [DEFAULT_SCORE] * len(indexes)
+
+    async def _cascade_chunk(self, indexes: List[int], chunk: List[dict], criteria: list) -> List[int]:
+        try:
+            with llm_timeout(self.timeout):
+                return await cascade_scores(chunk, criteria)
+        except asyncio.TimeoutError:
+            return self._timed_out(indexes)
+        except Exception as e:
+            logger.error(f"Cascade scoring failed for profiles {indexes}: {e}. Scoring them one by one.")
+        return list(await asyncio.gather(*[self._score_one(idx, profile, criteria) for idx, profile in zip(indexes, chunk)]))
+
+    async def score_chunk(self, indexes: List[int], chunk: List[dict], criteria: list, score_mode: str = "llm") -> List[int]:
+        """LLM scores for one block of profiles, batched when it holds more than one."""
+        if score_mode == "cascade":
+            return await self._cascade_chunk(indexes, chunk, criteria)
+        if len(chunk) == 1:
+            return [await self._score_one(indexes[0], chunk[0], criteria)]
+        try:
+            with llm_timeout(self.timeout):
+                return await calculate_batch_scores(chunk, criteria)
+        except asyncio.TimeoutError:
+            return self._timed_out(indexes)
+        except Exception as e:
+            logger.error(f"Batch scoring failed for profiles {indexes}: {e}. Scoring them one by one.")
+        return list(await asyncio.gather(*[self._score_one(idx, profile, criteria) for idx, profile in zip(indexes, chunk)]))
+
+    async def _score_chunk(self, semaphore: asyncio.Semaphore, indexes: List[int], chunk: List[dict], criteria: list,
+                           score_mode: str = "llm") -> List[int]:
+        async with semaphore:
+            return await self.score_chunk(indexes, chunk, criteria, score_mode)
+
+    def _build(self, index: int, profile: dict, score: int, lead: Optional[dict] = None) -> Optional[GeneralProfile]:
+        try:
+            return build_general_profile(profile, lead or prepare_lead(profile), score)
+        except Exception as e:
+            logger.error(f"Could not build lead for profile {index}: {e}")
+            return None
+
+    async def stream(self, profiles: List[dict], criteria: list, score_mode: str = "llm",
+                     top_k: Optional[int] = None) -> AsyncIterator[Tuple[int, GeneralProfile]]:
+        """
+        Yields (input index, lead) pairs as soon as each lead is scored.
+        Leads that are not sent to the LLM come out first. Closing the generator
+        early cancels the scoring calls still in flight.
+        """
+        if not profiles:
+            return
+
+        try:
+            prepared = prepare_leads(profiles)
+        except Exception as e:
+            logger.warning(f"Batch lead preparation failed, preparing leads one by one: {e}")
+            prepared = [None] * len(profiles)
+
+        logger.info(f"Scoring {len(profiles)} profiles (mode={score_mode}, concurrency={self.concurrency}, timeout={self.timeout}s, batch_size={self.batch_size})")
+        if score_mode in ("local", "prefilter"):
+            scores = local_scores(profiles, criteria)
+            pending = top_k_indexes(scores, top_k or PREFILTER_TOP_K) if score_mode == "prefilter" else []
+            if score_mode == "prefilter":
+                logger.info(f"Prefilter: sending {len(pending)}/{len(profiles)} profiles to the LLM")
+            shortlisted = set(pending)
+            for idx, score in enumerate(scores):
+                if idx not in shortlisted:
+                    lead = self._build(idx, profiles[idx], score, prepared[idx])
+                    if lead is not None:
+                        yield idx, lead
+        else:
+            pending = list(range(len(profiles)))
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = {}
+        for start in range(0, len(pending), self.batch_size):
+            indexes = pending[start:start + self.batch_size]
+            task = asyncio.ensure_future(self._score_chunk(semaphore, indexes, [profiles[idx] for idx in indexes], criteria, score_mode))
+            tasks[task] = indexes
+
+        try:
+            remaining = set(tasks)
+            while remaining:
+                done, remaining = await asyncio.wait(remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    for idx, score in zip(tasks[task], task.result()):
+                        lead = self._build(idx, profiles[idx], score, prepared[idx])
+                        if lead is not None:
+                            yield idx, lead
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def run(self, profiles: List[dict], criteria: list, score_mode: str = "llm", top_k: Optional[int] = None) -> List[GeneralProfile]:
+        """Returns the scored leads in input order, skipping profiles that could not be built."""
+        scored = [item async for item in self.stream(profiles, criteria, score_mode, top_k)]
+        return [lead for _, lead in sorted(scored, key=lambda item: item[0])]
@@ -1,8 +1,18 @@
-from typing import Optional, List
+from typing import Optional, List, Literal
 from pydantic import BaseModel
 
+# "llm" scores every lead with Groq, "local" only uses the BM25 relevance engine,
+# "prefilter" ranks locally and only sends the top-k leads to Groq
+# "cascade" scores with the fast model and only escalates uncertain leads to the core model
+ScoreMode = Literal["llm", "local", "prefilter", "cascade"]
+# "apify" scrapes search results with Apify, "discover" finds candidates through Serper
+# and only scrapes the best ranked ones
+SourceMode = Literal["apify", "discover"]
+
 class EnrichmentRequest(BaseModel):
     links: List[str]
+    score_mode: ScoreMode = "llm"
+    prefilter_top_k: Optional[int] = None
 
 
 class GeneralProfile(BaseModel):
@@ -22,7 +32,7 @@ class GeneratedExtractorProfile(BaseModel):
 
 class SerperSearchResult(BaseModel):
     keywords: str
-    country: str
+    country: Optional[str] = None
     page: int
 
 
@@ -31,6 +41,33 @@ class UserInput(BaseModel):
     keywords: Optional[str] = None
     country: Optional[str] = None
     page: Optional[int] = 1
+    score_mode: ScoreMode = "llm"
+    prefilter_top_k: Optional[int] = None
+    prefetch: bool = True  # warm the cache with the next page after a miss
+    source: SourceMode = "apify"
+
+class ApifyRunMetadata(BaseModel):
+    """What one Apify actor run cost and returned."""
+    actor_id: str
+    run_id: Optional[str] = None
+    status: Optional[str] = None
+    duration_seconds: float = 0.0
+    items: int = 0
+    compute_units: Optional[float] = None
+
+# queued -> running -> succeeded | failed
+JobStatus = Literal["queued", "running", "succeeded", "failed"]
+
+class EnrichmentJob(BaseModel):
+    """Status and progress of a background enrichment job."""
+    job_id: str
+    status: JobStatus
+    total: int = 0  # unique links submitted
+    processed: int = 0  # leads enriched and scored so far
+    error: Optional[str] = None
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
 
 class ErrorHandling(BaseModel):
     error_code: int
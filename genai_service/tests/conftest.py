@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# Point the search cache at a throwaway file before any service module is imported,
+# so the suite never writes to the search_cache.db checked into the repo
+os.environ.setdefault("CACHE_DB_FILE", os.path.join(tempfile.mkdtemp(prefix="genai-tests-"), "search_cache.db"))
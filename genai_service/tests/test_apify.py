@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from genai_service.utils import apify
+from genai_service.utils.apify import ApifyError, enrich_profiles
+
+@pytest.mark.asyncio
+async def test_enrich_profiles_dedupes_and_shards(monkeypatch):
+    runs = []
+    in_flight = 0
+    peak = 0
+
+    async def fake_run_actor(run_input, actor_id, metadata=None):
+        nonlocal in_flight, peak
+        runs.append(list(run_input["urls"]))
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        for url in run_input["urls"]:
+            yield {"linkedinUrl": url}
+        in_flight -= 1
+
+    monkeypatch.setattr(apify, "_run_actor", fake_run_actor)
+
+    links = [f"https://www.linkedin.com/in/user-{i}" for i in range(7)]
+    links += [links[0] + "/", " " + links[1]]
+    items = [item async for item in enrich_profiles(links, shard_size=3, concurrency=2)]
+
+    assert len(items) == 7
+    assert sorted(len(urls) for urls in runs) == [1, 3, 3]
+    assert peak <= 2
+
+@pytest.mark.asyncio
+async def test_failed_shard_retries_only_missing_urls(monkeypatch):
+    runs = []
+
+    async def flaky_run_actor(run_input, actor_id, metadata=None):
+        urls = run_input["urls"]
+        runs.append(list(urls))
+        if len(runs) == 1:
+            yield {"linkedinUrl": urls[0]}
+            raise ApifyError("Actor failed: timeout")
+        for url in urls:
+            yield {"linkedinUrl": url}
+
+    monkeypatch.setattr(apify, "_run_actor", flaky_run_actor)
+
+    links = ["https://www.linkedin.com/in/a", "https://www.linkedin.com/in/b", "https://www.linkedin.com/in/c"]
+    items = [item async for item in enrich_profiles(links, shard_size=10, retries=1)]
+
+    assert [i["linkedinUrl"] for i in items] == links
+    assert runs == [links, links[1:]]
+
+@pytest.mark.asyncio
+async def test_enrich_profiles_raises_when_every_shard_fails(monkeypatch):
+    async def broken_run_actor(run_input, actor_id, metadata=None):
+        raise ApifyError("Apify quota exceeded.")
+        yield
+
+    monkeypatch.setattr(apify, "_run_actor", broken_run_actor)
+
+    with pytest.raises(ApifyError):
+        [item async for item in enrich_profiles(["https://www.linkedin.com/in/a"], retries=0)]
+
+@pytest.mark.asyncio
+async def test_links_of_a_failed_shard_are_reported(monkeypatch):
+    async def half_broken_run_actor(run_input, actor_id, metadata=None):
+        urls = run_input["urls"]
+        if "https://www.linkedin.com/in/d" in urls:
+            if urls[0] != "https://www.linkedin.com/in/d":
+                yield {"linkedinUrl": urls[0]}
+            raise ApifyError("Actor failed: timeout")
+        for url in urls:
+            yield {"linkedinUrl": url}
+
+    monkeypatch.setattr(apify, "_run_actor", half_broken_run_actor)
+
+    links = [f"https://www.linkedin.com/in/{name}" for name in "abcd"]
+    failed = []
+    items = [item async for item in enrich_profiles(links, shard_size=2, retries=1, failed=failed)]
+
+    assert [i["linkedinUrl"] for i in items] == links[:3]
+    assert failed == links[3:]
+
+@pytest.mark.asyncio
+async def test_every_shard_failing_is_reported_not_raised_when_collecting_failures(monkeypatch):
+    async def broken_run_actor(run_input, actor_id, metadata=None):
+        raise ApifyError("Apify quota exceeded.")
+        yield
+
+    monkeypatch.setattr(apify, "_run_actor", broken_run_actor)
+
+    failed = []
+    items = [item async for item in enrich_profiles(["https://www.linkedin.com/in/a"], retries=0, failed=failed)]
+
+    assert (items, failed) == ([], ["https://www.linkedin.com/in/a"])
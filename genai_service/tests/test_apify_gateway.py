@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from genai_service.utils.apify_gateway import ApifyGateway, ApifyRunTimeoutError
+
+class FakeApify:
+    """Stands in for ApifyClientAsync: runs report `statuses` one poll at a time."""
+    def __init__(self, statuses, items=()):
+        self.statuses = list(statuses)
+        self.items = list(items)
+        self.aborted = []
+
+    def actor(self, actor_id):
+        return self
+
+    def run(self, run_id):
+        return self
+
+    def dataset(self, dataset_id):
+        return self
+
+    def _run(self):
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        return {"id": "run-1", "status": status, "defaultDatasetId": "ds-1", "stats": {"computeUnits": 0.25}}
+
+    async def start(self, run_input):
+        return self._run()
+
+    async def get(self):
+        return self._run()
+
+    async def abort(self):
+        self.aborted.append("run-1")
+
+    async def iterate_items(self):
+        for item in self.items:
+            yield item
+
+def gateway_with(fake, timeout=5):
+    gateway = ApifyGateway(token="test", timeout=timeout, poll_interval=0.01)
+    gateway._client = fake
+    return gateway
+
+@pytest.mark.asyncio
+async def test_gateway_polls_until_done_and_reports_metadata():
+    fake = FakeApify(["READY", "RUNNING", "SUCCEEDED"], items=[{"n": 1}, {"n": 2}])
+    gateway = gateway_with(fake)
+    runs = []
+
+    items = [item async for item in gateway.run("actor", {}, metadata=runs)]
+
+    assert items == [{"n": 1}, {"n": 2}]
+    assert runs[0].status == "SUCCEEDED"
+    assert runs[0].items == 2 and runs[0].compute_units == 0.25
+    assert gateway.get_stats()["succeeded"] == 1
+
+@pytest.mark.asyncio
+async def test_gateway_aborts_runs_that_exceed_the_timeout():
+    fake = FakeApify(["RUNNING"])
+    gateway = gateway_with(fake, timeout=0.05)
+    runs = []
+
+    with pytest.raises(ApifyRunTimeoutError):
+        [item async for item in gateway.run("actor", {}, metadata=runs)]
+
+    assert fake.aborted == ["run-1"]
+    assert runs[0].status == "TIMED-OUT"
+    assert gateway.get_stats()["timed_out"] == 1
+
+@pytest.mark.asyncio
+async def test_gateway_aborts_the_remote_run_when_the_caller_is_cancelled():
+    fake = FakeApify(["RUNNING"])
+    gateway = gateway_with(fake)
+
+    async def consume():
+        return [item async for item in gateway.run("actor", {})]
+
+    task = asyncio.ensure_future(consume())
+    await asyncio.sleep(0.05)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert fake.aborted == ["run-1"]
+    assert gateway.get_stats()["aborted"] == 1
@@ -0,0 +1,142 @@
+import json
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from genai_service.utils import caching
+
+@pytest.fixture(autouse=True)
+def temp_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(caching, "DB_FILE", str(tmp_path / "cache.db"))
+    caching.init_db()
+    caching.search_l1.clear()
+
+def test_migration_runs_once_and_skips_big_files(monkeypatch):
+    assert caching.migrate_db()
+    assert caching.migrate_db()  # already migrated, nothing to do
+
+    monkeypatch.setattr(caching, "DB_FILE", caching.DB_FILE + ".big")
+    caching.init_db()
+    monkeypatch.setattr(caching, "CACHE_VACUUM_MIGRATION_MAX_BYTES", 0)
+    assert not caching.migrate_db()
+    assert caching.migrate_db(force=True)
+
+def test_score_key_ignores_formatting_but_not_model():
+    profile = {"name": "Jane Doe", "company": "Safaricom", "email": "jane@x.com"}
+    variant = {"name": "jane  DOE ", "company": "safaricom", "email": "other@y.com"}
+
+    key = caching.generate_score_key(profile, ["Data", "Engineer"], "model-a")
+
+    assert key == caching.generate_score_key(variant, ["engineer", "data"], "model-a")
+    assert key != caching.generate_score_key(profile, ["engineer", "data"], "model-b")
+    assert key != caching.generate_score_key({**profile, "company": "KCB"}, ["data", "engineer"], "model-a")
+
+def test_score_cache_round_trip_expiry_and_stats(monkeypatch):
+    hits_before = caching.SCORE_CACHE_STATS["hits"]
+    misses_before = caching.SCORE_CACHE_STATS["misses"]
+
+    assert caching.get_cached_score("abc") is None
+    caching.save_score("abc", 7, "model-a")
+    assert caching.get_cached_score("abc") == 7
+
+    class Later(datetime):
+        @classmethod
+        def now(cls):
+            return datetime.today() + timedelta(hours=caching.SCORE_CACHE_EXPIRY_HOURS + 1)
+
+    monkeypatch.setattr(caching, "datetime", Later)
+    assert caching.get_cached_score("abc") is None
+
+    assert caching.SCORE_CACHE_STATS["hits"] - hits_before == 1
+    assert caching.SCORE_CACHE_STATS["misses"] - misses_before == 2
+
+def test_profile_store_round_trip():
+    caching.save_profiles({"https://www.linkedin.com/in/a": {"firstName": "A"}})
+
+    found = caching.get_cached_profiles(["https://www.linkedin.com/in/a", "https://www.linkedin.com/in/b"])
+
+    assert found == {"https://www.linkedin.com/in/a": {"firstName": "A"}}
+
+def test_profile_store_normalizes_urls():
+    caching.save_profiles({"https://ke.linkedin.com/in/Variant/?trk=public_profile": {"firstName": "V"}})
+
+    found = caching.get_cached_profiles(["https://www.linkedin.com/in/variant/"])
+
+    assert found == {"https://www.linkedin.com/in/variant": {"firstName": "V"}}
+
+@pytest.mark.asyncio
+async def test_async_backend_batches_concurrent_writes(monkeypatch):
+    backend = caching.AsyncCacheBackend(read_pool_size=2, write_batch_size=100, flush_ms=5)
+    monkeypatch.setattr(caching, "cache_backend", backend)
+    batches = []
+    run_batch = backend._run_batch
+    monkeypatch.setattr(backend, "_run_batch", lambda batch: batches.append(len(batch)) or run_batch(batch))
+
+    await asyncio.gather(*[caching.save_score_async(f"key-{i}", i % 10 + 1, "model-a") for i in range(20)])
+
+    assert batches == [20]
+    assert await caching.get_cached_score_async("key-3") == 4
+    assert caching.get_cached_score("key-3") == 4
+
+    await caching.save_to_cache_async("python", "Kenya", 1, [{"name": "Jane"}])
+    assert [p["name"] for p in await caching.get_cached_results_async("python", "Kenya", 1)] == ["Jane"]
+    await backend.close()
+
+@pytest.mark.asyncio
+async def test_cache_manager_sweeps_expired_and_evicts_lru(monkeypatch):
+    backend = caching.AsyncCacheBackend(flush_ms=0)
+    manager = caching.CacheManager(backend, max_rows=2)
+    monkeypatch.setattr(caching, "cache_manager", manager)
+
+    for page in (1, 2, 3):
+        caching.save_to_cache("python", "Kenya", page, [{"name": f"Lead {page}"}])
+    caching.save_score("old-score", 5, "model-a")
+    conn = caching._connect()
+    stale = (datetime.now() - timedelta(hours=caching.CACHE_EXPIRY_HOURS + 1)).isoformat()
+    conn.execute("UPDATE searches SET timestamp = ? WHERE page = 3", (stale,))
+    conn.execute("UPDATE scores SET timestamp = ?", ("2000-01-01T00:00:00",))
+    conn.commit()
+    conn.close()
+
+    # Page 1 was written first but read recently, so page 2 is the LRU victim
+    caching.save_to_cache("python", "Kenya", 4, [{"name": "Lead 4"}])
+    assert caching.get_cached_results("python", "Kenya", 1) is not None
+
+    result = await manager.sweep()
+
+    assert result == {"expired_removed": 2, "evictions": 1}
+    assert caching.get_cached_results("python", "Kenya", 1) is not None
+    assert caching.get_cached_results("python", "Kenya", 2) is None
+
+    stats = await manager.get_stats()
+    assert stats["rows"] == {"searches": 2, "scores": 0, "profiles": 0}
+    assert stats["evictions"] == 1
+    await backend.close()
+
+def test_l1_serves_hot_search_keys_without_disk(monkeypatch):
+    caching.save_to_cache("python developer", "Kenya", 1, [{"name": "Jane"}])
+
+    def no_disk(*args, **kwargs):
+        raise AssertionError("hot key went to SQLite")
+
+    monkeypatch.setattr(caching, "_connect", no_disk)
+    assert [p["name"] for p in caching.get_cached_results("Python Developer ", "kenya", 1)] == ["Jane"]
+
+    lru = caching.MemoryLRU(max_entries=2)
+    for key in ("a", "b", "c"):
+        lru.put(key, [key])
+    assert lru.get("a") is None
+    assert lru.get("c") == ["c"]
+    assert lru.get_stats()["evictions"] == 1
+
+@pytest.mark.asyncio
+async def test_rows_are_validated_on_save_and_served_as_stored_json():
+    await caching.save_to_cache_async("python", "Kenya", 1, [{"name": "Jane", "score": "8"}, {"score": 3}])
+    caching.search_l1.clear()
+
+    raw = await caching.get_cached_json_async("python", "Kenya", 1)
+
+    # The row without a name is dropped and the score is coerced before it is stored
+    assert json.loads(raw) == [{"name": "Jane", "linkedin_url": None, "current_role": None, "education": None,
+                                "country": None, "email": None, "score": 8}]
+    # The second read comes from memory, still as the same bytes
+    assert await caching.get_cached_json_async("python", "Kenya", 1) == raw
@@ -0,0 +1,31 @@
+from genai_service.utils.dedup import DedupIndex, SearchDedup, lead_keys
+
+def test_lead_keys_cover_url_variants_and_name_plus_company():
+    profile = {"name": "Jane  Doe", "company": "Safaricom PLC", "linkedin_url": "https://ke.linkedin.com/in/JaneDoe/?trk=x"}
+
+    assert lead_keys(profile) == ["url:https://www.linkedin.com/in/janedoe", "name:jane doe|safaricom"]
+    assert lead_keys({"name": "LinkedIn User", "company": "Acme", "linkedin_url": "LinkedIn URL unavailable"}) == []
+    # Real values that merely contain "unavailable" still identify the lead
+    assert lead_keys({"name": "Una Unavailable", "company": "Acme", "linkedin_url": "https://www.linkedin.com/in/unavailable-una"}) == [
+        "url:https://www.linkedin.com/in/unavailable-una", "name:una unavailable|acme"]
+
+def test_index_keeps_each_lead_on_the_page_that_first_returned_it():
+    index = DedupIndex()
+    page_one = [{"name": "Jane Doe", "company": "Safaricom", "linkedin_url": "https://www.linkedin.com/in/jane"}]
+    page_two = [
+        {"name": "jane doe", "company": "Safaricom Ltd", "linkedin_url": "https://www.linkedin.com/in/jane-doe-1"},
+        {"name": "John Roe", "linkedin_url": "https://www.linkedin.com/in/john"},
+        {"name": "John Roe", "linkedin_url": "https://www.linkedin.com/in/john/"},
+    ]
+
+    assert index.dedupe(page_one, owner=1) == (page_one, 0)
+    assert index.dedupe(page_two, owner=2) == ([page_two[1]], 2)
+    assert index.dedupe(page_one, owner=1) == (page_one, 0)
+
+def test_search_dedup_forgets_the_least_recently_used_search():
+    searches = SearchDedup(max_searches=1)
+    first = searches.for_search("python", "Kenya")
+
+    assert searches.for_search(" Python", "kenya") is first
+    searches.for_search("rust", "Kenya")
+    assert searches.for_search("python", "Kenya") is not first
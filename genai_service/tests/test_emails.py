@@ -0,0 +1,22 @@
+from genai_service.utils.emails import clean_company_name, generate_emails, school_domain
+
+def test_generate_emails_falls_back_from_company_to_school_to_gmail():
+    leads = [
+        {"name": "Jane Wanjiru", "company": "Safaricom PLC", "education": "Strathmore University"},
+        {"name": "Brian O'Neil", "company": "Company unavailable", "education": [{"school": "University of Nairobi"}]},
+        {"name": "Amina", "company": "Freelance", "education": "Not available"},
+        {"name": "", "company": "Acme Widgets Ltd."},
+    ]
+
+    assert generate_emails(leads) == [
+        "jane.wanjiru@safaricom.co.ke",
+        "brian.oneil@uonbi.ac.ke",
+        "amina@gmail.com",
+        "user@acmewidgets.com",
+    ]
+
+def test_normalization_strips_trailing_legal_suffixes_only():
+    assert clean_company_name("Co-operative Bank of Kenya Ltd") == "cooperativebankofkenya"
+    assert clean_company_name("Johnson & Johnson, Inc.") == "johnsonandjohnson"
+    assert clean_company_name("Limited") == "limited"
+    assert school_domain("Stanford University") == "stanford.edu"
@@ -0,0 +1,48 @@
+import csv
+import gzip
+import io
+import json
+from genai_service.utils.export import PROFILE_COLUMNS, export_chunks, export_text, write_export
+from genai_service.models.schemas import GeneralProfile
+
+LEADS = [
+    GeneralProfile(name="Jane Doe", linkedin_url="https://www.linkedin.com/in/jane", current_role="Engineer, Data", score=8),
+    {"name": "John Roe", "linkedin_url": "https://www.linkedin.com/in/john", "score": 6},
+]
+
+def test_csv_export_quotes_fields_and_accepts_models_and_dicts():
+    rows = list(csv.reader(io.StringIO(b"".join(export_chunks(LEADS)).decode())))
+
+    assert rows[0][:2] == ["Name", "LinkedIn URL"]
+    assert rows[1][2] == "Engineer, Data"
+    assert [row[0] for row in rows[1:]] == ["Jane Doe", "John Roe"]
+
+def test_ndjson_export_is_gzipped_on_request():
+    body = gzip.decompress(b"".join(export_chunks(LEADS, "ndjson", gzip=True)))
+
+    assert [json.loads(line)["name"] for line in body.splitlines()] == ["Jane Doe", "John Roe"]
+
+def test_export_is_produced_in_bounded_chunks_from_a_generator():
+    leads = ({"name": f"Lead {n}", "score": n % 10} for n in range(5000))
+    chunks = list(export_chunks(leads, chunk_bytes=1024))
+
+    assert len(chunks) > 50
+    assert max(len(chunk) for chunk in chunks) < 1024 + 200
+
+def test_write_export_writes_the_file(tmp_path):
+    path = tmp_path / "leads.csv"
+    write_export(LEADS, str(path))
+
+    assert path.read_text().count("\n") == 3
+
+def test_profile_export_keeps_every_general_profile_field():
+    rows = list(csv.reader(io.StringIO(b"".join(export_chunks(LEADS[:1], columns=PROFILE_COLUMNS)).decode())))
+
+    assert rows[0] == list(GeneralProfile.model_fields)
+    assert dict(zip(rows[0], rows[1]))["current_role"] == "Engineer, Data"
+
+def test_export_text_matches_the_legacy_csv_content():
+    text = export_text(LEADS)
+
+    assert text.splitlines()[0] == "Name,LinkedIn URL,Current Role,University,Country,Email,Score"
+    assert text == b"".join(export_chunks(LEADS)).decode()
@@ -0,0 +1,468 @@
+import sys
+import asyncio
+import pytest
+from genai_service.core import extraction
+from genai_service.core.extraction import MainPipeline
+from genai_service.utils.apify import ApifyError
+from genai_service.models.schemas import GeneralProfile
+
+class ReversedStage:
+    """Finishes the last profile first, like a slow LLM call on the first lead would."""
+    async def stream(self, profiles, criteria, score_mode="llm", top_k=None):
+        for idx in reversed(range(len(profiles))):
+            yield idx, GeneralProfile(name=profiles[idx]["name"], score=idx + 1)
+
+@pytest.fixture
+def saved(monkeypatch):
+    saved = {}
+
+    async def fake_search(self, keywords, country, page):
+        return [{"name": "First"}, {"name": "Second"}, {"name": "Third"}]
+
+    monkeypatch.setattr(MainPipeline, "_search_profiles", fake_search)
+    async def no_cache(*args):
+        return None
+
+    async def save(keywords, country, page, profiles, mode):
+        saved.update(profiles=profiles)
+
+    monkeypatch.setattr(extraction, "get_cached_results_async", no_cache)
+    monkeypatch.setattr(extraction, "peek_cached_results_async", no_cache)
+    monkeypatch.setattr(extraction, "save_to_cache_async", save)
+    monkeypatch.setattr(extraction, "PREFETCH_ENABLED", False)
+    return saved
+
+@pytest.mark.asyncio
+async def test_stream_pipeline_emits_leads_as_scored_then_summary(saved):
+    pipeline = MainPipeline(scoring_stage=ReversedStage())
+
+    frames = [frame async for frame in pipeline.stream_pipeline(keywords="python developer", country="Kenya")]
+
+    assert [f["index"] for f in frames[:-1]] == [2, 1, 0]
+    assert frames[-1]["type"] == "summary"
+    assert frames[-1]["count"] == 3
+    assert [p["name"] for p in saved["profiles"]] == ["First", "Second", "Third"]
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_searches_share_one_run(saved, monkeypatch):
+    searches = []
+
+    async def slow_search(self, keywords, country, page):
+        searches.append(keywords)
+        await asyncio.sleep(0.05)
+        return [{"name": "First"}, {"name": "Second"}]
+
+    monkeypatch.setattr(MainPipeline, "_search_profiles", slow_search)
+    pipeline = MainPipeline(scoring_stage=ReversedStage())
+    pipeline.scoring_stage.run = lambda profiles, *args: asyncio.sleep(0, [GeneralProfile(name=p["name"]) for p in profiles])
+
+    results = await asyncio.gather(*[pipeline.run_pipeline(keywords="python developer", country="Kenya") for _ in range(5)])
+
+    assert searches == ["python developer"]
+    assert all([lead.name for lead in leads] == ["First", "Second"] for leads in results)
+    assert pipeline._in_flight == {}
+
+@pytest.mark.asyncio
+async def test_shared_run_is_cancelled_when_its_last_waiter_leaves(saved, monkeypatch):
+    cancelled = []
+
+    async def hanging_search(self, keywords, country, page):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(page)
+            raise
+
+    monkeypatch.setattr(MainPipeline, "_search_profiles", hanging_search)
+    pipeline = MainPipeline(scoring_stage=ReversedStage())
+    first = asyncio.ensure_future(pipeline.run_pipeline(keywords="python developer"))
+    second = asyncio.ensure_future(pipeline.run_pipeline(keywords="python developer"))
+    await asyncio.sleep(0.01)
+
+    first.cancel()
+    await asyncio.sleep(0.01)
+    assert cancelled == [] and pipeline._in_flight
+
+    second.cancel()
+    await asyncio.gather(first, second, return_exceptions=True)
+    await asyncio.sleep(0.01)
+    assert cancelled == [1]
+    assert pipeline._in_flight == {}
+
+@pytest.mark.asyncio
+async def test_cache_miss_prefetches_next_page_within_budget(saved, monkeypatch):
+    searched_pages = []
+
+    async def fake_search(self, keywords, country, page):
+        searched_pages.append(page)
+        await asyncio.sleep(0.01)
+        return [{"name": f"Page {page}"}]
+
+    monkeypatch.setattr(MainPipeline, "_search_profiles", fake_search)
+    monkeypatch.setattr(extraction, "PREFETCH_ENABLED", True)
+    monkeypatch.setattr(extraction, "PREFETCH_MAX_IN_FLIGHT", 1)
+    pipeline = MainPipeline(scoring_stage=ReversedStage())
+    pipeline.scoring_stage.run = lambda profiles, *args: asyncio.sleep(0, [GeneralProfile(name=p["name"]) for p in profiles])
+
+    await pipeline.run_pipeline(keywords="python developer", page=1)
+    assert pipeline.schedule_prefetch("python developer", None, 7) is None  # budget taken by page 2
+    await asyncio.gather(*pipeline._prefetches)
+    assert searched_pages == [1, 2]
+    assert saved["profiles"] == [GeneralProfile(name="Page 2").model_dump()]
+
+    await pipeline.run_pipeline(keywords="python developer", page=3, prefetch=False)
+    assert not pipeline._prefetches
+
+    pipeline.schedule_prefetch("python developer", None, 9)
+    await pipeline.cancel_prefetches()
+    assert searched_pages[-1] == 3 and not pipeline._prefetches
+
+@pytest.mark.asyncio
+async def test_validate_request_rejects_invalid_link(saved):
+    with pytest.raises(ValueError):
+        MainPipeline(scoring_stage=ReversedStage()).validate_request(link="https://example.com/post/1")
+
+class RecordingStage:
+    concurrency = 2
+    batch_size = 1
+
+    def __init__(self, events):
+        self.events = events
+
+    async def score_chunk(self, indexes, chunk, criteria, score_mode="llm"):
+        self.events.append(f"score {indexes[0]}")
+        await asyncio.sleep(0.01)
+        return [7 for _ in chunk]
+
+@pytest.fixture
+def profile_store(monkeypatch):
+    store = {}
+
+    async def lookup(urls):
+        return {u: store[u] for u in urls if u in store}
+
+    async def save(profiles):
+        store.update(profiles)
+
+    monkeypatch.setattr(extraction, "get_cached_profiles_async", lookup)
+    monkeypatch.setattr(extraction, "save_profiles_async", save)
+    return store
+
+def apify_item(first, last):
+    return {"firstName": first, "lastName": last, "linkedinUrl": f"https://www.linkedin.com/in/{first.lower()}/",
+            "experience": [{"position": "Engineer", "companyName": "Acme"}]}
+
+@pytest.mark.asyncio
+async def test_enrichment_scores_while_apify_is_still_fetching(monkeypatch, profile_store):
+    events = []
+
+    async def slow_enrich(links, metadata=None, failed=None):
+        for idx, link in enumerate(links):
+            await asyncio.sleep(0.02)
+            events.append(f"fetch {idx}")
+            yield apify_item(link.rsplit("/", 1)[-1].title(), "Doe")
+
+    monkeypatch.setattr(extraction, "enrich_profiles", slow_enrich)
+
+    links = ["https://www.linkedin.com/in/ann", "https://www.linkedin.com/in/ben", "https://www.linkedin.com/in/cat"]
+    result = await MainPipeline(scoring_stage=RecordingStage(events)).run_enrichment(links)
+
+    assert events.index("score 0") < events.index("fetch 2")
+    assert result["count"] == 3
+    assert [p.name for p in result["data"]] == ["Ann Doe", "Ben Doe", "Cat Doe"]
+    assert "csv_content" not in result
+
+@pytest.mark.asyncio
+async def test_enrichment_reports_nothing_scraped(monkeypatch, profile_store):
+    async def empty_enrich(links, metadata=None, failed=None):
+        return
+        yield
+
+    monkeypatch.setattr(extraction, "enrich_profiles", empty_enrich)
+
+    result = await MainPipeline(scoring_stage=RecordingStage([])).run_enrichment(["https://www.linkedin.com/in/ann"])
+    assert result == {"error": "Could not scrape details."}
+
+@pytest.mark.asyncio
+async def test_enrichment_serves_known_urls_from_profile_store(monkeypatch, profile_store):
+    profile_store["https://www.linkedin.com/in/ann"] = apify_item("Ann", "Doe")
+    requested = []
+
+    async def fake_enrich(links, metadata=None, failed=None):
+        requested.extend(links)
+        for link in links:
+            yield apify_item(link.rsplit("/", 1)[-1].title(), "Doe")
+
+    monkeypatch.setattr(extraction, "enrich_profiles", fake_enrich)
+
+    links = ["https://ke.linkedin.com/in/Ann/?trk=public_profile", "https://www.linkedin.com/in/ben"]
+    result = await MainPipeline(scoring_stage=RecordingStage([])).run_enrichment(links)
+
+    assert requested == ["https://www.linkedin.com/in/ben"]
+    assert (result["cache_hits"], result["fetched"], result["count"]) == (1, 1, 2)
+    assert "https://www.linkedin.com/in/ben" in profile_store
+
+@pytest.mark.asyncio
+async def test_enrichment_reports_links_apify_failed(monkeypatch, profile_store):
+    async def partial_enrich(links, metadata=None, failed=None):
+        yield apify_item("Ann", "Doe")
+        failed.extend(links[1:])
+
+    monkeypatch.setattr(extraction, "enrich_profiles", partial_enrich)
+
+    links = ["https://www.linkedin.com/in/ann", "https://www.linkedin.com/in/ben"]
+    result = await MainPipeline(scoring_stage=RecordingStage([])).run_enrichment(links)
+
+    assert (result["count"], result["failed"]) == (1, 1)
+    assert result["failed_links"] == ["https://www.linkedin.com/in/ben"]
+
+@pytest.mark.asyncio
+async def test_profile_scraped_under_an_apify_url_variant_is_found_again(monkeypatch):
+    store = sys.modules[extraction.get_cached_profiles_async.__module__]
+    store.init_db()
+    requested = []
+
+    async def lookup(urls):
+        return store.get_cached_profiles(urls)
+
+    async def save(profiles):
+        store.save_profiles(profiles)
+
+    async def variant_enrich(links, metadata=None, failed=None):
+        requested.extend(links)
+        for link in links:
+            yield {**apify_item("Cleo", "Doe"), "linkedinUrl": "https://ke.linkedin.com/in/Cleo/?trk=public_profile"}
+
+    monkeypatch.setattr(extraction, "get_cached_profiles_async", lookup)
+    monkeypatch.setattr(extraction, "save_profiles_async", save)
+    monkeypatch.setattr(extraction, "enrich_profiles", variant_enrich)
+
+    pipeline = MainPipeline(scoring_stage=RecordingStage([]))
+    await pipeline.run_enrichment(["https://www.linkedin.com/in/cleo"])
+    result = await pipeline.run_enrichment(["https://linkedin.com/in/cleo/"])
+
+    assert requested == ["https://www.linkedin.com/in/cleo"]
+    assert (result["cache_hits"], result["fetched"]) == (1, 0)
+
+@pytest.mark.asyncio
+async def test_stored_leads_survive_every_apify_shard_failing(monkeypatch, profile_store):
+    profile_store["https://www.linkedin.com/in/ann"] = apify_item("Ann", "Doe")
+
+    async def broken_run_actor(run_input, actor_id, metadata=None):
+        raise ApifyError("Apify quota exceeded.")
+        yield
+
+    monkeypatch.setattr(sys.modules[extraction.enrich_profiles.__module__], "_run_actor", broken_run_actor)
+    monkeypatch.setattr(sys.modules[extraction.enrich_profiles.__module__], "ENRICH_SHARD_RETRIES", 0)
+
+    pipeline = MainPipeline(scoring_stage=RecordingStage([]))
+    result = await pipeline.run_enrichment(["https://www.linkedin.com/in/ann", "https://www.linkedin.com/in/ben"])
+
+    assert (result["count"], result["cache_hits"], result["fetched"]) == (1, 1, 0)
+    assert result["failed_links"] == ["https://www.linkedin.com/in/ben"]
+    assert await pipeline.run_enrichment(["https://www.linkedin.com/in/ben"]) == {"error": "Could not scrape details."}
+
+@pytest.mark.asyncio
+async def test_a_miss_the_caller_already_checked_is_looked_up_once(saved, monkeypatch):
+    lookups = []
+
+    async def lookup(*args):
+        lookups.append(args)
+        return None
+
+    monkeypatch.setattr(extraction, "get_cached_json_async", lookup)
+    monkeypatch.setattr(extraction, "get_cached_results_async", lookup)
+    pipeline = MainPipeline(scoring_stage=ReversedStage())
+    pipeline.scoring_stage.run = lambda profiles, *args: asyncio.sleep(0, [GeneralProfile(name=p["name"]) for p in profiles])
+
+    assert await pipeline.cached_json("python", "Kenya", 1) is None
+    results = await pipeline.run_pipeline(keywords="python", country="Kenya", page=1, prefetch=False, cache_checked=True)
+
+    assert len(results) == 3
+    assert len(lookups) == 1
+
+def test_search_window_aligns_pages_to_one_actor_run():
+    assert extraction.search_window(1, 5, 50, 25) == (1, 1, 0, 50)
+    assert extraction.search_window(10, 5, 50, 25) == (1, 1, 0, 50)
+    assert extraction.search_window(11, 5, 50, 25) == (11, 3, 0, 50)
+    # Windows that don't line up with the actor's pages skip into the first one
+    assert extraction.search_window(5, 5, 20, 25) == (5, 1, 20, 40)
+
+@pytest.mark.asyncio
+async def test_window_mode_fetches_once_and_caches_every_page(saved, monkeypatch):
+    runs = []
+    cache = {}
+
+    async def fake_apify_search(keywords, max_items, start_page):
+        runs.append((start_page, max_items))
+        return [{"name": f"Lead {i}"} for i in range(1, 10)]
+
+    async def lookup(keywords, country, page, mode):
+        return cache.get(page)
+
+    async def save(keywords, country, page, profiles, mode):
+        cache[page] = profiles
+
+    monkeypatch.setattr(extraction, "SEARCH_PAGE_SIZE", 3)
+    monkeypatch.setattr(extraction, "SEARCH_WINDOW_SIZE", 12)
+    monkeypatch.setattr(extraction, "apify_search", fake_apify_search)
+    monkeypatch.setattr(extraction, "apify_lead_presentation", lambda items: items)
+    monkeypatch.setattr(extraction, "get_cached_results_async", lookup)
+    monkeypatch.setattr(extraction, "save_to_cache_async", save)
+    monkeypatch.setattr(extraction, "PREFETCH_ENABLED", True)
+    pipeline = MainPipeline(scoring_stage=ReversedStage())
+    pipeline.scoring_stage.run = lambda profiles, *args: asyncio.sleep(0, [GeneralProfile(name=p["name"]) for p in profiles])
+
+    first, second = await asyncio.gather(pipeline.run_pipeline(keywords="python", page=2),
+                                         pipeline.run_pipeline(keywords="python", page=3))
+    await asyncio.gather(*pipeline._prefetches)
+    later = await pipeline.run_pipeline(keywords="python", page=1)
+
+    assert runs == [(1, 12)]
+    assert [lead.name for lead in first] == ["Lead 4", "Lead 5", "Lead 6"]
+    assert [lead.name for lead in second] == ["Lead 7", "Lead 8", "Lead 9"]
+    assert [lead.name for lead in later] == ["Lead 1", "Lead 2", "Lead 3"]
+    assert cache[4] == []
+
+@pytest.mark.asyncio
+async def test_window_pages_over_the_prefetch_budget_are_kept_unscored(saved, monkeypatch):
+    runs = []
+    scored = []
+    cache = {}
+
+    async def fake_apify_search(keywords, max_items, start_page):
+        runs.append((start_page, max_items))
+        return [{"name": f"Lead {i}"} for i in range(1, 13)]
+
+    async def lookup(keywords, country, page, mode):
+        return cache.get((keywords, page))
+
+    async def save(keywords, country, page, profiles, mode):
+        cache[(keywords, page)] = profiles
+
+    def score(profiles, *args):
+        scored.append([p["name"] for p in profiles])
+        return asyncio.sleep(0, [GeneralProfile(name=p["name"]) for p in profiles])
+
+    monkeypatch.setattr(extraction, "SEARCH_PAGE_SIZE", 3)
+    monkeypatch.setattr(extraction, "SEARCH_WINDOW_SIZE", 12)
+    monkeypatch.setattr(extraction, "PREFETCH_ENABLED", True)
+    monkeypatch.setattr(extraction, "PREFETCH_MAX_IN_FLIGHT", 1)
+    monkeypatch.setattr(extraction, "apify_search", fake_apify_search)
+    monkeypatch.setattr(extraction, "apify_lead_presentation", lambda items: items)
+    monkeypatch.setattr(extraction, "get_cached_results_async", lookup)
+    monkeypatch.setattr(extraction, "save_to_cache_async", save)
+    pipeline = MainPipeline(scoring_stage=ReversedStage())
+    pipeline.scoring_stage.run = score
+
+    await pipeline.run_pipeline(keywords="python", page=1, prefetch=False)
+    assert not pipeline._prefetches and list(cache) == [("python", 1)]
+
+    later = await pipeline.run_pipeline(keywords="python", page=4, prefetch=False)
+    assert [lead.name for lead in later] == ["Lead 10", "Lead 11", "Lead 12"]
+    assert runs == [(1, 12)] and len(scored) == 2
+
+    await pipeline.run_pipeline(keywords="java", page=1)
+    await asyncio.gather(*pipeline._prefetches)
+    assert len(runs) == 2 and len(scored) == 4  # page 1 and one background page, two pages kept
+    assert [key for key in pipeline._window_pages if key[0] == "java"] == [("java", "", 3), ("java", "", 4)]
+
+@pytest.mark.asyncio
+async def test_discover_mode_only_enriches_the_best_ranked_candidates(saved, monkeypatch, profile_store):
+    enriched = []
+
+    countries = []
+
+    async def fake_discover(keywords, country, pages, start_page):
+        countries.append(country)
+        return [
+            {"name": "Chef", "current_role": "Head Chef", "linkedin_url": "https://ke.linkedin.com/in/chef"},
+            {"name": "Dev", "current_role": "Python Developer", "linkedin_url": "https://www.linkedin.com/in/dev/"},
+            {"name": "Dup", "current_role": "Python Developer", "linkedin_url": "https://linkedin.com/in/dev"},
+            {"name": "Nobody", "current_role": "Python Developer", "linkedin_url": None},
+        ]
+
+    async def fake_enrich(links, metadata=None, failed=None):
+        enriched.extend(links)
+        for link in links:
+            yield {"firstName": link.rsplit("/", 1)[-1], "lastName": "X", "linkedinUrl": link}
+
+    monkeypatch.setattr(extraction.serper_client, "discover", fake_discover)
+    monkeypatch.setattr(extraction, "enrich_profiles", fake_enrich)
+    monkeypatch.setattr(extraction, "DISCOVER_ENRICH_TOP_N", 1)
+    pipeline = MainPipeline(scoring_stage=extraction.ScoringStage(concurrency=2, timeout=1))
+
+    results = await pipeline.run_pipeline(keywords="python developer", country="Kenya", score_mode="local", source="discover")
+
+    assert enriched == ["https://www.linkedin.com/in/dev"]
+    assert [lead.linkedin_url for lead in results] == ["https://www.linkedin.com/in/dev"]
+    assert saved["profiles"][0]["name"] == "dev X"
+
+    await pipeline.run_pipeline(keywords="python developer", country=None, score_mode="local", source="discover")
+    assert countries == ["Kenya", None]
+
+@pytest.mark.asyncio
+async def test_later_pages_skip_leads_an_earlier_page_returned(saved, monkeypatch):
+    pages = {
+        1: [{"name": "Ann", "linkedin_url": "https://www.linkedin.com/in/ann"}, {"name": "Ben", "linkedin_url": "https://www.linkedin.com/in/ben"}],
+        2: [{"name": "Ben", "linkedin_url": "https://ke.linkedin.com/in/ben/"}, {"name": "Cat", "linkedin_url": "https://www.linkedin.com/in/cat"},
+            {"name": "Cat", "linkedin_url": "https://www.linkedin.com/in/cat?trk=x"}],
+    }
+
+    async def paged_search(self, keywords, country, page):
+        return pages[page]
+
+    monkeypatch.setattr(MainPipeline, "_search_profiles", paged_search)
+    pipeline = MainPipeline(scoring_stage=ReversedStage())
+    pipeline.scoring_stage.run = lambda profiles, *args: asyncio.sleep(0, [GeneralProfile(name=p["name"]) for p in profiles])
+
+    first = await pipeline.run_pipeline(keywords="python developer", page=1)
+    with extraction.track_duplicates() as duplicates:
+        second = await pipeline.run_pipeline(keywords="python developer", page=2)
+    # The same page fetched again keeps its own leads
+    again = await pipeline.run_pipeline(keywords="python developer", page=1)
+
+    assert [lead.name for lead in second] == ["Cat"]
+    assert duplicates["removed"] == 2
+    assert [lead.name for lead in again] == [lead.name for lead in first] == ["Ann", "Ben"]
+
+@pytest.mark.asyncio
+async def test_fresh_worker_seeds_dedup_from_cached_earlier_pages(saved, monkeypatch):
+    cached_page_one = [GeneralProfile(name="Ann", linkedin_url="https://www.linkedin.com/in/ann").model_dump()]
+
+    async def peek(keywords, country, page, mode):
+        return cached_page_one if page == 1 else None
+
+    async def page_two(self, keywords, country, page):
+        return [{"name": "Ann", "linkedin_url": "https://www.linkedin.com/in/ann/"}, {"name": "Cat", "linkedin_url": "https://www.linkedin.com/in/cat"}]
+
+    monkeypatch.setattr(extraction, "peek_cached_results_async", peek)
+    monkeypatch.setattr(MainPipeline, "_search_profiles", page_two)
+    # A new process: page 1 was cached by an earlier run and never went through this index
+    pipeline = MainPipeline(scoring_stage=ReversedStage())
+    pipeline.scoring_stage.run = lambda profiles, *args: asyncio.sleep(0, [GeneralProfile(name=p["name"]) for p in profiles])
+
+    second = await pipeline.run_pipeline(keywords="python developer", page=2)
+
+    assert [lead.name for lead in second] == ["Cat"]
+
+@pytest.mark.asyncio
+async def test_enrichment_collapses_duplicates_before_scraping_and_scoring(monkeypatch, profile_store):
+    events = []
+    requested = []
+
+    async def fake_enrich(links, metadata=None, failed=None):
+        requested.extend(links)
+        for link in links:
+            # /in/ann-doe is another URL of the same person
+            yield apify_item("Ann", "Doe") if "ann" in link else apify_item("Ben", "Doe")
+
+    monkeypatch.setattr(extraction, "enrich_profiles", fake_enrich)
+
+    links = ["https://www.linkedin.com/in/ann", "https://ke.linkedin.com/in/ann/", "https://www.linkedin.com/in/ann-doe",
+             "https://www.linkedin.com/in/ben"]
+    result = await MainPipeline(scoring_stage=RecordingStage(events)).run_enrichment(links)
+
+    assert len(requested) == 3
+    assert len(events) == 2  # one scoring call per person
+    assert result["count"] == 2 and result["duplicates_removed"] == 2
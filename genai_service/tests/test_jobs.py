@@ -0,0 +1,107 @@
+import asyncio
+import pytest
+from genai_service.core import jobs
+from genai_service.core.jobs import EnrichmentJobQueue, JobStore, JobNotFinishedError
+from genai_service.models.schemas import EnrichmentRequest, GeneralProfile
+
+class FakePipeline:
+    def __init__(self, release=None):
+        self.release = release
+        self.calls = []
+
+    async def run_enrichment(self, links, score_mode="llm", prefilter_top_k=None, on_lead=None):
+        self.calls.append(links)
+        for n in range(1, len(links) + 1):
+            on_lead(n)
+        if self.release is not None:
+            await self.release.wait()
+        leads = [GeneralProfile(name=f"Lead {n}", linkedin_url=link, score=7) for n, link in enumerate(links)]
+        return {"count": len(leads), "data": leads, "cache_hits": 0, "fetched": len(leads)}
+
+async def wait_for_status(queue, job_id, status):
+    for _ in range(200):
+        job = await queue.status(job_id)
+        if job.status == status:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job never reached {status}")
+
+@pytest.mark.asyncio
+async def test_job_reports_progress_and_serves_results(tmp_path):
+    release = asyncio.Event()
+    queue = EnrichmentJobQueue(FakePipeline(release), JobStore(str(tmp_path / "jobs.db")), concurrency=1)
+    await queue.start()
+    links = ["https://www.linkedin.com/in/a", "https://www.linkedin.com/in/b"]
+
+    job = await queue.submit(EnrichmentRequest(links=links))
+    assert job.status == "queued" and job.total == 2
+
+    running = await wait_for_status(queue, job.job_id, "running")
+    assert running.processed == 2
+    with pytest.raises(JobNotFinishedError):
+        await queue.result(job.job_id)
+
+    release.set()
+    done = await wait_for_status(queue, job.job_id, "succeeded")
+    result = await queue.result(job.job_id)
+    await queue.stop()
+
+    assert done.processed == 2 and done.finished_at
+    assert [lead["name"] for lead in result["data"]] == ["Lead 0", "Lead 1"]
+
+@pytest.mark.asyncio
+async def test_unfinished_jobs_run_again_after_a_restart(tmp_path):
+    db_file = str(tmp_path / "jobs.db")
+    stuck = EnrichmentJobQueue(FakePipeline(asyncio.Event()), JobStore(db_file), concurrency=1)
+    await stuck.start()
+    job = await stuck.submit(EnrichmentRequest(links=["https://www.linkedin.com/in/a"]))
+    await wait_for_status(stuck, job.job_id, "running")
+    await stuck.stop()  # process goes down mid-job
+
+    pipeline = FakePipeline()
+    restarted = EnrichmentJobQueue(pipeline, JobStore(db_file), concurrency=1)
+    await restarted.start()
+    done = await wait_for_status(restarted, job.job_id, "succeeded")
+    await restarted.stop()
+
+    assert done.processed == 1
+    assert pipeline.calls == [["https://www.linkedin.com/in/a"]]
+
+@pytest.mark.asyncio
+async def test_running_jobs_are_only_taken_over_once_their_lease_expires(tmp_path, monkeypatch):
+    db_file = str(tmp_path / "jobs.db")
+    live = EnrichmentJobQueue(FakePipeline(asyncio.Event()), JobStore(db_file), concurrency=1)
+    await live.start()
+    job = await live.submit(EnrichmentRequest(links=["https://www.linkedin.com/in/a"]))
+    await wait_for_status(live, job.job_id, "running")
+
+    # A second worker on the same jobs DB leaves the live worker's job alone
+    pipeline = FakePipeline()
+    other = EnrichmentJobQueue(pipeline, JobStore(db_file), concurrency=1)
+    await other.start()
+    await asyncio.sleep(0.05)
+    assert pipeline.calls == []
+    assert (await other.status(job.job_id)).status == "running"
+
+    # The live worker stops renewing its lease
+    monkeypatch.setattr(jobs, "JOB_LEASE_SECONDS", 0)
+    await other.sweep()
+    done = await wait_for_status(other, job.job_id, "succeeded")
+    await live.stop()
+    await other.stop()
+
+    assert done.processed == 1
+    assert pipeline.calls == [["https://www.linkedin.com/in/a"]]
+
+@pytest.mark.asyncio
+async def test_finished_jobs_are_purged_after_their_ttl(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    await store.create("old", {"links": []}, 0)
+    await store.create("waiting", {"links": []}, 0)
+    assert await store.claim("old")
+    await store.finish("old", {"count": 0, "data": []})
+
+    assert await store.purge(ttl_hours=0) == 1
+    assert await store.get("old") is None
+    assert (await store.get("waiting")).status == "queued"
+    await store.close()
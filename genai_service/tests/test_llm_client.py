@@ -0,0 +1,211 @@
+import asyncio
+import json
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from genai_service.utils import llm_client
+
+@pytest.fixture(autouse=True)
+def score_cache(monkeypatch):
+    store = {}
+
+    async def lookup(key):
+        return store.get(key)
+
+    async def save(key, score, model):
+        store[key] = score
+
+    monkeypatch.setattr(llm_client, "get_cached_score_async", lookup)
+    monkeypatch.setattr(llm_client, "save_score_async", save)
+    return store
+
+@pytest.fixture(autouse=True)
+def unlimited_scheduler(monkeypatch):
+    monkeypatch.setattr(llm_client, "llm_scheduler", llm_client.LLMScheduler(rpm=0, tpm=0))
+
+def fake_model(answer):
+    return RunnableLambda(lambda prompt: AIMessage(content=answer))
+
+def use_model(monkeypatch, model):
+    """The chains are built once at import, so a fake model means rebuilding them."""
+    chains = llm_client.build_chains(model)
+    for name, chain in zip(["platform_chain", "score_chain", "batch_score_chain", "role_chain"], chains):
+        monkeypatch.setattr(llm_client, name, chain)
+
+@pytest.mark.asyncio
+async def test_batch_scores_rescore_missing_and_malformed(monkeypatch):
+    profiles = [
+        {"name": "A", "linkedin_url": "https://www.linkedin.com/in/a"},
+        {"name": "B", "linkedin_url": "https://www.linkedin.com/in/b"},
+        {"name": "C", "linkedin_url": "https://www.linkedin.com/in/c"},
+    ]
+    answer = json.dumps([
+        {"linkedin_url": "https://www.linkedin.com/in/a", "score": 8},
+        {"linkedin_url": "https://www.linkedin.com/in/b", "score": "eleven"},
+    ])
+    rescored = []
+
+    async def fake_score(profile, criteria):
+        rescored.append(profile["name"])
+        return 3
+
+    use_model(monkeypatch, fake_model(answer))
+    monkeypatch.setattr(llm_client, "calculate_score", fake_score)
+
+    scores = await llm_client.calculate_batch_scores(profiles, ["engineer"])
+
+    assert scores == [8, 3, 3]
+    assert sorted(rescored) == ["B", "C"]
+
+@pytest.mark.asyncio
+async def test_batch_answers_match_url_variants(monkeypatch):
+    profiles = [
+        {"name": "A", "linkedin_url": "https://www.linkedin.com/in/ann-doe/"},
+        {"name": "B", "linkedin_url": "https://ke.linkedin.com/in/Ben"},
+    ]
+    answer = json.dumps([
+        {"linkedin_url": "https://www.linkedin.com/in/ann-doe", "score": 8},
+        {"linkedin_url": "https://www.linkedin.com/in/ben/", "score": 6},
+    ])
+    rescored = []
+
+    async def fake_score(profile, criteria):
+        rescored.append(profile["name"])
+        return 3
+
+    use_model(monkeypatch, fake_model(answer))
+    monkeypatch.setattr(llm_client, "calculate_score", fake_score)
+
+    assert await llm_client.calculate_batch_scores(profiles, ["engineer"]) == [8, 6]
+    assert rescored == []
+
+@pytest.mark.asyncio
+async def test_batch_scores_fall_back_when_answer_is_not_json(monkeypatch):
+    profiles = [{"name": "A", "linkedin_url": "https://www.linkedin.com/in/a"}]
+
+    async def fake_score(profile, criteria):
+        return 6
+
+    use_model(monkeypatch, fake_model("I think they are a 7"))
+    monkeypatch.setattr(llm_client, "calculate_score", fake_score)
+
+    assert await llm_client.calculate_batch_scores(profiles, ["engineer"]) == [6]
+
+@pytest.mark.asyncio
+async def test_calculate_score_serves_repeat_profiles_from_cache(monkeypatch, score_cache):
+    calls = []
+
+    def answer(prompt):
+        calls.append(prompt)
+        return AIMessage(content="8")
+
+    use_model(monkeypatch, RunnableLambda(answer))
+
+    profile = {"name": "Jane Doe", "current_role": "Data Engineer | Safaricom"}
+    same_profile = {"name": "  jane doe", "current_role": "Data Engineer |  Safaricom"}
+
+    assert await llm_client.calculate_score(profile, ["data", "engineer"]) == 8
+    assert await llm_client.calculate_score(same_profile, ["engineer", "data"]) == 8
+    assert len(calls) == 1
+
+def test_token_batches_pack_by_estimated_size():
+    snippets = [{"snippet": "x" * 400}] * 5 + [{"snippet": "y" * 4000}]
+    batches = llm_client.token_batches(snippets, budget=350, overhead=50)
+
+    assert [len(b) for b in batches] == [2, 2, 1, 1]
+
+class RateLimitError(Exception):
+    status_code = 429
+
+@pytest.mark.asyncio
+async def test_profile_discovery_backs_off_on_429_and_splits_failed_batches(monkeypatch):
+    calls = []
+
+    def answer(prompt):
+        text = prompt.to_string()
+        calls.append(text)
+        if len(calls) == 1:
+            raise RateLimitError("Error code: 429 - rate limit reached")
+        # A batch holding both snippets keeps returning garbage until it is split
+        if "Alice" in text and "Bob" in text:
+            return AIMessage(content="not json")
+        name = "Alice" if "Alice" in text else "Bob"
+        return AIMessage(content=json.dumps([{"name": name}]))
+
+    use_model(monkeypatch, RunnableLambda(answer))
+    monkeypatch.setattr(llm_client, "DISCOVERY_BACKOFF_SECONDS", 0.01)
+
+    snippets = [{"title": "Alice | LinkedIn"}, {"title": "Bob | LinkedIn"}]
+    profiles, stats = await llm_client.profile_discovery_with_stats(snippets)
+
+    assert sorted(p["name"] for p in profiles) == ["Alice", "Bob"]
+    assert len(calls) == 4  # 429, garbage, then one call per half
+    assert sorted(b["batch"] for b in stats["batches"]) == ["0a", "0b"]
+    assert stats["failed_profiles"] == 0
+    assert stats["input_tokens"] > 0 and all("latency_seconds" in b for b in stats["batches"])
+
+@pytest.mark.asyncio
+async def test_scheduler_serves_interactive_first_then_owners_round_robin():
+    scheduler = llm_client.LLMScheduler(rpm=6000, tpm=0)
+    scheduler.requests.level = 0  # empty bucket, every call has to queue
+    granted = []
+
+    async def call(priority, owner, name):
+        with llm_client.llm_context(priority, owner):
+            async with scheduler.slot(10):
+                granted.append(name)
+
+    await asyncio.gather(
+        call("bulk", "enrich-job", "job-1"),
+        call("bulk", "enrich-job", "job-2"),
+        call("bulk", "enrich-job", "job-3"),
+        call("bulk", "other-job", "other-1"),
+        call("interactive", "search", "search-1"),
+    )
+
+    assert granted == ["search-1", "job-1", "other-1", "job-2", "job-3"]
+    stats = scheduler.get_stats()
+    assert stats["priorities"]["bulk"]["granted"] == 4
+    assert stats["queue_depth"] == {"interactive": 0, "bulk": 0}
+
+@pytest.mark.asyncio
+async def test_scheduler_holds_calls_to_the_token_budget():
+    scheduler = llm_client.LLMScheduler(rpm=0, tpm=600)  # 10 tokens per second
+    scheduler.tokens.level = 0
+
+    started = asyncio.get_running_loop().time()
+    async with scheduler.slot(2) as grant:
+        grant.record(4)
+    waited = asyncio.get_running_loop().time() - started
+
+    assert 0.15 <= waited < 1
+    assert scheduler.tokens.level < 0  # the extra real usage is paid back by later calls
+
+@pytest.mark.asyncio
+async def test_cascade_escalates_uncertain_and_unparseable_scores(monkeypatch):
+    profiles = [{"name": n, "linkedin_url": f"https://www.linkedin.com/in/{n.lower()}"} for n in ("A", "B", "C")]
+    fast_answer = json.dumps([
+        {"linkedin_url": "https://www.linkedin.com/in/a", "score": 9},
+        {"linkedin_url": "https://www.linkedin.com/in/b", "score": 5},
+    ])
+    core_calls = []
+
+    def core_answer(prompt):
+        core_calls.append(prompt.to_string())
+        return AIMessage(content=json.dumps([
+            {"linkedin_url": "https://www.linkedin.com/in/b", "score": 6},
+            {"linkedin_url": "https://www.linkedin.com/in/c", "score": 2},
+        ]))
+
+    use_model(monkeypatch, RunnableLambda(core_answer))
+    _, fast_score, fast_batch, _ = llm_client.build_chains(fake_model(fast_answer))
+    monkeypatch.setattr(llm_client, "fast_score_chain", fast_score)
+    monkeypatch.setattr(llm_client, "fast_batch_score_chain", fast_batch)
+
+    with llm_client.track_cascade() as stats:
+        scores = await llm_client.cascade_scores(profiles, ["engineer"])
+
+    assert scores == [9, 6, 2]
+    assert stats == {"scored": 3, "escalated": 2, "unparseable": 1}
+    # Only the uncertain leads reach the core model
+    assert len(core_calls) == 1 and "/in/a" not in core_calls[0]
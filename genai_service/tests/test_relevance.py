@@ -0,0 +1,51 @@
+from genai_service.utils.relevance import local_scores, top_k_indexes, profile_text, without_placeholders
+
+PROFILES = [
+    {
+        "current_role": "Senior Data Engineer | Safaricom",
+        "company": "Safaricom",
+        "education": [{"school": "JKUAT", "degree": "BSc Computer Science"}],
+        "summary_profile": "Building data pipelines in Python and Spark.",
+    },
+    {
+        "current_role": "Accountant | KCB",
+        "company": "KCB",
+        "education": [{"school": "Strathmore University", "degree": "BCom"}],
+        "summary_profile": "No summary available",
+    },
+    {
+        "current_role": "Current role unavailable",
+        "company": "Company unavailable",
+        "education": [],
+        "summary_profile": "Python developer",
+    },
+]
+
+def test_local_scores_rank_relevant_profiles_on_llm_scale():
+    scores = local_scores(PROFILES, ["data", "engineer", "python"])
+
+    assert all(1 <= s <= 10 for s in scores)
+    assert scores[0] > scores[2] > scores[1]
+    assert scores[1] == 1
+
+def test_placeholders_are_ignored():
+    text = profile_text(PROFILES[2])
+    assert "unavailable" not in text
+    assert "python" in text.lower()
+
+def test_real_text_mentioning_unavailable_is_kept():
+    profile = {
+        "current_role": "Unavailable-systems engineer | Position Unavailable",
+        "company": "Company unavailable",
+        "summary_profile": "Open to work, not available for relocation",
+    }
+    text = profile_text(profile)
+
+    assert "Unavailable-systems engineer" in text
+    assert "not available for relocation" in text
+    assert "Position" not in text and "Company" not in text
+    assert without_placeholders(" City  unavailable ") == ""
+
+def test_top_k_indexes_keep_input_order():
+    assert top_k_indexes([3, 9, 1, 9, 5], 3) == [1, 3, 4]
+    assert top_k_indexes([3, 9], 0) == []
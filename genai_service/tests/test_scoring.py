@@ -0,0 +1,150 @@
+import asyncio
+import sys
+import pytest
+from langchain_core.runnables import RunnableLambda
+from genai_service.core import scoring
+from genai_service.core.scoring import ScoringStage, DEFAULT_SCORE
+
+def make_profile(name):
+    return {
+        "name": name,
+        "company": "Acme",
+        "current_role": "Engineer | Acme",
+        "education": [{"school": "JKUAT", "degree": "BSc"}],
+        "linkedin_url": f"https://www.linkedin.com/in/{name.lower().replace(' ', '-')}",
+        "country": "Kenya",
+    }
+
+@pytest.mark.asyncio
+async def test_scoring_stage_keeps_input_order_and_caps_concurrency(monkeypatch):
+    in_flight = 0
+    peak = 0
+
+    async def fake_score(profile, criteria):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        # Later profiles finish first so ordering is actually exercised
+        await asyncio.sleep(0.01 * (10 - int(profile["name"].split()[-1])))
+        in_flight -= 1
+        return int(profile["name"].split()[-1])
+
+    monkeypatch.setattr(scoring, "calculate_score", fake_score)
+
+    profiles = [make_profile(f"User {i}") for i in range(1, 10)]
+    results = await ScoringStage(concurrency=3, timeout=5, batch_size=1).run(profiles, ["engineer"])
+
+    assert [r.score for r in results] == list(range(1, 10))
+    assert peak <= 3
+
+def fake_score_chain(monkeypatch, answer, rpm=0):
+    """Real calculate_score over a fake core model, no score cache, a scheduler limited to `rpm`."""
+    # The stage imports the client as a top-level module, patch that copy
+    llm_client = sys.modules[scoring.calculate_score.__module__]
+    async def no_cached_score(key):
+        return None
+
+    async def ignore(*args):
+        return None
+
+    monkeypatch.setattr(llm_client, "score_chain", RunnableLambda(lambda inputs: None, afunc=answer))
+    monkeypatch.setattr(llm_client, "get_cached_score_async", no_cached_score)
+    monkeypatch.setattr(llm_client, "save_score_async", ignore)
+    scheduler = llm_client.LLMScheduler(rpm=rpm, tpm=0)
+    monkeypatch.setattr(llm_client, "llm_scheduler", scheduler)
+    return scheduler
+
+@pytest.mark.asyncio
+async def test_scoring_stage_isolates_failures_and_timeouts(monkeypatch):
+    async def answer(inputs):
+        if "Slow User" in inputs["lead_information"]:
+            await asyncio.sleep(1)
+        if "Broken User" in inputs["lead_information"]:
+            raise RuntimeError("groq exploded")
+        return "9"
+
+    fake_score_chain(monkeypatch, answer)
+
+    profiles = [make_profile("Good User"), make_profile("Slow User"), make_profile("Broken User")]
+    results = await ScoringStage(concurrency=3, timeout=0.05, batch_size=1).run(profiles, ["engineer"])
+
+    assert [r.name for r in results] == ["Good User", "Slow User", "Broken User"]
+    assert [r.score for r in results] == [9, DEFAULT_SCORE, DEFAULT_SCORE]
+
+@pytest.mark.asyncio
+async def test_time_queued_for_the_rate_limit_does_not_count_against_the_timeout(monkeypatch):
+    async def answer(inputs):
+        return "8"
+
+    scheduler = fake_score_chain(monkeypatch, answer, rpm=600)  # one call per 0.1s
+    scheduler.requests.level = 0  # saturated bucket, every call has to queue
+
+    profiles = [make_profile(f"User {i}") for i in range(1, 6)]
+    results = await ScoringStage(concurrency=5, timeout=0.15, batch_size=1).run(profiles, ["engineer"])
+
+    # The last lead waits ~0.5s for its slot, far past the timeout, and still gets a real score
+    assert [r.score for r in results] == [8] * 5
+    assert scheduler.get_stats()["priorities"]["interactive"]["max_wait_seconds"] > 0.15
+
+@pytest.mark.asyncio
+async def test_scoring_stage_batches_llm_calls(monkeypatch):
+    batches = []
+
+    async def fake_batch(profiles, criteria):
+        batches.append(len(profiles))
+        return [7] * len(profiles)
+
+    monkeypatch.setattr(scoring, "calculate_batch_scores", fake_batch)
+
+    profiles = [make_profile(f"User {i}") for i in range(1, 7)]
+    results = await ScoringStage(concurrency=2, timeout=5, batch_size=3).run(profiles, ["engineer"])
+
+    assert batches == [3, 3]
+    assert [r.name for r in results] == [p["name"] for p in profiles]
+    assert all(r.score == 7 for r in results)
+
+@pytest.mark.asyncio
+async def test_timed_out_batch_defaults_without_rescoring_one_by_one(monkeypatch):
+    llm_client = sys.modules[scoring.calculate_batch_scores.__module__]
+    batch_calls = []
+    single_calls = []
+
+    async def slow_batch(inputs):
+        batch_calls.append(inputs)
+        await asyncio.sleep(1)
+
+    async def single(profile, criteria):
+        single_calls.append(profile["name"])
+        return 9
+
+    monkeypatch.setattr(llm_client, "batch_score_chain", RunnableLambda(lambda inputs: None, afunc=slow_batch))
+    monkeypatch.setattr(llm_client, "calculate_score", single)
+    monkeypatch.setattr(llm_client, "llm_scheduler", llm_client.LLMScheduler(rpm=0, tpm=0))
+    monkeypatch.setattr(llm_client, "get_cached_score_async", lambda key: asyncio.sleep(0))
+
+    profiles = [make_profile(f"User {i}") for i in range(1, 4)]
+    results = await ScoringStage(concurrency=1, timeout=0.05, batch_size=3).run(profiles, ["engineer"])
+
+    assert [r.score for r in results] == [DEFAULT_SCORE] * 3
+    assert len(batch_calls) == 1 and single_calls == []
+
+def test_scoring_is_batched_by_default():
+    assert ScoringStage().batch_size > 1
+
+@pytest.mark.asyncio
+async def test_prefilter_only_sends_top_k_to_llm(monkeypatch):
+    sent = []
+
+    async def fake_score(profile, criteria):
+        sent.append(profile["name"])
+        return 10
+
+    monkeypatch.setattr(scoring, "calculate_score", fake_score)
+
+    profiles = [make_profile(f"User {i}") for i in range(1, 5)]
+    profiles[2]["current_role"] = "Python Engineer | Acme"
+    results = await ScoringStage(concurrency=2, timeout=5, batch_size=1).run(profiles, ["python"], score_mode="prefilter", top_k=1)
+
+    assert sent == ["User 3"]
+    assert [r.score for r in results][2] == 10
+    assert len(results) == 4
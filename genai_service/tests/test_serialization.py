@@ -0,0 +1,42 @@
+from genai_service.utils.serialization import serialize_lead, serialize_leads
+from genai_service.utils.llm_client import estimate_tokens
+
+LEAD = {
+    "name": "Jane Doe",
+    "title": "Senior Data Engineer",
+    "company": "Safaricom",
+    "current_role": "Senior Data Engineer | Safaricom",
+    "country": "Kenya",
+    "city": "City unavailable",
+    "education": [{"school": "JKUAT", "degree": "BSc Computer Science"}, {"school": "Strathmore University", "degree": None}],
+    "linkedin_url": "https://www.linkedin.com/in/janedoe",
+    "summary_profile": "Building data pipelines in Python and Spark.",
+}
+
+def test_serialize_lead_is_compact_and_drops_placeholders():
+    text = serialize_lead(LEAD)
+
+    assert text == ("Name: Jane Doe | Role: Senior Data Engineer | Company: Safaricom | Location: Kenya | "
+                    "Education: JKUAT (BSc Computer Science); Strathmore University | "
+                    "Summary: Building data pipelines in Python and Spark.")
+    assert "unavailable" not in text
+    assert estimate_tokens(text) < estimate_tokens(str(LEAD)) * 0.7
+
+def test_serialize_lead_truncates_long_fields_on_a_word_boundary():
+    text = serialize_lead({**LEAD, "summary_profile": "word " * 100}, max_chars=20)
+
+    assert "Summary: word word word word..." in text
+
+def test_serialize_leads_keeps_urls_for_matching_batch_answers():
+    lines = serialize_leads([LEAD, {"name": "John", "summary_profile": "No summary available"}]).splitlines()
+
+    assert lines[0].endswith("URL: https://www.linkedin.com/in/janedoe")
+    assert lines[1] == "- Name: John"
+
+def test_real_values_mentioning_unavailable_survive():
+    text = serialize_lead({**LEAD, "title": "Unavailable-systems engineer", "company": "Not Available Labs",
+                           "summary_profile": "Open to work, not available for relocation"})
+
+    assert "Role: Unavailable-systems engineer" in text
+    assert "Company: Not Available Labs" in text
+    assert "Summary: Open to work, not available for relocation" in text
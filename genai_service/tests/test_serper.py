@@ -0,0 +1,75 @@
+import json
+import httpx
+import pytest
+from genai_service.utils import serper
+from genai_service.utils.serper import SerperClient, SerperAPIError
+
+def organic(page):
+    # Page 2 repeats one result from page 1, as Google often does
+    links = {1: ["a", "b"], 2: ["b", "c"], 3: ["d"]}[page]
+    return [{"title": f"Profile {link}", "link": f"https://ke.linkedin.com/in/{link}"} for link in links]
+
+@pytest.mark.asyncio
+async def test_search_pages_fetches_concurrently_and_dedupes_by_link(monkeypatch):
+    requested = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        requested.append(body["page"])
+        assert request.headers["X-API-KEY"] == "test-key"
+        return httpx.Response(200, json={"organic": organic(body["page"])})
+
+    discovered = []
+
+    async def fake_discovery(profile_snippets):
+        discovered.extend(profile_snippets)
+        stats = {"batches": [{"batch": "0", "profiles": len(profile_snippets), "latency_seconds": 0.2,
+                              "input_tokens": 120, "output_tokens": 40}],
+                 "input_tokens": 120, "output_tokens": 40, "failed_profiles": 0, "elapsed_seconds": 0.2}
+        return [{"name": s["title"]} for s in profile_snippets], stats
+
+    monkeypatch.setattr(serper, "profile_discovery_with_stats", fake_discovery)
+    client = SerperClient(api_key="test-key", transport=httpx.MockTransport(handler))
+
+    roles = await client.discover("mechanical engineer", "ke", pages=3)
+    await client.close()
+
+    assert sorted(requested) == [1, 2, 3]
+    assert [s["link"].rsplit("/", 1)[-1] for s in discovered] == ["a", "b", "c", "d"]
+    assert len(roles) == 4
+
+    stats = client.get_stats()
+    assert (stats["discoveries"], stats["batches"], stats["input_tokens"]) == (1, 1, 120)
+    assert stats["last_discovery"]["batches"][0]["latency_seconds"] == 0.2
+
+@pytest.mark.asyncio
+async def test_search_pages_skips_failed_pages_but_raises_when_all_fail():
+    def flaky(request):
+        page = json.loads(request.content)["page"]
+        return httpx.Response(500) if page == 2 else httpx.Response(200, json={"organic": organic(page)})
+
+    client = SerperClient(api_key="test-key", transport=httpx.MockTransport(flaky))
+    results = await client.search_pages("engineer", pages=3)
+    assert len(results) == 3
+
+    client = SerperClient(api_key="test-key", transport=httpx.MockTransport(lambda request: httpx.Response(429)))
+    with pytest.raises(SerperAPIError):
+        await client.search_pages("engineer", pages=2)
+
+@pytest.mark.asyncio
+async def test_country_goes_to_gl_only_as_a_code():
+    bodies = []
+
+    def handler(request):
+        bodies.append(json.loads(request.content))
+        return httpx.Response(200, json={"organic": []})
+
+    client = SerperClient(api_key="test-key", transport=httpx.MockTransport(handler))
+    for country in (None, "Kenya", " KE "):
+        await client.search_page("data engineer", country)
+    await client.close()
+
+    no_country, name, code = bodies
+    assert "gl" not in no_country and no_country["q"] == 'site:linkedin.com/in/ "data" AND "engineer"'
+    assert "gl" not in name and name["q"].endswith('"engineer" Kenya')
+    assert code["gl"] == "ke" and code["q"] == no_country["q"]
@@ -0,0 +1,16 @@
+from genai_service.validators.linkedin import normalize_linkedin_url
+
+def test_normalize_linkedin_url_collapses_variants():
+    canonical = "https://www.linkedin.com/in/jane-doe"
+    variants = [
+        "https://www.linkedin.com/in/jane-doe/",
+        "https://ke.linkedin.com/in/Jane-Doe?trk=people-guest_people_search-card",
+        "http://linkedin.com/in/jane-doe/#experience",
+        "linkedin.com/in/jane-doe",
+        " https://m.linkedin.com/in/jane-doe/details/experience/ ",
+    ]
+    assert all(normalize_linkedin_url(v) == canonical for v in variants)
+
+def test_normalize_linkedin_url_leaves_other_urls_alone():
+    assert normalize_linkedin_url("https://example.com/in/jane/") == "https://example.com/in/jane"
+    assert normalize_linkedin_url("") == ""
@@ -1,10 +1,11 @@
-from apify_client import ApifyClientAsync
 from dotenv import load_dotenv
 import logging
 import os
 import asyncio
-from typing import List, Dict
+from typing import List, Dict, Optional
 import re 
+from validators.linkedin import normalize_linkedin_url
+from utils.apify_gateway import apify_gateway, ApifyRunTimeoutError
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -12,34 +13,28 @@ logger = logging.getLogger(__name__)
 class ApifyError(Exception):
     pass
 
+DEFAULT_ENRICH_SHARD_SIZE = 100
+DEFAULT_ENRICH_SHARD_CONCURRENCY = 4
+DEFAULT_ENRICH_SHARD_RETRIES = 1
+
+ENRICH_SHARD_SIZE = int(os.getenv("ENRICH_SHARD_SIZE", DEFAULT_ENRICH_SHARD_SIZE))
+ENRICH_SHARD_CONCURRENCY = int(os.getenv("ENRICH_SHARD_CONCURRENCY", DEFAULT_ENRICH_SHARD_CONCURRENCY))
+ENRICH_SHARD_RETRIES = int(os.getenv("ENRICH_SHARD_RETRIES", DEFAULT_ENRICH_SHARD_RETRIES))
+_SHARD_DONE = object()  # marks the end of one shard in the merged stream
+
 APIFY_TOKEN = os.getenv("APIFY_API_TOKEN")
 if not APIFY_TOKEN:
     logger.critical("APIFY_API_TOKEN is missing from environment variables.")
 
-async def _run_actor(run_input: dict, actor_id: str):
-    apify_client = ApifyClientAsync(APIFY_TOKEN)
+async def _run_actor(run_input: dict, actor_id: str, metadata: Optional[list] = None):
     try:
-        logger.info(f"Starting Apify Actor: {actor_id}")
         logger.info(f"Input: {run_input}")
-        
-        run = await apify_client.actor(actor_id).call(run_input=run_input)
-        
-        # Updated: Compute status safely before checking for failure
-        status = run.get('status') if run is not None else 'unknown'
-        
-        if not run or "defaultDatasetId" not in run:
-            logger.error(f"Apify Run Failed: No Dataset ID. Status: {status}")
-            raise ApifyError(f"Apify run failed: {status}")
-            
-        logger.info(f"Apify Run ID: {run.get('id')} - Status: {run.get('status')}")
-        
-        dataset = apify_client.dataset(run["defaultDatasetId"])
-        item_count = 0
-        async for item in dataset.iterate_items():
-            item_count += 1
+        async for item in apify_gateway.run(actor_id, run_input, metadata=metadata):
             yield item
-        logger.info(f"Total items fetched from Apify: {item_count}")
 
+    except ApifyRunTimeoutError as e:
+        logger.error(f"Apify Actor {actor_id} timed out: {e}")
+        raise ApifyError(str(e))
     except Exception as e:
         error_msg = str(e).lower()
         if "quota" in error_msg:
@@ -52,7 +47,7 @@ async def _run_actor(run_input: dict, actor_id: str):
             logger.error(f"Apify Actor {actor_id} failed: {e}")
             raise ApifyError(f"Actor failed: {e}")
 
-async def apify_search(keywords: str, max_items: int = 10, locations: list = None, start_page: int = 1):
+async def apify_search(keywords: str, max_items: int = 10, locations: list = None, start_page: int = 1, metadata: Optional[list] = None):
     if not keywords:
         logger.warning("Search attempted with empty keywords.")
         raise ValueError("Keywords for apify search cannot be empty.")
@@ -69,22 +64,92 @@ async def apify_search(keywords: str, max_items: int = 10, locations: list = Non
     }
 
     output = []
-    async for item in _run_actor(run_input, actor_id="qXMa8kADnUQdmz18G"):
+    async for item in _run_actor(run_input, actor_id="qXMa8kADnUQdmz18G", metadata=metadata):
         output.append(item)
     return output
 
-async def enrich_profiles(profile_urls: list):
-    if not profile_urls:
+def _dedupe_urls(profile_urls: list) -> list:
+    """Drops blanks and URL variants of the same profile, keeping the first occurrence order."""
+    seen = set()
+    urls = []
+    for url in profile_urls:
+        key = normalize_linkedin_url(url)
+        if key and key not in seen:
+            seen.add(key)
+            urls.append(url.strip())
+    return urls
+
+def item_url_key(item: dict) -> str:
+    """Normalized LinkedIn URL of a raw Apify profile item."""
+    return normalize_linkedin_url(item.get("linkedinUrl") or item.get("url") or "")
+
+async def enrich_profiles(profile_urls: list, shard_size: Optional[int] = None, concurrency: Optional[int] = None, retries: Optional[int] = None,
+                          metadata: Optional[list] = None, failed: Optional[list] = None):
+    """
+    Scrapes full profiles for a list of LinkedIn URLs.
+    URLs are deduplicated and split into shards of `shard_size`. Up to `concurrency` actor
+    runs go at once and their datasets are merged into one stream in arrival order.
+    A failed shard is retried on its own (only the URLs it has not returned yet).
+    Every actor run's ApifyRunMetadata is appended to `metadata` when given, and the URLs of
+    shards that still failed after their retries to `failed`. Without a `failed` list,
+    ApifyError is raised when every shard fails.
+    """
+    urls = _dedupe_urls(profile_urls or [])
+    if not urls:
         return
 
-    run_input = {
-        "urls": profile_urls,
-        "minDelay": 1,
-        "maxDelay": 5,
-    }
-    
-    async for item in _run_actor(run_input, actor_id="harvestapi/linkedin-profile-scraper"):
-        yield item
+    shard_size = max(1, shard_size or ENRICH_SHARD_SIZE)
+    retries = ENRICH_SHARD_RETRIES if retries is None else retries
+    shards = [urls[i:i + shard_size] for i in range(0, len(urls), shard_size)]
+    semaphore = asyncio.Semaphore(max(1, concurrency or ENRICH_SHARD_CONCURRENCY))
+    queue = asyncio.Queue(maxsize=shard_size)
+    failures = []
+
+    logger.info(f"Enriching {len(urls)} unique URLs ({len(profile_urls) - len(urls)} duplicates dropped) in {len(shards)} shard(s)")
+
+    async def run_shard(shard_index: int, shard: list):
+        remaining = shard
+        for attempt in range(retries + 1):
+            returned = set()
+            try:
+                async with semaphore:
+                    run_input = {
+                        "urls": remaining,
+                        "minDelay": 1,
+                        "maxDelay": 5,
+                    }
+                    async for item in _run_actor(run_input, actor_id="harvestapi/linkedin-profile-scraper", metadata=metadata):
+                        returned.add(item_url_key(item))
+                        await queue.put(item)
+                break
+            except Exception as e:
+                remaining = [url for url in remaining if normalize_linkedin_url(url) not in returned]
+                if not remaining:
+                    break
+                if attempt < retries:
+                    logger.warning(f"Shard {shard_index} failed ({e}). Retrying {len(remaining)} URLs, attempt {attempt + 2}/{retries + 1}.")
+                else:
+                    logger.error(f"Shard {shard_index} failed after {retries + 1} attempts, {len(remaining)} URLs not enriched: {e}")
+                    failures.append(e)
+                    if failed is not None:
+                        failed.extend(remaining)
+        await queue.put(_SHARD_DONE)
+
+    tasks = [asyncio.ensure_future(run_shard(idx, shard)) for idx, shard in enumerate(shards)]
+    try:
+        finished = 0
+        while finished < len(tasks):
+            item = await queue.get()
+            if item is _SHARD_DONE:
+                finished += 1
+                continue
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if failed is None and failures and len(failures) == len(shards):
+        raise ApifyError(f"All {len(shards)} enrichment shard(s) failed: {failures[-1]}")
 
 def apify_lead_presentation(profiles: List[Dict]) -> List[Dict]:
     presented_profiles = []
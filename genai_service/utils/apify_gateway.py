@@ -0,0 +1,135 @@
+from apify_client import ApifyClientAsync
+from dotenv import load_dotenv
+import asyncio
+import logging
+import os
+import time
+from typing import AsyncIterator, Optional
+
+from models.schemas import ApifyRunMetadata
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+class ApifyRunError(Exception):
+    pass
+
+class ApifyRunTimeoutError(ApifyRunError):
+    pass
+
+DEFAULT_APIFY_RUN_TIMEOUT = 300  # seconds an actor run may take before it is aborted
+DEFAULT_APIFY_POLL_INTERVAL = 2  # seconds between run status checks
+APIFY_RUN_TIMEOUT = float(os.getenv("APIFY_RUN_TIMEOUT", DEFAULT_APIFY_RUN_TIMEOUT))
+APIFY_POLL_INTERVAL = float(os.getenv("APIFY_POLL_INTERVAL", DEFAULT_APIFY_POLL_INTERVAL))
+TERMINAL_STATUSES = {"SUCCEEDED", "FAILED", "TIMED-OUT", "ABORTED"}
+
+
+def _as_dict(run) -> dict:
+    """Run objects are dicts on apify-client 1.x/2.x and pydantic models from 3.x."""
+    if run is None:
+        return {}
+    if isinstance(run, dict):
+        return run
+    return run.model_dump(by_alias=True)
+
+
+class ApifyGateway():
+    """
+    One long-lived Apify client shared by every actor run in the process.
+    Runs are started, then polled until they finish or `timeout` runs out, in which case
+    the remote run is aborted. Cancelling the caller (e.g. the HTTP client went away)
+    aborts the remote run too, so no actor keeps burning compute for nobody.
+    """
+
+    def __init__(self, token: Optional[str] = None, timeout: Optional[float] = None, poll_interval: Optional[float] = None):
+        self.token = token or os.getenv("APIFY_API_TOKEN")
+        self.timeout = timeout or APIFY_RUN_TIMEOUT
+        self.poll_interval = poll_interval or APIFY_POLL_INTERVAL
+        self.stats = {"runs": 0, "succeeded": 0, "failed": 0, "timed_out": 0, "aborted": 0, "items": 0, "compute_units": 0.0}
+        self._client = None
+
+    def start(self):
+        """Creates the pooled client, called from the FastAPI lifespan."""
+        if self._client is None:
+            self._client = ApifyClientAsync(self.token)
+
+    async def close(self):
+        self._client = None
+
+    @property
+    def client(self) -> ApifyClientAsync:
+        # Scripts and tests that never went through the lifespan still get a client
+        self.start()
+        return self._client
+
+    async def _abort(self, run_id: str, reason: str):
+        try:
+            await self.client.run(run_id).abort()
+            logger.warning(f"Aborted Apify run {run_id}: {reason}")
+        except Exception as e:
+            logger.error(f"Could not abort Apify run {run_id}: {e}")
+
+    async def _wait(self, run_id: str, run: dict, deadline: float) -> dict:
+        while run.get("status") not in TERMINAL_STATUSES:
+            if time.monotonic() >= deadline:
+                raise ApifyRunTimeoutError(f"Apify run {run_id} did not finish within {self.timeout}s")
+            await asyncio.sleep(min(self.poll_interval, max(0.0, deadline - time.monotonic())))
+            run = _as_dict(await self.client.run(run_id).get()) or run
+        return run
+
+    def _record(self, metadata: ApifyRunMetadata):
+        self.stats["runs"] += 1
+        self.stats["items"] += metadata.items
+        self.stats["compute_units"] += metadata.compute_units or 0.0
+        outcome = {"SUCCEEDED": "succeeded", "TIMED-OUT": "timed_out", "ABORTED": "aborted"}.get(metadata.status, "failed")
+        self.stats[outcome] += 1
+        logger.info(f"Apify run {metadata.run_id} ({metadata.actor_id}) {metadata.status}: "
+                    f"{metadata.items} items in {metadata.duration_seconds}s, {metadata.compute_units} CU")
+
+    async def run(self, actor_id: str, run_input: dict, timeout: Optional[float] = None,
+                  metadata: Optional[list] = None) -> AsyncIterator[dict]:
+        """
+        Runs an actor and yields its dataset items.
+        When `metadata` is given, the run's ApifyRunMetadata is appended to it once the run ends.
+        """
+        timeout = timeout or self.timeout
+        started = time.monotonic()
+        info = ApifyRunMetadata(actor_id=actor_id)
+        run_id = None
+        try:
+            logger.info(f"Starting Apify Actor: {actor_id}")
+            run = _as_dict(await self.client.actor(actor_id).start(run_input=run_input))
+            run_id = info.run_id = run.get("id")
+            try:
+                run = await self._wait(run_id, run, started + timeout)
+            except ApifyRunTimeoutError:
+                info.status = "TIMED-OUT"
+                await self._abort(run_id, f"no result after {timeout}s")
+                raise
+
+            info.status = run.get("status")
+            info.compute_units = (run.get("stats") or {}).get("computeUnits")
+            if info.status != "SUCCEEDED" or not run.get("defaultDatasetId"):
+                raise ApifyRunError(f"Apify run failed: {info.status}")
+
+            async for item in self.client.dataset(run["defaultDatasetId"]).iterate_items():
+                info.items += 1
+                yield item
+        except asyncio.CancelledError:
+            if run_id and info.status not in TERMINAL_STATUSES:
+                info.status = "ABORTED"
+                # Shielded so the abort request still goes out while this task is being cancelled
+                await asyncio.shield(self._abort(run_id, "caller went away"))
+            raise
+        finally:
+            info.duration_seconds = round(time.monotonic() - started, 3)
+            if run_id:
+                self._record(info)
+            if metadata is not None:
+                metadata.append(info)
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "compute_units": round(self.stats["compute_units"], 4), "timeout": self.timeout}
+
+
+apify_gateway = ApifyGateway()
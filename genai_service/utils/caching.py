@@ -1,17 +1,112 @@
 import sqlite3
 import json
 import logging
+import orjson
 import hashlib
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import Optional
+from pydantic import ValidationError
+
+from models.schemas import GeneralProfile
+from validators.linkedin import normalize_linkedin_url
 
 logger = logging.getLogger(__name__)
-DB_FILE = "search_cache.db"
-CACHE_EXPIRY_HOURS = 24  
+DEFAULT_DB_FILE = "search_cache.db"
+DB_FILE = os.getenv("CACHE_DB_FILE", DEFAULT_DB_FILE)
+CACHE_EXPIRY_HOURS = 24
+SCORE_CACHE_EXPIRY_HOURS = 24 * 7
+SCORE_CACHE_STATS = {"hits": 0, "misses": 0}
+SEARCH_CACHE_STATS = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()  # the stats are counted from the reader threads
+PROFILE_CACHE_EXPIRY_HOURS = 24 * 7
+
+DEFAULT_CACHE_READ_POOL_SIZE = 4
+DEFAULT_CACHE_WRITE_BATCH_SIZE = 64
+DEFAULT_CACHE_WRITE_FLUSH_MS = 20
+CACHE_READ_POOL_SIZE = int(os.getenv("CACHE_READ_POOL_SIZE", DEFAULT_CACHE_READ_POOL_SIZE))
+CACHE_WRITE_BATCH_SIZE = int(os.getenv("CACHE_WRITE_BATCH_SIZE", DEFAULT_CACHE_WRITE_BATCH_SIZE))
+CACHE_WRITE_FLUSH_MS = int(os.getenv("CACHE_WRITE_FLUSH_MS", DEFAULT_CACHE_WRITE_FLUSH_MS))
+
+DEFAULT_CACHE_MAX_ROWS = 50000  # per cache table
+DEFAULT_CACHE_MAX_BYTES = 500 * 1024 * 1024
+DEFAULT_CACHE_SWEEP_INTERVAL_SECONDS = 600
+DEFAULT_CACHE_VACUUM_PAGES = 1000
+CACHE_MAX_ROWS = int(os.getenv("CACHE_MAX_ROWS", DEFAULT_CACHE_MAX_ROWS))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", DEFAULT_CACHE_MAX_BYTES))
+CACHE_SWEEP_INTERVAL_SECONDS = int(os.getenv("CACHE_SWEEP_INTERVAL_SECONDS", DEFAULT_CACHE_SWEEP_INTERVAL_SECONDS))
+CACHE_VACUUM_PAGES = int(os.getenv("CACHE_VACUUM_PAGES", DEFAULT_CACHE_VACUUM_PAGES))
+
+DEFAULT_CACHE_VACUUM_MIGRATION_MAX_BYTES = 64 * 1024 * 1024  # bigger files are left to an offline migration
+CACHE_VACUUM_MIGRATION_MAX_BYTES = int(os.getenv("CACHE_VACUUM_MIGRATION_MAX_BYTES", DEFAULT_CACHE_VACUUM_MIGRATION_MAX_BYTES))
+
+DEFAULT_L1_CACHE_MAX_ENTRIES = 256
+L1_CACHE_MAX_ENTRIES = int(os.getenv("L1_CACHE_MAX_ENTRIES", DEFAULT_L1_CACHE_MAX_ENTRIES))
+
+PRAGMAS = [
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",  # ~8MB page cache per connection
+    "PRAGMA mmap_size=67108864",
+    "PRAGMA busy_timeout=5000",
+]
+
+def _connect(db_file: str = None, check_same_thread: bool = True) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_file or DB_FILE, check_same_thread=check_same_thread)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def cache_tables() -> dict:
+    """Cache table -> (key column, TTL in hours)."""
+    return {
+        "searches": ("id", CACHE_EXPIRY_HOURS),
+        "scores": ("id", SCORE_CACHE_EXPIRY_HOURS),
+        "profiles": ("url", PROFILE_CACHE_EXPIRY_HOURS),
+    }
+
+def _count(stats: dict, key: str):
+    with _stats_lock:
+        stats[key] += 1
+
+def _stats_snapshot(stats: dict) -> dict:
+    with _stats_lock:
+        return dict(stats)
+
+def migrate_db(force: bool = False) -> bool:
+    """
+    Switches an older cache file to incremental auto_vacuum, which takes one full VACUUM.
+    Runs once: files already migrated are left alone. Files over
+    CACHE_VACUUM_MIGRATION_MAX_BYTES are only migrated with `force`
+    (`python -m utils.caching migrate`), so a big cache never blocks startup.
+    Returns whether the file is migrated.
+    """
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return True
+        size = os.path.getsize(DB_FILE) if os.path.exists(DB_FILE) else 0
+        if size > CACHE_VACUUM_MIGRATION_MAX_BYTES and not force:
+            logger.warning(f"Cache DB is {size} bytes, skipping the auto_vacuum migration. "
+                           "Freed pages are not returned to the OS until `python -m utils.caching migrate` is run.")
+            return False
+        logger.info("Migrating the cache DB to incremental auto_vacuum.")
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        return True
+    finally:
+        conn.close()
 
 def init_db():
-    """Creates the cache table if it doesn't exist."""
+    """Creates the cache tables if they don't exist. Called on startup, not on import."""
     conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
+    # WAL lets the pooled readers run while a write batch is committing; it persists in the file
+    cursor.execute("PRAGMA journal_mode=WAL")
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS searches (
             id TEXT PRIMARY KEY,
@@ -22,69 +117,625 @@ def init_db():
             timestamp DATETIME
         )
     ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scores (
+            id TEXT PRIMARY KEY,
+            model TEXT,
+            score INTEGER,
+            timestamp DATETIME
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS profiles (
+            url TEXT PRIMARY KEY,
+            payload JSON,
+            timestamp DATETIME
+        )
+    ''')
+    for table in cache_tables():
+        columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+        if "last_accessed" not in columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN last_accessed DATETIME")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_timestamp ON {table} (timestamp)")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_last_accessed ON {table} (last_accessed)")
     conn.commit()
     conn.close()
 
-def generate_cache_key(keywords: str, country: str, page: int) -> str:
+
+class AsyncCacheBackend():
+    """
+    Runs cache statements off the event loop.
+    Reads go to a small thread pool, each thread holding one long-lived connection.
+    Writes are queued and committed in batches by a single writer thread, so concurrent
+    saves share one transaction. Awaiting a write returns once its batch is committed.
+    """
+
+    def __init__(self, read_pool_size: int = None, write_batch_size: int = None, flush_ms: int = None):
+        self.read_pool_size = max(1, read_pool_size or CACHE_READ_POOL_SIZE)
+        self.write_batch_size = max(1, write_batch_size or CACHE_WRITE_BATCH_SIZE)
+        self.flush_interval = (flush_ms if flush_ms is not None else CACHE_WRITE_FLUSH_MS) / 1000
+        self._readers = None
+        self._writer = None
+        self._local = threading.local()
+        self._pending = []
+        self._flush_task = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Thread-local connection, reopened if DB_FILE changed underneath it."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.db_file != DB_FILE:
+            if conn is not None:
+                conn.close()
+            conn = _connect(DB_FILE, check_same_thread=False)
+            self._local.conn = conn
+            self._local.db_file = DB_FILE
+        return conn
+
+    def _executors(self):
+        if self._readers is None:
+            self._readers = ThreadPoolExecutor(max_workers=self.read_pool_size, thread_name_prefix="cache-read")
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-write")
+        return self._readers, self._writer
+
+    async def read(self, fn, *args):
+        """Runs fn(conn, *args) on a pooled reader connection."""
+        readers, _ = self._executors()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(readers, lambda: fn(self._connection(), *args))
+
+    async def write(self, fn, *args):
+        """Queues fn(conn, *args) for the next write batch and waits for its commit."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((fn, args, future))
+        if len(self._pending) >= self.write_batch_size:
+            await self._flush()
+        elif self._flush_task is None or self._flush_task.done() or self._flush_task.get_loop() is not loop:
+            self._flush_task = asyncio.create_task(self._flush_later())
+        return await future
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        await self._flush()
+
+    def _run_batch(self, batch):
+        conn = self._connection()
+        outcomes = []
+        for fn, args, _ in batch:
+            try:
+                outcomes.append((True, fn(conn, *args)))
+            except Exception as e:
+                outcomes.append((False, e))
+        try:
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            return [(False, e)] * len(batch)
+        return outcomes
+
+    async def _flush(self):
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        _, writer = self._executors()
+        loop = asyncio.get_running_loop()
+        try:
+            outcomes = await loop.run_in_executor(writer, self._run_batch, batch)
+        except Exception as e:
+            outcomes = [(False, e)] * len(batch)
+        for (_, _, future), (ok, value) in zip(batch, outcomes):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    async def close(self):
+        """Commits queued writes and shuts the thread pools down."""
+        await self._flush()
+        if self._readers is not None:
+            self._readers.shutdown(wait=True)
+            self._writer.shutdown(wait=True)
+            self._readers = self._writer = None
+
+
+class CacheManager():
+    """
+    Keeps the cache DB bounded.
+    A background sweep deletes expired rows, evicts least-recently-used rows above
+    `max_rows` per table or `max_bytes` overall, and hands freed pages back with an
+    incremental vacuum. Cache hits are recorded in memory and written as
+    last_accessed during the sweep, so reads never wait on a write.
+    """
+
+    def __init__(self, backend: AsyncCacheBackend, max_rows: int = None, max_bytes: int = None,
+                 sweep_interval: float = None, vacuum_pages: int = None):
+        self.backend = backend
+        self.max_rows = max_rows or CACHE_MAX_ROWS
+        self.max_bytes = max_bytes or CACHE_MAX_BYTES
+        self.sweep_interval = sweep_interval or CACHE_SWEEP_INTERVAL_SECONDS
+        self.vacuum_pages = vacuum_pages or CACHE_VACUUM_PAGES
+        self.stats = {"sweeps": 0, "expired_removed": 0, "evictions": 0}
+        self._touched = {table: {} for table in cache_tables()}
+        self._touch_lock = threading.Lock()
+        self._task = None
+
+    def touch(self, table: str, key: str):
+        with self._touch_lock:
+            self._touched[table][key] = datetime.now().isoformat()
+
+    def _db_bytes(self, conn: sqlite3.Connection) -> int:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - free_pages) * page_size
+
+    def _evict_lru(self, conn: sqlite3.Connection, table: str, key_column: str, count: int) -> int:
+        cursor = conn.execute(f'''
+            DELETE FROM {table} WHERE {key_column} IN (
+                SELECT {key_column} FROM {table}
+                ORDER BY COALESCE(last_accessed, timestamp) ASC
+                LIMIT ?
+            )
+        ''', (count,))
+        return cursor.rowcount
+
+    def _sweep(self, conn: sqlite3.Connection) -> dict:
+        with self._touch_lock:
+            touched, self._touched = self._touched, {table: {} for table in cache_tables()}
+
+        expired = evicted = 0
+        for table, (key_column, ttl_hours) in cache_tables().items():
+            if touched[table]:
+                conn.executemany(f"UPDATE {table} SET last_accessed = ? WHERE {key_column} = ?",
+                                 [(at, key) for key, at in touched[table].items()])
+
+            cutoff = (datetime.now() - timedelta(hours=ttl_hours)).isoformat()
+            expired += conn.execute(f"DELETE FROM {table} WHERE timestamp < ?", (cutoff,)).rowcount
+
+            rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            if rows > self.max_rows:
+                evicted += self._evict_lru(conn, table, key_column, rows - self.max_rows)
+
+        # Over the byte budget: drop the oldest 10% of every table until it fits
+        while self._db_bytes(conn) > self.max_bytes:
+            removed = 0
+            for table, (key_column, _) in cache_tables().items():
+                rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                removed += self._evict_lru(conn, table, key_column, max(1, rows // 10)) if rows else 0
+            evicted += removed
+            if not removed:
+                break
+
+        # Rows evicted or expired on disk must not keep being served from memory
+        hot_keys = search_l1.keys()
+        if hot_keys:
+            live = {row[0] for row in conn.execute(
+                f"SELECT id FROM searches WHERE id IN ({','.join('?' * len(hot_keys))})", hot_keys)}
+            search_l1.discard([key for key in hot_keys if key not in live])
+
+        conn.commit()
+        # The checkpoint copies the vacuumed pages out of the WAL so the file actually shrinks
+        conn.executescript(f"PRAGMA incremental_vacuum({self.vacuum_pages}); PRAGMA wal_checkpoint(PASSIVE);")
+        return {"expired_removed": expired, "evictions": evicted}
+
+    async def sweep(self) -> dict:
+        """Runs one sweep on the writer thread."""
+        result = await self.backend.write(self._sweep)
+        self.stats["sweeps"] += 1
+        self.stats["expired_removed"] += result["expired_removed"]
+        self.stats["evictions"] += result["evictions"]
+        if result["expired_removed"] or result["evictions"]:
+            logger.info(f"Cache sweep: {result['expired_removed']} expired, {result['evictions']} evicted.")
+        return result
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Cache sweep failed: {e}")
+
+    async def prepare(self):
+        """Creates the tables and runs the one-time migration off the event loop, before start()."""
+        await asyncio.to_thread(init_db)
+        await asyncio.to_thread(migrate_db)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _size_stats(self, conn: sqlite3.Connection) -> dict:
+        tables = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in cache_tables()}
+        return {"rows": tables, "bytes": self._db_bytes(conn)}
+
+    async def get_stats(self) -> dict:
+        size = await self.backend.read(self._size_stats)
+        searches = _stats_snapshot(SEARCH_CACHE_STATS)
+        search_total = searches["hits"] + searches["misses"]
+        return {
+            "searches": {**searches, "hit_rate": round(searches["hits"] / search_total, 3) if search_total else 0.0},
+            "scores": get_score_cache_stats(),
+            "l1": search_l1.get_stats(),
+            **self.stats,
+            **size,
+            "max_rows": self.max_rows,
+            "max_bytes": self.max_bytes,
+        }
+
+
+class MemoryLRU():
+    """
+    In-process LRU in front of the searches table so hot keys never touch disk.
+    Entries are the stored JSON bytes and keep the timestamp of their DB row, expiring with it.
+    """
+
+    def __init__(self, max_entries: int = None, ttl_hours: float = None):
+        self.max_entries = max(1, max_entries or L1_CACHE_MAX_ENTRIES)
+        self.ttl_hours = ttl_hours or CACHE_EXPIRY_HOURS
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and datetime.now() - entry[1] >= timedelta(hours=self.ttl_hours):
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[0]
+
+    def peek(self, key: str):
+        """Like get, without counting or reordering, for lookups that aren't user cache reads."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or datetime.now() - entry[1] >= timedelta(hours=self.ttl_hours):
+                return None
+            return entry[0]
+
+    def put(self, key: str, value: bytes, saved_at: datetime = None):
+        with self._lock:
+            self._entries[key] = (value, saved_at or datetime.now())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def keys(self) -> list:
+        with self._lock:
+            return list(self._entries)
+
+    def discard(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries), "max_entries": self.max_entries}
+
+
+cache_backend = AsyncCacheBackend()
+cache_manager = CacheManager(cache_backend)
+search_l1 = MemoryLRU()
+
+def generate_cache_key(keywords: str, country: str, page: int, score_mode: str = "llm") -> str:
     """Creates a unique ID for this specific search combination."""
     k = keywords.lower().strip() if keywords else ""
     c = country.lower().strip() if country else ""
     p = str(page)
-    
+
     raw_string = f"{k}|{c}|{p}"
+    if score_mode != "llm":
+        # LLM-scored keys keep their original shape so existing cache rows stay valid
+        raw_string += f"|{score_mode}"
     return hashlib.sha256(raw_string.encode()).hexdigest()
 
-def get_cached_results(keywords: str, country: str, page: int):
-    """
-    Checks DB for saved results. 
-    Returns: List of profiles OR None if cache is empty/expired.
-    """
-    key = generate_cache_key(keywords, country, page)
-    
-    conn = sqlite3.connect(DB_FILE)
+def _read_raw(conn: sqlite3.Connection, key: str) -> Optional[bytes]:
+    """The stored JSON array of a search, exactly as it was written."""
     cursor = conn.cursor()
     cursor.execute("SELECT results, timestamp FROM searches WHERE id = ?", (key,))
     row = cursor.fetchone()
-    conn.close()
-    
+
     if row:
         results_json, timestamp_str = row
         saved_time = datetime.fromisoformat(timestamp_str)
-        
+
         if datetime.now() - saved_time < timedelta(hours=CACHE_EXPIRY_HOURS):
             logger.info("✓ CACHE HIT: Serving saved results from DB.")
-            return json.loads(results_json)
+            _count(SEARCH_CACHE_STATS, "hits")
+            cache_manager.touch("searches", key)
+            raw = results_json.encode() if isinstance(results_json, str) else bytes(results_json)
+            search_l1.put(key, raw, saved_time)
+            return raw
         else:
             logger.info(" CACHE EXPIRED: Found data but it's too old.")
+            _count(SEARCH_CACHE_STATS, "misses")
             return None
-            
+
     logger.info("✗ CACHE MISS: No saved data found.")
+    _count(SEARCH_CACHE_STATS, "misses")
     return None
 
-def save_to_cache(keywords: str, country: str, page: int, profiles: list):
-    """Saves new Apify results to the DB."""
-    key = generate_cache_key(keywords, country, page)
-    
+def _peek_raw(conn: sqlite3.Connection, key: str) -> Optional[bytes]:
+    row = conn.execute("SELECT results, timestamp FROM searches WHERE id = ?", (key,)).fetchone()
+    if row is None or datetime.now() - datetime.fromisoformat(row[1]) >= timedelta(hours=CACHE_EXPIRY_HOURS):
+        return None
+    return row[0].encode() if isinstance(row[0], str) else bytes(row[0])
+
+def _read_results(conn: sqlite3.Connection, key: str):
+    raw = _read_raw(conn, key)
+    return orjson.loads(raw) if raw is not None else None
+
+def _serialize_profiles(profiles: list) -> bytes:
+    """
+    Validates every row against GeneralProfile once, at write time, and encodes the list.
+    Readers can then hand the stored bytes out as they are.
+    """
     data_to_save = []
     for p in profiles:
-        if hasattr(p, "dict"):
-            data_to_save.append(p.dict()) 
-        else:
-            data_to_save.append(p)
+        try:
+            data_to_save.append(GeneralProfile.model_validate(p.model_dump() if hasattr(p, "model_dump") else p).model_dump())
+        except ValidationError as e:
+            logger.warning(f"Dropping invalid cache row: {e}")
+    return orjson.dumps(data_to_save)
 
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
+def _read_l1(key: str) -> Optional[bytes]:
+    raw = search_l1.get(key)
+    if raw is not None:
+        logger.info("✓ CACHE HIT: Serving saved results from memory.")
+        _count(SEARCH_CACHE_STATS, "hits")
+        cache_manager.touch("searches", key)
+    return raw
+
+def _write_results(conn: sqlite3.Connection, key: str, keywords: str, country: str, page: int, raw: bytes):
+    conn.execute('''
+        INSERT OR REPLACE INTO searches (id, keywords, country, page, results, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (key, keywords, country, page, raw.decode(), datetime.now().isoformat()))
+
+def get_cached_results(keywords: str, country: str, page: int, score_mode: str = "llm"):
+    """
+    Checks DB for saved results.
+    Returns: List of profiles OR None if cache is empty/expired.
+    """
+    key = generate_cache_key(keywords, country, page, score_mode)
+    cached = _read_l1(key)
+    if cached is not None:
+        return orjson.loads(cached)
+    conn = _connect()
+    try:
+        return _read_results(conn, key)
+    finally:
+        conn.close()
+
+async def get_cached_results_async(keywords: str, country: str, page: int, score_mode: str = "llm"):
+    """Non-blocking get_cached_results."""
+    raw = await get_cached_json_async(keywords, country, page, score_mode)
+    return orjson.loads(raw) if raw is not None else None
+
+async def get_cached_json_async(keywords: str, country: str, page: int, score_mode: str = "llm") -> Optional[bytes]:
+    """
+    Saved results as the stored JSON bytes, without parsing them.
+    Rows were validated when they were saved, so the bytes can be sent as a response directly.
+    """
+    key = generate_cache_key(keywords, country, page, score_mode)
+    cached = _read_l1(key)
+    if cached is not None:
+        return cached
+    return await cache_backend.read(_read_raw, key)
+
+async def peek_cached_results_async(keywords: str, country: str, page: int, score_mode: str = "llm"):
+    """
+    Saved results without counting a cache hit or miss or refreshing last_accessed.
+    For internal lookups such as seeding the lead dedup index from neighbouring pages.
+    """
+    key = generate_cache_key(keywords, country, page, score_mode)
+    raw = search_l1.peek(key)
+    if raw is None:
+        raw = await cache_backend.read(_peek_raw, key)
+    return orjson.loads(raw) if raw is not None else None
+
+def save_to_cache(keywords: str, country: str, page: int, profiles: list, score_mode: str = "llm"):
+    """Saves new Apify results to the DB."""
+    key = generate_cache_key(keywords, country, page, score_mode)
+    conn = _connect()
     try:
-        cursor.execute('''
-            INSERT OR REPLACE INTO searches (id, keywords, country, page, results, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (key, keywords, country, page, json.dumps(data_to_save), datetime.now().isoformat()))
+        raw = _serialize_profiles(profiles)
+        _write_results(conn, key, keywords, country, page, raw)
         conn.commit()
+        search_l1.put(key, raw)
         logger.info(" CACHE SAVED: Results stored in DB.")
     except Exception as e:
         logger.error(f"Failed to save cache: {e}")
     finally:
         conn.close()
 
-init_db()
\ No newline at end of file
+async def save_to_cache_async(keywords: str, country: str, page: int, profiles: list, score_mode: str = "llm"):
+    """Non-blocking save_to_cache, committed with the next write batch."""
+    key = generate_cache_key(keywords, country, page, score_mode)
+    try:
+        raw = _serialize_profiles(profiles)
+        await cache_backend.write(_write_results, key, keywords, country, page, raw)
+        search_l1.put(key, raw)
+        logger.info(" CACHE SAVED: Results stored in DB.")
+    except Exception as e:
+        logger.error(f"Failed to save cache: {e}")
+
+def _normalize_value(value):
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, dict):
+        return {k: _normalize_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize_value(v) for v in value]
+    return value
+
+def generate_score_key(profile: dict, criteria, model: str) -> str:
+    """
+    Content-addressed key for a lead score.
+    Whitespace/casing differences in the profile or criteria map to the same key,
+    criteria order is ignored and the model name is part of the key.
+    """
+    fingerprint = {k: _normalize_value(v) for k, v in profile.items() if k not in ("score", "email")}
+    if isinstance(criteria, (list, tuple)):
+        normalized_criteria = sorted(_normalize_value(str(c)) for c in criteria)
+    else:
+        normalized_criteria = _normalize_value(str(criteria))
+
+    raw_string = json.dumps([fingerprint, normalized_criteria, model], sort_keys=True, default=str)
+    return hashlib.sha256(raw_string.encode()).hexdigest()
+
+def _read_score(conn: sqlite3.Connection, key: str):
+    cursor = conn.cursor()
+    cursor.execute("SELECT score, timestamp FROM scores WHERE id = ?", (key,))
+    row = cursor.fetchone()
+
+    if row:
+        score, timestamp_str = row
+        if datetime.now() - datetime.fromisoformat(timestamp_str) < timedelta(hours=SCORE_CACHE_EXPIRY_HOURS):
+            _count(SCORE_CACHE_STATS, "hits")
+            cache_manager.touch("scores", key)
+            return score
+
+    _count(SCORE_CACHE_STATS, "misses")
+    return None
+
+def _write_score(conn: sqlite3.Connection, key: str, score: int, model: str):
+    conn.execute('''
+        INSERT OR REPLACE INTO scores (id, model, score, timestamp)
+        VALUES (?, ?, ?, ?)
+    ''', (key, model, score, datetime.now().isoformat()))
+
+def get_cached_score(key: str):
+    """
+    Looks up a previously computed lead score.
+    Returns: The score OR None if it is missing/expired.
+    """
+    conn = _connect()
+    try:
+        return _read_score(conn, key)
+    finally:
+        conn.close()
+
+async def get_cached_score_async(key: str):
+    """Non-blocking get_cached_score."""
+    return await cache_backend.read(_read_score, key)
+
+def save_score(key: str, score: int, model: str):
+    """Stores a lead score under its content key."""
+    conn = _connect()
+    try:
+        _write_score(conn, key, score, model)
+        conn.commit()
+    except Exception as e:
+        logger.error(f"Failed to save score: {e}")
+    finally:
+        conn.close()
+
+async def save_score_async(key: str, score: int, model: str):
+    """Non-blocking save_score, committed with the next write batch."""
+    try:
+        await cache_backend.write(_write_score, key, score, model)
+    except Exception as e:
+        logger.error(f"Failed to save score: {e}")
+
+def get_score_cache_stats() -> dict:
+    stats = _stats_snapshot(SCORE_CACHE_STATS)
+    total = stats["hits"] + stats["misses"]
+    hit_rate = stats["hits"] / total if total else 0.0
+    return {**stats, "hit_rate": round(hit_rate, 3)}
+
+def _read_profiles(conn: sqlite3.Connection, urls: list) -> dict:
+    keys = list(dict.fromkeys(key for key in (normalize_linkedin_url(url) for url in urls) if key))
+    if not keys:
+        return {}
+
+    cursor = conn.cursor()
+    rows = []
+    for start in range(0, len(keys), 500):  # stay below SQLite's bound-parameter limit
+        chunk = keys[start:start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        cursor.execute(f"SELECT url, payload, timestamp FROM profiles WHERE url IN ({placeholders})", chunk)
+        rows.extend(cursor.fetchall())
+
+    found = {}
+    for url, payload, timestamp_str in rows:
+        if datetime.now() - datetime.fromisoformat(timestamp_str) < timedelta(hours=PROFILE_CACHE_EXPIRY_HOURS):
+            found[url] = json.loads(payload)
+            cache_manager.touch("profiles", url)
+    return found
+
+def _write_profiles(conn: sqlite3.Connection, profiles: dict):
+    now = datetime.now().isoformat()
+    conn.executemany('''
+        INSERT OR REPLACE INTO profiles (url, payload, timestamp)
+        VALUES (?, ?, ?)
+    ''', [(key, json.dumps(payload), now) for key, payload in
+          ((normalize_linkedin_url(url), payload) for url, payload in profiles.items()) if key])
+
+def get_cached_profiles(urls: list) -> dict:
+    """
+    Looks up raw Apify profile payloads by LinkedIn URL, any variant of a stored URL matches.
+    Returns: {normalized url: payload} for the fresh entries only.
+    """
+    conn = _connect()
+    try:
+        return _read_profiles(conn, urls)
+    finally:
+        conn.close()
+
+async def get_cached_profiles_async(urls: list) -> dict:
+    """Non-blocking get_cached_profiles."""
+    return await cache_backend.read(_read_profiles, urls)
+
+def save_profiles(profiles: dict):
+    """Stores raw Apify profile payloads keyed by normalized LinkedIn URL (the keys are normalized here)."""
+    if not profiles:
+        return
+
+    conn = _connect()
+    try:
+        _write_profiles(conn, profiles)
+        conn.commit()
+        logger.info(f"PROFILE CACHE SAVED: {len(profiles)} profiles stored in DB.")
+    except Exception as e:
+        logger.error(f"Failed to save profiles: {e}")
+    finally:
+        conn.close()
+
+async def save_profiles_async(profiles: dict):
+    """Non-blocking save_profiles, committed with the next write batch."""
+    if not profiles:
+        return
+    try:
+        await cache_backend.write(_write_profiles, profiles)
+        logger.info(f"PROFILE CACHE SAVED: {len(profiles)} profiles stored in DB.")
+    except Exception as e:
+        logger.error(f"Failed to save profiles: {e}")
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:] == ["migrate"]:
+        init_db()
+        migrate_db(force=True)
@@ -1,8 +1,9 @@
 from utils.llm_client import calculate_score
+from utils.export import CSV_COLUMNS, export_row, write_export
+from utils.emails import clean_company_name, generate_emails
+import asyncio
 import logging
 import re
-import csv
-import io
 
 logger = logging.getLogger(__name__)
 
@@ -13,29 +14,9 @@ if __name__ == "__main__":
     )
 
 def email_generator(profile):
+    """Email for a single lead, see utils.emails.generate_emails for batches."""
     try:
-        name_str = profile.get("name", "")
-        logger.info("Generating email for profile: %s", name_str)
-        
-        parts = name_str.split()
-        if parts:
-            first_name = parts[0].strip().lower()
-            last_name = parts[-1].strip().lower()
-        else:
-            first_name = "user"
-            last_name = "user"
-            
-        # 2. Sanitize education/university
-        raw_edu = str(profile.get("education", ""))
-        university = "".join(c for c in raw_edu.lower() if c.isalnum())
-        
-        if not university:
-            university = "systemgenerated"
-
-        email = f"{first_name}.{last_name}@{university}.edu"
-        
-        logger.info("Email generated successfully.")
-        return email
+        return generate_emails([profile])[0]
     except Exception as e:
         logger.exception("Error generating email: %s", e)
         return "noemail@generated.edu"
@@ -75,8 +56,8 @@ def lead_presentation(profiles_with_scores):
     final_leads = []
     try:
         logger.info("Formatting generated leads for presentation.")
-        for lead in profiles_with_scores:
-            lead["email"] = email_generator(lead)
+        for lead, email in zip(profiles_with_scores, generate_emails(profiles_with_scores)):
+            lead["email"] = email
             final_leads.append(lead)
         logger.info("Leads formatted successfully.")
         return final_leads
@@ -101,24 +82,11 @@ async def data_pipeline(raw_data, keywords=None):
         raise
     
     
-async def export(profile_list):
+async def export(profile_list, filename: str = "leads.csv"):
+    """Writes the leads to a CSV file row by row and returns its name."""
     try:
-         column_names = ["Name", "LinkedIn URL", "Current Role", "University", "Country", "Email", "Score"]
-         output = io.StringIO()
-         writer = csv.writer(output, delimiter=",", quotechar='"', quoting=csv.QUOTE_MINIMAL)
-         writer.writerow(column_names)
-         for profile in profile_list:
-            writer.writerow([  
-                profile.get("name", "Null"),
-                profile.get("linkedin_url", "Null"),
-                profile.get("current_role", "Null"),
-                profile.get("education", "Null"),
-                profile.get("country", "Null"),
-                profile.get("email", "Null"),
-                profile.get("score", "Null")
-            ])
-         logger.info("CSV content generated in-memory successfully.")
-         return output.getvalue()
+        await asyncio.to_thread(write_export, profile_list, filename)
+        return filename
     except Exception as e:
-            logger.exception("Error creating CSV content: %s", e)
-            return None
\ No newline at end of file
+        logger.exception("Error creating CSV export: %s", e)
+        return None
\ No newline at end of file
@@ -0,0 +1,132 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Hashable, List, Optional, Tuple
+
+from utils.emails import clean_company_name
+from utils.relevance import without_placeholders
+from validators.linkedin import normalize_linkedin_url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEDUP_MAX_SEARCHES = 512  # searches whose leads are remembered across pages
+DEFAULT_DEDUP_SEED_PAGES = 5  # cached earlier pages a search's index is seeded from
+DEDUP_MAX_SEARCHES = int(os.getenv("DEDUP_MAX_SEARCHES", DEFAULT_DEDUP_MAX_SEARCHES))
+DEDUP_SEED_PAGES = int(os.getenv("DEDUP_SEED_PAGES", DEFAULT_DEDUP_SEED_PAGES))
+PLACEHOLDER_NAMES = {"linkedin user", "user"}
+
+
+def lead_keys(profile: dict) -> List[str]:
+    """
+    Identity keys of a lead: its normalized LinkedIn URL and, when both are known,
+    its name + normalized company, which catches URL variants of the same person.
+    """
+    keys = []
+    url = normalize_linkedin_url(profile.get("linkedin_url") or "")
+    if url and without_placeholders(url):
+        keys.append(f"url:{url}")
+
+    name = " ".join(str(profile.get("name") or "").lower().split())
+    company = clean_company_name(profile.get("company"))
+    if name and company and name not in PLACEHOLDER_NAMES and without_placeholders(name):
+        keys.append(f"name:{name}|{company}")
+    return keys
+
+
+dedup_stats: ContextVar[Optional[dict]] = ContextVar("dedup_stats", default=None)
+
+@contextmanager
+def track_duplicates():
+    """`with track_duplicates() as stats:` counts duplicates removed inside the block in stats["removed"]."""
+    stats = {"removed": 0}
+    token = dedup_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        dedup_stats.reset(token)
+
+def count_duplicates(removed: int):
+    stats = dedup_stats.get()
+    if stats is not None and removed:
+        stats["removed"] += removed
+
+
+class DedupIndex():
+    """
+    Lead keys -> the owner (e.g. result page) that first returned the lead.
+    A lead is a duplicate when one of its keys was already seen in the same batch
+    or belongs to another owner, so re-running a page never empties it.
+    """
+
+    def __init__(self):
+        self._owners = {}
+        self._known = set()  # owners whose leads are recorded
+        self._lock = threading.Lock()
+
+    def knows(self, owner: Hashable) -> bool:
+        with self._lock:
+            return owner in self._known
+
+    def seed(self, profiles: List[dict], owner: Hashable):
+        """Records the leads an owner already returned, e.g. a page served from the cache."""
+        with self._lock:
+            for profile in profiles:
+                for key in lead_keys(profile):
+                    self._owners.setdefault(key, owner)
+            self._known.add(owner)
+
+    def dedupe(self, profiles: List[dict], owner: Hashable = None) -> Tuple[List[dict], int]:
+        """Returns (first occurrence of every lead in input order, number of duplicates removed)."""
+        unique = []
+        seen = set()
+        with self._lock:
+            for profile in profiles:
+                keys = lead_keys(profile)
+                if any(key in seen or self._owners.get(key, owner) != owner for key in keys):
+                    continue
+                seen.update(keys)
+                unique.append(profile)
+            for key in seen:
+                self._owners.setdefault(key, owner)
+            self._known.add(owner)
+        return unique, len(profiles) - len(unique)
+
+    def add(self, profile: dict) -> bool:
+        """Records one lead, False when any of its keys was recorded before."""
+        keys = lead_keys(profile)
+        with self._lock:
+            if any(key in self._owners for key in keys):
+                return False
+            for key in keys:
+                self._owners[key] = None
+        return True
+
+    def __len__(self) -> int:
+        return len(self._owners)
+
+
+class SearchDedup():
+    """
+    One DedupIndex per search, the least recently used searches are forgotten.
+    Indexes live in the worker process, so dedup across pages is best-effort: another
+    worker or a restart starts from the cached pages the index is seeded from.
+    """
+
+    def __init__(self, max_searches: Optional[int] = None):
+        self.max_searches = max(1, max_searches or DEDUP_MAX_SEARCHES)
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def for_search(self, keywords: Optional[str], country: Optional[str], mode: str = "llm") -> DedupIndex:
+        key = f"{(keywords or '').lower().strip()}|{(country or '').lower().strip()}|{mode}"
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = self._indexes[key] = DedupIndex()
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_searches:
+                self._indexes.popitem(last=False)
+            return index
@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+import re
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMAIL_DOMAINS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "email_domains.json")
+EMAIL_DOMAINS_FILE = os.getenv("EMAIL_DOMAINS_FILE", DEFAULT_EMAIL_DOMAINS_FILE)
+FALLBACK_EMAIL_DOMAIN = "gmail.com"
+NAME_CACHE_SIZE = 65536
+
+# Trailing words that are part of a legal entity name, not of the brand
+LEGAL_SUFFIXES = {
+    "inc", "incorporated", "llc", "ltd", "limited", "plc", "corp", "corporation", "co", "company",
+    "gmbh", "ag", "sa", "bv", "nv", "llp", "lp", "pty", "pvt", "private", "srl", "spa", "oy", "ab",
+}
+# Values that mean "no employer" or are scraper placeholders
+NO_COMPANY = {
+    "unknown", "none", "na", "n a", "null", "nil", "self employed", "selfemployed", "freelance", "freelancer",
+    "independent", "unemployed", "confidential", "stealth", "stealth startup", "not available",
+    "company unavailable", "unavailable", "position unavailable", "current role unavailable",
+}
+# Generic words left out of a school's default .edu domain
+SCHOOL_WORDS = {"university", "college", "institute", "school", "of", "the", "and", "for", "polytechnic"}
+
+_WORDS = re.compile(r"[a-z0-9]+")
+
+
+def _words(value) -> List[str]:
+    return _WORDS.findall(str(value or "").lower().replace("&", " and "))
+
+@lru_cache(maxsize=1)
+def domain_index() -> dict:
+    """Company and school alias tables, read from EMAIL_DOMAINS_FILE once per process."""
+    try:
+        with open(EMAIL_DOMAINS_FILE, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not load email domain aliases from {EMAIL_DOMAINS_FILE}: {e}")
+        data = {}
+    return {"companies": data.get("companies", {}), "schools": data.get("schools", {})}
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def clean_company_name(company: Optional[str]) -> str:
+    """
+    Normalized company name: lowercase alphanumerics with legal suffixes stripped,
+    "Tesla Motors, Inc." -> "teslamotors". Placeholders and "no employer" values give "".
+    """
+    words = _words(company)
+    if not words or " ".join(words) in NO_COMPANY:
+        return ""
+    while len(words) > 1 and words[-1] in LEGAL_SUFFIXES:
+        words.pop()
+    return "".join(words)
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def company_domain(company: Optional[str]) -> str:
+    """Mail domain of a company, from the alias table or <name>.com. "" when unknown."""
+    name = clean_company_name(company)
+    if not name:
+        return ""
+    return domain_index()["companies"].get(name, f"{name}.com")
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def school_domain(school: Optional[str]) -> str:
+    """Mail domain of a school, from the alias table or <name>.edu without the generic words. "" when unknown."""
+    words = _words(school)
+    if not words or " ".join(words) in NO_COMPANY:
+        return ""
+    alias = domain_index()["schools"].get("".join(words))
+    if alias:
+        return alias
+    name = "".join(word for word in words if word not in SCHOOL_WORDS) or "".join(words)
+    return f"{name}.edu"
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def email_local_part(name: Optional[str]) -> str:
+    """first.last from a full name, "user" when there is no usable name."""
+    words = [w for w in (_WORDS.findall(part.lower()) for part in str(name or "").split()) if w]
+    if not words:
+        return "user"
+    first, last = "".join(words[0]), "".join(words[-1])
+    return first if len(words) == 1 else f"{first}.{last}"
+
+def _education_name(education) -> str:
+    if isinstance(education, list):
+        education = education[0] if education else ""
+    if isinstance(education, dict):
+        education = education.get("school") or ""
+    return education or ""
+
+def generate_emails(profiles: Iterable[dict]) -> List[str]:
+    """
+    Guessed work email for every lead: the company's domain first, then the school's,
+    then gmail.com. Names and domains are memoized, so repeats across a batch are free.
+    """
+    emails = []
+    for profile in profiles:
+        local = email_local_part(profile.get("name"))
+        domain = (company_domain(profile.get("company"))
+                  or school_domain(_education_name(profile.get("education")))
+                  or FALLBACK_EMAIL_DOMAIN)
+        emails.append(f"{local}@{domain}")
+    return emails
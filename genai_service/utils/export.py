@@ -0,0 +1,104 @@
+import csv
+import io
+import json
+import logging
+import zlib
+from typing import Iterable, Iterator, List, Literal, Tuple
+
+from models.schemas import GeneralProfile
+
+logger = logging.getLogger(__name__)
+
+ExportFormat = Literal["csv", "ndjson"]
+
+Columns = List[Tuple[str, str]]  # (CSV header, lead field)
+
+# Enrichment downloads, the layout partners import
+ENRICHMENT_COLUMNS: Columns = [
+    ("Name", "name"), ("LinkedIn URL", "linkedin_url"), ("Current Role", "current_role"), ("University", "education"),
+    ("Country", "country"), ("Email", "email"), ("Score", "score"),
+]
+# /export/csv, every GeneralProfile field under its own name
+PROFILE_COLUMNS: Columns = [(field, field) for field in GeneralProfile.model_fields]
+CSV_COLUMNS = [header for header, _ in ENRICHMENT_COLUMNS]
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+DEFAULT_EXPORT_CHUNK_BYTES = 64 * 1024  # rows are buffered up to this size before a chunk is sent
+
+
+def export_row(profile: dict, columns: Columns = ENRICHMENT_COLUMNS) -> list:
+    """One CSV row in `columns` order."""
+    return [profile.get(field, "Null") for _, field in columns]
+
+def _as_dict(profile) -> dict:
+    return profile.model_dump() if hasattr(profile, "model_dump") else profile
+
+def csv_lines(profiles: Iterable, columns: Columns = ENRICHMENT_COLUMNS) -> Iterator[str]:
+    """The header, then one CSV line per profile. Only the current line is held in memory."""
+    line = io.StringIO()
+    writer = csv.writer(line, delimiter=",", quotechar='"', quoting=csv.QUOTE_MINIMAL)
+    writer.writerow([header for header, _ in columns])
+    yield line.getvalue()
+    for profile in profiles:
+        line.seek(0)
+        line.truncate()
+        writer.writerow(export_row(_as_dict(profile), columns))
+        yield line.getvalue()
+
+def ndjson_lines(profiles: Iterable) -> Iterator[str]:
+    for profile in profiles:
+        yield json.dumps(_as_dict(profile), default=str) + "\n"
+
+def _chunked(lines: Iterator[str], chunk_bytes: int) -> Iterator[bytes]:
+    buffer = []
+    size = 0
+    for line in lines:
+        data = line.encode("utf-8")
+        buffer.append(data)
+        size += len(data)
+        if size >= chunk_bytes:
+            yield b"".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b"".join(buffer)
+
+def _gzipped(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # 31 -> gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def export_chunks(profiles: Iterable, format: ExportFormat = "csv", gzip: bool = False,
+                  chunk_bytes: int = DEFAULT_EXPORT_CHUNK_BYTES, columns: Columns = ENRICHMENT_COLUMNS) -> Iterator[bytes]:
+    """
+    Encodes leads (dicts or GeneralProfile) as CSV or NDJSON, optionally gzipped,
+    one bounded chunk at a time, so the whole file never sits in memory.
+    `columns` picks the CSV layout, NDJSON always carries every field.
+    """
+    lines = csv_lines(profiles, columns) if format == "csv" else ndjson_lines(profiles)
+    chunks = _chunked(lines, chunk_bytes)
+    return _gzipped(chunks) if gzip else chunks
+
+def export_text(profiles: Iterable, columns: Columns = ENRICHMENT_COLUMNS) -> str:
+    """The whole CSV as one string, only for the deprecated `csv_content` field of /api/enrich."""
+    return "".join(csv_lines(profiles, columns))
+
+def export_headers(name: str, format: ExportFormat = "csv", gzip: bool = False) -> dict:
+    """Download headers, gzipped exports are served as .gz files rather than with Content-Encoding."""
+    filename = f"{name}.{format}" + (".gz" if gzip else "")
+    return {"Content-Disposition": f"attachment; filename={filename}"}
+
+def media_type(format: ExportFormat = "csv", gzip: bool = False) -> str:
+    return "application/gzip" if gzip else MEDIA_TYPES[format]
+
+def write_export(profiles: Iterable, path: str, format: ExportFormat = "csv", gzip: bool = False) -> int:
+    """Writes an export to `path` chunk by chunk, returns the number of bytes written."""
+    written = 0
+    with open(path, "wb") as f:
+        for chunk in export_chunks(profiles, format, gzip):
+            f.write(chunk)
+            written += len(chunk)
+    logger.info(f"Exported leads to {path} ({written} bytes).")
+    return written
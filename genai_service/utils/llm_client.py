@@ -4,8 +4,18 @@ from dotenv import load_dotenv
 import logging
 import os
 import asyncio
+import json
 import re  
-from config.prompts import platform_prompt, score_prompt, role_extraction_prompt
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from utils.caching import generate_score_key, get_cached_score_async, save_score_async
+from utils.serialization import serialize_lead, serialize_leads
+from validators.linkedin import normalize_linkedin_url
+from config.prompts import platform_prompt, score_prompt, role_extraction_prompt, batch_score_prompt
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -19,11 +29,38 @@ if __name__ == "__main__":
 DEFAULT_GENERAL_MODEL = "llama-3.3-70b-versatile"
 DEFAULT_CORE_MODEL = "llama-3.3-70b-versatile"
 DEFAULT_FALLBACK_MODEL ="llama-3.1-8b-instant"
+DEFAULT_FAST_MODEL = DEFAULT_FALLBACK_MODEL  # first pass of cascade scoring
+
+# Cascade scoring: fast model scores in this band (inclusive) are re-scored by the core model
+DEFAULT_CASCADE_ESCALATE_MIN = 4
+DEFAULT_CASCADE_ESCALATE_MAX = 7
+CASCADE_ESCALATE_MIN = int(os.getenv("CASCADE_ESCALATE_MIN", DEFAULT_CASCADE_ESCALATE_MIN))
+CASCADE_ESCALATE_MAX = int(os.getenv("CASCADE_ESCALATE_MAX", DEFAULT_CASCADE_ESCALATE_MAX))
+
+DEFAULT_DISCOVERY_TOKEN_BUDGET = 6000  # estimated tokens per role extraction request, prompt and answer included
+DEFAULT_DISCOVERY_CONCURRENCY = 4
+DEFAULT_DISCOVERY_MAX_RETRIES = 3  # retries of a rate limited (429) request
+DEFAULT_DISCOVERY_BACKOFF_SECONDS = 1.0
+DEFAULT_DISCOVERY_OUTPUT_TOKENS_PER_PROFILE = 80
+DEFAULT_DISCOVERY_PROMPT_TOKENS = 500
+DISCOVERY_TOKEN_BUDGET = int(os.getenv("DISCOVERY_TOKEN_BUDGET", DEFAULT_DISCOVERY_TOKEN_BUDGET))
+DISCOVERY_CONCURRENCY = int(os.getenv("DISCOVERY_CONCURRENCY", DEFAULT_DISCOVERY_CONCURRENCY))
+DISCOVERY_MAX_RETRIES = int(os.getenv("DISCOVERY_MAX_RETRIES", DEFAULT_DISCOVERY_MAX_RETRIES))
+DISCOVERY_BACKOFF_SECONDS = float(os.getenv("DISCOVERY_BACKOFF_SECONDS", DEFAULT_DISCOVERY_BACKOFF_SECONDS))
+DISCOVERY_OUTPUT_TOKENS_PER_PROFILE = int(os.getenv("DISCOVERY_OUTPUT_TOKENS_PER_PROFILE", DEFAULT_DISCOVERY_OUTPUT_TOKENS_PER_PROFILE))
+
+DEFAULT_LLM_RPM = 30  # Groq requests per minute, 0 disables the limit
+DEFAULT_LLM_TPM = 12000  # Groq tokens per minute, 0 disables the limit
+LLM_RPM = float(os.getenv("LLM_RPM", DEFAULT_LLM_RPM))
+LLM_TPM = float(os.getenv("LLM_TPM", DEFAULT_LLM_TPM))
+DEFAULT_LLM_CALL_TIMEOUT = 30  # seconds per model call, time queued in the scheduler is not counted
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", DEFAULT_LLM_CALL_TIMEOUT))
 
 try:
     logger.info("Setting up main Groq LLM models.")
     general_model_name = os.getenv("GENERAL_MODEL", DEFAULT_GENERAL_MODEL)
     core_model_name = os.getenv("CORE_MODEL", DEFAULT_CORE_MODEL)
+    fast_model_name = os.getenv("FAST_MODEL", DEFAULT_FAST_MODEL)
     groq_api_key = os.getenv("GROQ_API_KEY")
     
     if not groq_api_key:
@@ -31,25 +68,245 @@ try:
     
     general_model = ChatGroq(model=general_model_name, api_key=groq_api_key)
     core_model = ChatGroq(model=core_model_name, api_key=groq_api_key)
+    fast_model = ChatGroq(model=fast_model_name, api_key=groq_api_key)
     logger.info(f"Successfully set up core logic model: {core_model_name}")
+    logger.info(f"Successfully set up fast scoring model: {fast_model_name}")
     logger.info(f"Successfully set up general model: {general_model_name}")
 except Exception as e:
     logger.exception("Failed to set up general models. Switching to Fallback model")
     fallback_model_name = os.getenv("FALLBACK_MODEL", DEFAULT_FALLBACK_MODEL)
     general_model = ChatGroq(model=fallback_model_name, api_key=os.getenv("GROQ_API_KEY"))
+    core_model = fast_model = general_model
+    core_model_name = fast_model_name = fallback_model_name
     logger.info(f"Using fallback model: {fallback_model_name}")
 
+def build_chains(model):
+    """Prompt | model | parser pipelines, built once and reused by every call."""
+    return (
+        platform_prompt | model | StrOutputParser(),
+        score_prompt | model | StrOutputParser(),
+        batch_score_prompt | model | JsonOutputParser(),
+        # Parsed by the caller, which also needs the message's usage metadata
+        role_extraction_prompt | model,
+    )
+
+platform_chain, score_chain, batch_score_chain, role_chain = build_chains(core_model)
+_, fast_score_chain, fast_batch_score_chain, _ = build_chains(fast_model)
+
 
 class LLMError(Exception):
     pass
 
+def estimate_tokens(value) -> int:
+    """Rough token count (~4 characters per token), good enough to size requests."""
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return len(text) // 4 + 1
+
+def _prompt_tokens(prompt) -> int:
+    try:
+        return sum(estimate_tokens(message.prompt.template) for message in prompt.messages)
+    except AttributeError:
+        return DEFAULT_DISCOVERY_PROMPT_TOKENS
+
+DISCOVERY_PROMPT_TOKENS = _prompt_tokens(role_extraction_prompt)
+SCORE_PROMPT_TOKENS = _prompt_tokens(score_prompt)
+BATCH_SCORE_PROMPT_TOKENS = _prompt_tokens(batch_score_prompt)
+PLATFORM_PROMPT_TOKENS = _prompt_tokens(platform_prompt)
+
+PRIORITIES = ("interactive", "bulk")  # served strictly in this order
+llm_priority: ContextVar[str] = ContextVar("llm_priority", default="interactive")
+llm_owner: ContextVar[str] = ContextVar("llm_owner", default="default")
+
+@contextmanager
+def llm_context(priority: str = "interactive", owner: Optional[str] = None):
+    """
+    Tags every LLM call made inside the block (and in tasks started from it)
+    with a priority class and an owner the scheduler shares capacity between.
+    """
+    priority_token = llm_priority.set(priority if priority in PRIORITIES else PRIORITIES[-1])
+    owner_token = llm_owner.set(owner or uuid.uuid4().hex[:8])
+    try:
+        yield
+    finally:
+        llm_priority.reset(priority_token)
+        llm_owner.reset(owner_token)
+
+
+llm_call_timeout: ContextVar[Optional[float]] = ContextVar("llm_call_timeout", default=None)
+
+@contextmanager
+def llm_timeout(seconds: Optional[float]):
+    """Bounds every model call made inside the block to `seconds`, counted from when its slot is granted."""
+    token = llm_call_timeout.set(seconds)
+    try:
+        yield
+    finally:
+        llm_call_timeout.reset(token)
+
+
+class TokenBucket():
+    """Refills `per_minute` units per minute, bursts up to one minute's worth. 0 disables the limit."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.level = per_minute
+        self.rate = per_minute / 60
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        if self.capacity <= 0:
+            return 0.0
+        self._refill()
+        # A request bigger than the bucket only waits for a full bucket
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount: float):
+        if self.capacity <= 0:
+            return
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount: float):
+        """Corrects an estimate once the real usage is known, the level may go negative."""
+        if self.capacity > 0:
+            self.level = min(self.capacity, self.level - amount)
+
+
+class LLMGrant():
+    def __init__(self, scheduler: "LLMScheduler", estimated_tokens: int):
+        self.scheduler = scheduler
+        self.estimated_tokens = estimated_tokens
+
+    def record(self, actual_tokens: Optional[int]):
+        if actual_tokens is not None:
+            self.scheduler.tokens.adjust(actual_tokens - self.estimated_tokens)
+
+
+class LLMScheduler():
+    """
+    Single gate for every Groq call.
+    Calls wait until the requests-per-minute and tokens-per-minute buckets allow them.
+    Waiting calls are released by priority (interactive before bulk) and round-robin
+    between owners within a priority, so one big job cannot starve the others.
+    """
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        self.requests = TokenBucket(LLM_RPM if rpm is None else rpm)
+        self.tokens = TokenBucket(LLM_TPM if tpm is None else tpm)
+        self.stats = {p: {"granted": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0} for p in PRIORITIES}
+        self._waiting = {p: OrderedDict() for p in PRIORITIES}  # priority -> owner -> deque of waiters
+        self._loop = None
+        self._wakeup = None
+        self._dispatcher = None
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Waiters of a previous event loop can never be released, start clean
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._dispatcher = None
+            self._waiting = {p: OrderedDict() for p in PRIORITIES}
+
+    def _peek(self):
+        for priority in PRIORITIES:
+            queue = self._waiting[priority]
+            while queue:
+                owner, waiters = next(iter(queue.items()))
+                while waiters and waiters[0][0].done():
+                    waiters.popleft()  # cancelled while waiting
+                if waiters:
+                    return priority, owner, waiters[0]
+                del queue[owner]
+        return None
+
+    def _pop(self, priority: str, owner: str):
+        queue = self._waiting[priority]
+        queue[owner].popleft()
+        if queue[owner]:
+            queue.move_to_end(owner)
+        else:
+            del queue[owner]
+
+    async def _dispatch(self):
+        while (head := self._peek()) is not None:
+            priority, owner, (future, tokens, queued_at) = head
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+            if wait > 0:
+                # Re-check early when a new call arrives, it may outrank the current head
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._pop(priority, owner)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            waited = time.monotonic() - queued_at
+            stats = self.stats[priority]
+            stats["granted"] += 1
+            stats["wait_seconds"] += waited
+            stats["max_wait_seconds"] = max(stats["max_wait_seconds"], waited)
+            future.set_result(None)
+        self._dispatcher = None
+
+    async def acquire(self, estimated_tokens: int) -> LLMGrant:
+        self._bind_loop()
+        priority = llm_priority.get()
+        future = self._loop.create_future()
+        self._waiting[priority].setdefault(llm_owner.get(), deque()).append((future, estimated_tokens, time.monotonic()))
+        self._wakeup.set()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        await future
+        return LLMGrant(self, estimated_tokens)
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int):
+        """`async with llm_scheduler.slot(tokens) as grant:` wraps one LLM call."""
+        yield await self.acquire(estimated_tokens)
+
+    def get_stats(self) -> dict:
+        depth = {p: sum(len(w) for w in self._waiting[p].values()) for p in PRIORITIES}
+        return {
+            "queue_depth": depth,
+            "owners_waiting": {p: len(self._waiting[p]) for p in PRIORITIES},
+            "priorities": {
+                p: {**stats, "avg_wait_seconds": round(stats["wait_seconds"] / stats["granted"], 3) if stats["granted"] else 0.0,
+                    "wait_seconds": round(stats["wait_seconds"], 3), "max_wait_seconds": round(stats["max_wait_seconds"], 3)}
+                for p, stats in self.stats.items()
+            },
+            "rpm": self.requests.capacity,
+            "tpm": self.tokens.capacity,
+        }
+
+
+llm_scheduler = LLMScheduler()
+
+async def _invoke(chain, inputs, estimated_tokens: int, grant_tokens: bool = False):
+    """
+    Runs one chain call once the scheduler grants it a slot.
+    The timeout only starts then, so back-pressure from the rate limits shows up
+    as latency instead of timed out (and default-scored) calls.
+    With `grant_tokens` returns (answer, grant) so real token usage can be recorded.
+    """
+    async with llm_scheduler.slot(estimated_tokens) as grant:
+        answer = await asyncio.wait_for(chain.ainvoke(inputs), timeout=llm_call_timeout.get() or LLM_CALL_TIMEOUT)
+    return (answer, grant) if grant_tokens else answer
+
 async def platform_detection(link: str) -> str: # To determine whether it will remain or be done away with
     """Detect platform from URL with error safety."""
     try:
         if not link:
             raise LLMError("No link provided for platform detection.")
-        platform_chain = platform_prompt | core_model | StrOutputParser()
-        platform = await platform_chain.ainvoke({"link": link})
+        platform = await _invoke(platform_chain, {"link": link}, PLATFORM_PROMPT_TOKENS + estimate_tokens(link))
         logger.info("Detected platform: %s", platform)
         return platform.lower().strip()
     except Exception as e:
@@ -57,69 +314,301 @@ async def platform_detection(link: str) -> str: # To determine whether it will r
         return "unknown"
 
 
+cascade_stats: ContextVar[Optional[dict]] = ContextVar("cascade_stats", default=None)
+
+@contextmanager
+def track_cascade():
+    """
+    Counts cascade scoring work done inside the block (and in tasks started from it):
+    `with track_cascade() as stats:` gives {"scored", "escalated", "unparseable"}.
+    """
+    stats = {"scored": 0, "escalated": 0, "unparseable": 0}
+    token = cascade_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        cascade_stats.reset(token)
+
+def _count_cascade(scored: int, escalated: int, unparseable: int):
+    stats = cascade_stats.get()
+    if stats is None:
+        return
+    stats["scored"] += scored
+    stats["escalated"] += escalated
+    stats["unparseable"] += unparseable
+
+
+async def _lookup_score(profile: dict, criteria, model_name: Optional[str] = None) -> tuple[str | None, int | None]:
+    """Returns (cache key, cached score). Cache trouble never blocks scoring."""
+    try:
+        score_key = generate_score_key(profile, criteria, model_name or core_model_name)
+        return score_key, await get_cached_score_async(score_key)
+    except Exception as e:
+        logger.warning(f"Score cache lookup failed: {e}")
+        return None, None
+
+async def _store_score(score_key: str | None, score: int, model_name: Optional[str] = None):
+    if score_key is None:
+        return
+    try:
+        await save_score_async(score_key, score, model_name or core_model_name)
+    except Exception as e:
+        logger.warning(f"Score cache write failed: {e}")
+
+async def _model_score(chain, model_name: str, profile: dict, criteria: list) -> int | None:
+    """One model's score for a lead, None when its answer holds no score."""
+    score_key, cached_score = await _lookup_score(profile, criteria, model_name)
+    if cached_score is not None:
+        return cached_score
+
+    lead_information = serialize_lead(profile)
+    result = await _invoke(chain, {
+        "lead_information": lead_information,
+        "keywords": criteria
+    }, SCORE_PROMPT_TOKENS + estimate_tokens(lead_information) + estimate_tokens(criteria))
+    match = re.search(r"\b(10|[1-9])\b", result)
+
+    if match:
+        score = max(1, min(10, int(match.group(1))))
+        await _store_score(score_key, score, model_name)
+        return score
+
+    logger.warning(f"Could not parse valid score token from {model_name} response: '{result}'.")
+    return None
+
 async def calculate_score(profile: dict, criteria: list) -> int:
-    """Calculate lead score (1-10) using bounded regex extraction."""
+    """Calculate lead score (1-10) using bounded regex extraction. Repeat profiles are served from the score cache."""
     try:        
-        score_chain = score_prompt | core_model | StrOutputParser()
-        result = await score_chain.ainvoke({
-            "lead_information": str(profile),
-            "keywords": criteria
-        })
-        match = re.search(r"\b(10|[1-9])\b", result)
+        score = await _model_score(score_chain, core_model_name, profile, criteria)
+        if score is None:
+            logger.warning("No score from the core model. Defaulting to 5.")
+            return 5
+        return score
 
-        if match:
-            score = int(match.group(1))
-        else:
-            logger.warning(f"Could not parse valid score token from AI response: '{result}'. Defaulting to 5.")
-            score = 5
-        
-        return max(1, min(10, score))
-        
+    except asyncio.TimeoutError:
+        logger.warning("Scoring call timed out. Defaulting to 5.")
+        return 5
     except Exception as e:
         logger.exception(f"Error calculating score: {e}")
         return 5
 
-async def profile_discovery(profile_snippets: list[dict]) -> list[dict]:
+def _parse_batch_score(value) -> int | None:
+    """Accepts 7 or "7" style scores, anything outside 1-10 counts as malformed."""
+    try:
+        score = int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+    return score if 1 <= score <= 10 else None
+
+async def _model_batch_scores(chain, model_name: str, profiles: list[dict], criteria: list) -> list[int | None]:
     """
-    Extract roles from profile snippets using batch processing.
-    Now processes safely in chunks to avoid Token Limit errors.
+    One model's scores for a block of profiles from a single LLM call.
+    Cached scores are reused and only the remaining profiles are sent.
+    Answers are matched on the normalized linkedin_url, so a dropped slash or another
+    subdomain still matches. Profiles missing from the answer, with a malformed score
+    or with an ambiguous linkedin_url come back as None. A timed out call raises TimeoutError.
     """
-    if not profile_snippets:
+    lookups = await asyncio.gather(*[_lookup_score(profile, criteria, model_name) for profile in profiles])
+    score_keys = [key for key, _ in lookups]
+    scores = [score for _, score in lookups]
+
+    pending = [idx for idx, score in enumerate(scores) if score is None]
+    if not pending:
+        return scores
+
+    urls = [normalize_linkedin_url(profile.get("linkedin_url") or "") for profile in profiles]
+    scores_by_url = {}
+    try:
+        leads = serialize_leads([profiles[idx] for idx in pending])
+        result = await _invoke(chain, {
+            "leads": leads,
+            "keywords": criteria
+        }, BATCH_SCORE_PROMPT_TOKENS + estimate_tokens(leads) + estimate_tokens(criteria))
+        if isinstance(result, dict):
+            result = [result]
+        if isinstance(result, list):
+            for item in result:
+                url = normalize_linkedin_url(item.get("linkedin_url") or "") if isinstance(item, dict) else ""
+                if url:
+                    scores_by_url[url] = _parse_batch_score(item.get("score"))
+        else:
+            logger.warning("Batch scoring: Unexpected return type from AI.")
+    except asyncio.TimeoutError:
+        # The call is cancelled, the caller decides instead of re-scoring every profile on its own
+        raise
+    except Exception as e:
+        logger.error(f"Error calculating batch scores with {model_name}: {e}")
+
+    for idx in pending:
+        url = urls[idx]
+        score = scores_by_url.get(url) if url and urls.count(url) == 1 else None
+        if score is not None:
+            scores[idx] = score
+            await _store_score(score_keys[idx], score, model_name)
+    return scores
+
+async def calculate_batch_scores(profiles: list[dict], criteria: list) -> list[int]:
+    """
+    Score a block of profiles with a single LLM call.
+    Profiles the answer did not score are re-scored on their own with calculate_score.
+    """
+    if not profiles:
         return []
 
-    batch_size = 5  # Process 5 profiles at a time 
-    all_results = []
-    
-    # Create batches
-    batches = [profile_snippets[i:i + batch_size] for i in range(0, len(profile_snippets), batch_size)]
-    
-    logger.info(f"Processing {len(profile_snippets)} profiles in {len(batches)} batches.")
+    scores = await _model_batch_scores(batch_score_chain, core_model_name, profiles, criteria)
+    retry_indexes = [idx for idx, score in enumerate(scores) if score is None]
+    if retry_indexes:
+        logger.info(f"Batch scoring: re-scoring {len(retry_indexes)}/{len(profiles)} profiles individually.")
+        retried = await asyncio.gather(*[calculate_score(profiles[idx], criteria) for idx in retry_indexes])
+        for idx, score in zip(retry_indexes, retried):
+            scores[idx] = score
+
+    return scores
 
-    async def process_batch(batch, batch_index):
-        """Helper to process a single batch"""
+def _needs_escalation(score: int | None) -> bool:
+    return score is None or CASCADE_ESCALATE_MIN <= score <= CASCADE_ESCALATE_MAX
+
+async def cascade_scores(profiles: list[dict], criteria: list) -> list[int]:
+    """
+    Small-model-first scoring. The fast model scores every profile, and only the
+    ones it was unsure about (a score inside CASCADE_ESCALATE_MIN..MAX) or whose
+    answer could not be parsed are re-scored by the core model.
+    """
+    if not profiles:
+        return []
+
+    if len(profiles) == 1:
+        try:
+            scores = [await _model_score(fast_score_chain, fast_model_name, profiles[0], criteria)]
+        except Exception as e:
+            logger.error(f"Fast scoring failed: {e}")
+            scores = [None]
+    else:
+        scores = await _model_batch_scores(fast_batch_score_chain, fast_model_name, profiles, criteria)
+
+    escalate = [idx for idx, score in enumerate(scores) if _needs_escalation(score)]
+    unparseable = sum(1 for score in scores if score is None)
+    _count_cascade(len(profiles), len(escalate), unparseable)
+    if escalate:
+        logger.info(f"Cascade scoring: escalating {len(escalate)}/{len(profiles)} profiles to {core_model_name}.")
+        escalated_profiles = [profiles[idx] for idx in escalate]
+        if len(escalated_profiles) == 1:
+            rescored = [await calculate_score(escalated_profiles[0], criteria)]
+        else:
+            rescored = await calculate_batch_scores(escalated_profiles, criteria)
+        for idx, score in zip(escalate, rescored):
+            scores[idx] = score
+
+    return scores
+
+def token_batches(items: list, budget: int, overhead: int = 0, per_item_output: int = 0) -> list[list]:
+    """
+    Packs items in order into batches whose estimated request size
+    (overhead + item tokens + expected output) stays within `budget`.
+    An item that is too big on its own still gets a batch of its own.
+    """
+    batches = []
+    current = []
+    used = overhead
+    for item in items:
+        cost = estimate_tokens(item) + per_item_output
+        if current and used + cost > budget:
+            batches.append(current)
+            current = []
+            used = overhead
+        current.append(item)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+def _is_rate_limited(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or "rate limit" in str(error).lower() or "429" in str(error)
+
+async def _discover_batch(batch: list[dict], label: str, semaphore: asyncio.Semaphore, stats: list) -> list[dict]:
+    """
+    Runs one role extraction call, retrying 429s with exponential backoff.
+    A batch that still fails is split in half and each half is retried, so only
+    a single snippet that keeps failing is ever dropped.
+    """
+    error = None
+    for attempt in range(DISCOVERY_MAX_RETRIES + 1):
+        started = time.perf_counter()
         try:
-            role_chain = role_extraction_prompt | core_model | JsonOutputParser()
-            result = await role_chain.ainvoke({"profile_snippet": batch})
-            
-            # Ensure result is a list
-            if isinstance(result, list):
-                return result
-            elif isinstance(result, dict):
-                return [result]
-            else:
-                logger.warning(f"Batch {batch_index}: Unexpected return type from AI.")
-                return []
-                
+            estimated = DISCOVERY_PROMPT_TOKENS + estimate_tokens(batch) + DISCOVERY_OUTPUT_TOKENS_PER_PROFILE * len(batch)
+            async with semaphore:
+                message, grant = await _invoke(role_chain, {"profile_snippet": batch}, estimated, grant_tokens=True)
+            usage = getattr(message, "usage_metadata", None) or {}
+            grant.record(usage.get("total_tokens"))
+            result = JsonOutputParser().parse(message.content)
+            if isinstance(result, dict):
+                result = [result]
+            if not isinstance(result, list):
+                raise LLMError("Unexpected return type from AI.")
+
+            batch_stats = {
+                "batch": label,
+                "profiles": len(batch),
+                "attempts": attempt + 1,
+                "latency_seconds": round(time.perf_counter() - started, 3),
+                "input_tokens": usage.get("input_tokens", DISCOVERY_PROMPT_TOKENS + estimate_tokens(batch)),
+                "output_tokens": usage.get("output_tokens", estimate_tokens(message.content)),
+            }
+            stats.append(batch_stats)
+            logger.debug(f"Batch {label}: {len(batch)} profiles in {batch_stats['latency_seconds']}s, "
+                         f"{batch_stats['input_tokens']} input / {batch_stats['output_tokens']} output tokens.")
+            return result
         except Exception as e:
-            logger.error(f"Error processing batch {batch_index}: {e}")
-            return [] # Return empty list on failure so other batches survive
+            error = e
+            if not _is_rate_limited(e) or attempt == DISCOVERY_MAX_RETRIES:
+                break
+            delay = DISCOVERY_BACKOFF_SECONDS * 2 ** attempt
+            logger.warning(f"Batch {label}: rate limited, retrying in {delay}s (attempt {attempt + 2}/{DISCOVERY_MAX_RETRIES + 1}).")
+            await asyncio.sleep(delay)
+
+    if len(batch) == 1:
+        logger.error(f"Batch {label}: dropping snippet after failure: {error}")
+        stats.append({"batch": label, "profiles": 1, "failed": True, "error": str(error)})
+        return []
+
+    logger.warning(f"Batch {label} failed ({error}). Splitting {len(batch)} snippets and retrying.")
+    middle = len(batch) // 2
+    halves = await asyncio.gather(_discover_batch(batch[:middle], f"{label}a", semaphore, stats),
+                                  _discover_batch(batch[middle:], f"{label}b", semaphore, stats))
+    return halves[0] + halves[1]
 
-    # Run all batches concurrently
-    tasks = [process_batch(batch, idx) for idx, batch in enumerate(batches)]
-    batch_results = await asyncio.gather(*tasks)
+async def profile_discovery_with_stats(profile_snippets: list[dict]) -> tuple[list[dict], dict]:
+    """
+    Extract roles from profile snippets.
+    Snippets are packed into batches by estimated token size (DISCOVERY_TOKEN_BUDGET per request)
+    and at most DISCOVERY_CONCURRENCY requests run at once.
+    Returns (profiles, stats) where stats holds per-batch latency and token counts.
+    """
+    if not profile_snippets:
+        return [], {"batches": [], "input_tokens": 0, "output_tokens": 0, "failed_profiles": 0, "elapsed_seconds": 0.0}
 
-    # Flatten the list of lists
-    for batch_result in batch_results:
-        all_results.extend(batch_result)
+    started = time.perf_counter()
+    batches = token_batches(profile_snippets, DISCOVERY_TOKEN_BUDGET, DISCOVERY_PROMPT_TOKENS, DISCOVERY_OUTPUT_TOKENS_PER_PROFILE)
+    logger.info(f"Processing {len(profile_snippets)} profiles in {len(batches)} batches.")
 
-    return all_results
\ No newline at end of file
+    semaphore = asyncio.Semaphore(max(1, DISCOVERY_CONCURRENCY))
+    batch_stats = []
+    batch_results = await asyncio.gather(*[_discover_batch(batch, str(idx), semaphore, batch_stats) for idx, batch in enumerate(batches)])
+
+    all_results = [profile for batch_result in batch_results for profile in batch_result]
+    stats = {
+        "batches": batch_stats,
+        "input_tokens": sum(b.get("input_tokens", 0) for b in batch_stats),
+        "output_tokens": sum(b.get("output_tokens", 0) for b in batch_stats),
+        "failed_profiles": sum(b["profiles"] for b in batch_stats if b.get("failed")),
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"Profile discovery: {len(all_results)} profiles, {stats['input_tokens']} input / {stats['output_tokens']} output tokens, "
+                f"{stats['failed_profiles']} snippets dropped in {stats['elapsed_seconds']}s.")
+    return all_results, stats
+
+async def profile_discovery(profile_snippets: list[dict]) -> list[dict]:
+    """Extract roles from profile snippets, see profile_discovery_with_stats."""
+    results, _ = await profile_discovery_with_stats(profile_snippets)
+    return results
\ No newline at end of file
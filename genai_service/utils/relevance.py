@@ -0,0 +1,116 @@
+import logging
+import re
+from typing import List, Dict, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+ROLE_WEIGHT = 2  # the current role is repeated so it counts more than the summary
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# Exact values apify_lead_presentation and the prompts fill in for missing fields
+PLACEHOLDER_VALUES = frozenset({
+    "company unavailable", "current role unavailable", "position unavailable", "city unavailable",
+    "country unavailable", "linkedin url unavailable", "no summary available", "not available",
+})
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+def without_placeholders(value) -> str:
+    """
+    Text of a field with placeholder values removed. Only whole values match, or whole
+    "|" separated parts as in "Position Unavailable | Acme", so real text is never dropped.
+    """
+    if not value:
+        return ""
+    text = str(value)
+    if "|" not in text:
+        return "" if " ".join(text.split()).lower() in PLACEHOLDER_VALUES else text
+    parts = (part.strip() for part in text.split("|"))
+    return " | ".join(part for part in parts if part and " ".join(part.split()).lower() not in PLACEHOLDER_VALUES)
+
+
+def _field_text(value) -> str:
+    if isinstance(value, list):
+        parts = []
+        for item in value:
+            if isinstance(item, dict):
+                parts.extend(str(v) for v in item.values() if v)
+            elif item:
+                parts.append(str(item))
+        return " ".join(parts)
+    return without_placeholders(value)
+
+
+def profile_text(profile: Dict) -> str:
+    """Text the local scorer looks at: role, company, education and summary, placeholders dropped."""
+    role = _field_text(profile.get("current_role"))
+    return " ".join([
+        " ".join([role] * ROLE_WEIGHT),
+        _field_text(profile.get("company")),
+        _field_text(profile.get("education")),
+        _field_text(profile.get("summary_profile")),
+    ])
+
+
+def _query_terms(keywords) -> List[str]:
+    text = " ".join(str(k) for k in keywords) if isinstance(keywords, (list, tuple)) else str(keywords)
+    return list(dict.fromkeys(tokenize(text)))
+
+
+def bm25_matrix(profiles: List[Dict], keywords) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    BM25 relevance of every profile against the keywords, computed for the whole batch at once.
+    Returns (one raw score per profile, idf per query term).
+    """
+    query = _query_terms(keywords)
+    if not profiles or not query:
+        return np.zeros(len(profiles)), np.zeros(len(query))
+
+    term_index = {term: col for col, term in enumerate(query)}
+    tf = np.zeros((len(profiles), len(query)))
+    doc_lengths = np.zeros(len(profiles))
+    for row, profile in enumerate(profiles):
+        tokens = tokenize(profile_text(profile))
+        doc_lengths[row] = len(tokens)
+        for token in tokens:
+            col = term_index.get(token)
+            if col is not None:
+                tf[row, col] += 1
+
+    doc_freq = (tf > 0).sum(axis=0)
+    idf = np.log(1 + (len(profiles) - doc_freq + 0.5) / (doc_freq + 0.5))
+    avg_length = doc_lengths.mean() or 1.0
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths / avg_length)
+    return (idf * tf * (BM25_K1 + 1) / (tf + norm[:, None])).sum(axis=1), idf
+
+
+def local_scores(profiles: List[Dict], keywords) -> List[int]:
+    """
+    Scores profiles on the same 1-10 scale as calculate_score without any LLM call.
+    A profile that contains every keyword once at average length lands on 10.
+    """
+    if not profiles:
+        return []
+
+    raw, idf = bm25_matrix(profiles, keywords)
+    # tf=1 at average length contributes exactly idf per term, so sum(idf) is a full match
+    ideal = idf.sum()
+    if ideal <= 0:
+        return [1] * len(profiles)
+    normalized = np.clip(raw / ideal, 0, 1)
+    return [int(score) for score in np.rint(1 + 9 * normalized)]
+
+
+def top_k_indexes(scores: List[int], k: int) -> List[int]:
+    """Indexes of the k best scores, ties keep input order, returned in input order."""
+    if k <= 0:
+        return []
+    ranked = np.argsort(-np.asarray(scores), kind="stable")[:k]
+    return sorted(int(idx) for idx in ranked)
@@ -0,0 +1,66 @@
+import os
+from typing import Optional
+
+from utils.relevance import without_placeholders
+
+DEFAULT_LEAD_FIELD_MAX_CHARS = 200
+LEAD_FIELD_MAX_CHARS = int(os.getenv("LEAD_FIELD_MAX_CHARS", DEFAULT_LEAD_FIELD_MAX_CHARS))
+
+
+def _clean(value) -> str:
+    """Text of one field, empty for missing values and placeholders like "City unavailable"."""
+    if value is None:
+        return ""
+    return " ".join(without_placeholders(value).split())
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0] or text[:max_chars]
+    return cut.rstrip(" ,.;|-") + "..."
+
+
+def _education(value) -> str:
+    if isinstance(value, list):
+        schools = []
+        for item in value:
+            if isinstance(item, dict):
+                school = _clean(item.get("school"))
+                degree = _clean(item.get("degree"))
+                if school:
+                    schools.append(f"{school} ({degree})" if degree else school)
+            elif _clean(item):
+                schools.append(_clean(item))
+        return "; ".join(schools)
+    return _clean(value)
+
+
+def serialize_lead(profile: dict, include_url: bool = False, max_chars: Optional[int] = None) -> str:
+    """
+    Compact, fixed-order text form of a lead for LLM prompts.
+    Empty and placeholder values are dropped and every field is cut to `max_chars`.
+    The URL is only included when the answer has to be matched back to the lead.
+    """
+    max_chars = max_chars or LEAD_FIELD_MAX_CHARS
+    role = _clean(profile.get("title")) or _clean(profile.get("current_role"))
+    company = _clean(profile.get("company"))
+    location = ", ".join(part for part in (_clean(profile.get("city")), _clean(profile.get("country"))) if part)
+
+    fields = [
+        ("Name", _clean(profile.get("name"))),
+        ("Role", role),
+        # current_role is usually "<title> | <company>", don't repeat the company
+        ("Company", company if company.lower() not in role.lower() else ""),
+        ("Location", location),
+        ("Education", _education(profile.get("education"))),
+        ("Summary", _clean(profile.get("summary_profile"))),
+    ]
+    if include_url:
+        fields.append(("URL", _clean(profile.get("linkedin_url"))))
+    return " | ".join(f"{label}: {_truncate(value, max_chars)}" for label, value in fields if value)
+
+
+def serialize_leads(profiles: list) -> str:
+    """One serialized lead per line, URLs included so batch answers can be matched back."""
+    return "\n".join(f"- {serialize_lead(profile, include_url=True)}" for profile in profiles)
@@ -1,120 +1,194 @@
-from ..models.schemas import SerperSearchResult
-from ..utils.llm_client import profile_discovery
+from models.schemas import SerperSearchResult
+from utils.llm_client import profile_discovery_with_stats
 from dotenv import load_dotenv
-import http.client
+from typing import Optional
+import asyncio
+import httpx
 import json
 import logging
 import os
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
 
 load_dotenv()
 
+SERPER_URL = "https://google.serper.dev/search"
+DEFAULT_SERPER_TIMEOUT = 10
+DEFAULT_SERPER_MAX_CONNECTIONS = 10
+DEFAULT_SERPER_PAGES = 3
+SERPER_TIMEOUT = float(os.getenv("SERPER_TIMEOUT", DEFAULT_SERPER_TIMEOUT))
+SERPER_MAX_CONNECTIONS = int(os.getenv("SERPER_MAX_CONNECTIONS", DEFAULT_SERPER_MAX_CONNECTIONS))
+SERPER_PAGES = int(os.getenv("SERPER_PAGES", DEFAULT_SERPER_PAGES))
+
 class SerperAPIError(Exception):
     """Custom exception for Serper API failures"""
     pass
 
-async def serper_search(keywords: str = "latest technology trends", country: str = "ke", page: int = 1) -> list[dict]:
-    # Input Validation
-    if not keywords or not keywords.strip():
-        logger.warning("Search attempted with empty keywords.")
-        return []
-
-    params = SerperSearchResult(keywords=keywords, country=country, page=page)
-    
-    def linkedin_query_builder() -> str:
-        logger.info("Building LinkedIn-specific query for Serper search.")
-        keyword_list = params.keywords.split()
-        formatted_keywords = " AND ".join([f'"{k}"' for k in keyword_list])
-        return f'site:linkedin.com/in/ {formatted_keywords} {params.country}'
-
-    try:
-        logger.info("Building combined payload query.")
+def serper_country_code(country: Optional[str]) -> Optional[str]:
+    """Serper's `gl` only takes 2-letter country codes (ke), names like Kenya have none."""
+    code = (country or "").strip().lower()
+    return code if len(code) == 2 and code.isalpha() else None
+
+def linkedin_query_builder(params: SerperSearchResult) -> str:
+    keyword_list = params.keywords.split()
+    formatted_keywords = " AND ".join([f'"{k}"' for k in keyword_list])
+    query = f'site:linkedin.com/in/ {formatted_keywords}'
+    # A country name narrows the query itself, a country code goes to `gl` instead
+    if params.country and params.country.strip() and not serper_country_code(params.country):
+        query += f" {params.country.strip()}"
+    return query
+
+def dedupe_by_link(results: list[dict]) -> list[dict]:
+    """Keeps the first organic result for every link."""
+    seen = set()
+    unique = []
+    for result in results:
+        link = (result.get("link") or "").strip().rstrip("/")
+        if link and link not in seen:
+            seen.add(link)
+            unique.append(result)
+    return unique
+
+
+class SerperClient():
+    """
+    Async Serper client on one pooled httpx.AsyncClient.
+    `transport` replaces the network, e.g. an httpx.MockTransport in tests.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, transport: Optional[httpx.AsyncBaseTransport] = None,
+                 timeout: Optional[float] = None, max_connections: Optional[int] = None):
+        self.api_key = api_key
+        self.transport = transport
+        self.timeout = timeout or SERPER_TIMEOUT
+        self.max_connections = max_connections or SERPER_MAX_CONNECTIONS
+        self._client = None
+        self.stats = {"discoveries": 0, "batches": 0, "input_tokens": 0, "output_tokens": 0, "failed_profiles": 0}
+        self.last_discovery = None  # per-batch latency and tokens of the latest profile discovery
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                transport=self.transport,
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def search_page(self, keywords: str, country: Optional[str] = None, page: int = 1) -> list[dict]:
+        """Organic Google results for one page of the LinkedIn query."""
+        params = SerperSearchResult(keywords=keywords, country=country, page=page)
         query = {
-                "q": linkedin_query_builder(), 
-                "gl": params.country,
-                "page": params.page
-            } 
-        logger.info("Combined payload query built successfully.")
-    except Exception as e:
-        logger.error("Error building combined payload query: %s", e)
-        raise Exception(f"Failed to build combined payload query: {e}")
-
-    conn = None
-    try:
-        logger.debug("Creating connection object for google.serper.dev.")
-        conn = http.client.HTTPSConnection("google.serper.dev", timeout=10)
-        
-        logger.info("Getting Serper API key from environment variables.")
-        SERPER_API_KEY = os.getenv("SERPER_API_KEY")
-
-        if not SERPER_API_KEY:
-            raise ValueError("SERPER_API_KEY environment variable is not set")
-        
-        logger.info("Preparing Serper search payload.")
-        payload = json.dumps(query)
-        
-        logger.info("Executing Serper search request")
-        headers = {
-            'X-API-KEY': SERPER_API_KEY,
-            'Content-Type': 'application/json'
+            "q": linkedin_query_builder(params),
+            "page": params.page
         }
-        conn.request("POST", "/search", payload, headers)
-        res = conn.getresponse()
-        raw_data = res.read().decode("utf-8")
+        country_code = serper_country_code(params.country)
+        if country_code:
+            query["gl"] = country_code
+
+        api_key = self.api_key or os.getenv("SERPER_API_KEY")
+        if not api_key:
+            raise ValueError("SERPER_API_KEY environment variable is not set")
+
+        try:
+            res = await self.client.post(SERPER_URL, json=query, headers={"X-API-KEY": api_key})
+        except httpx.TransportError as e:
+            logger.error(f"Connection error: {e}")
+            raise SerperAPIError(f"Cannot connect to Serper API: {e}")
 
         # Specific HTTP Error Handling
-        if res.status == 401:
+        if res.status_code == 401:
             raise SerperAPIError("Unauthorized: Check your Serper API Key.")
-        if res.status == 429:
+        if res.status_code == 429:
             raise SerperAPIError("Rate Limit Exceeded: You are making too many requests to Serper.")
-        if res.status >= 500:
+        if res.status_code >= 500:
             raise SerperAPIError("Serper Server Error: The search engine is down.")
-        if res.status >= 400:
-            logger.error("Serper API error %d: %s", res.status, raw_data)
-            raise SerperAPIError(f"Serper API returned {res.status}: {raw_data}")
+        if res.status_code >= 400:
+            logger.error("Serper API error %d: %s", res.status_code, res.text)
+            raise SerperAPIError(f"Serper API returned {res.status_code}: {res.text}")
 
-        logger.info("Serper search request executed successfully.")
-        
         try:
-            json_data = json.loads(raw_data)
+            return res.json().get("organic", [])
         except json.JSONDecodeError:
             raise SerperAPIError("Invalid JSON received from Serper API.")
 
-        warm_data = json_data.get("organic", [])
-        
+    async def search_pages(self, keywords: str, country: Optional[str] = None, pages: Optional[int] = None, start_page: int = 1) -> list[dict]:
+        """
+        Fetches `pages` consecutive result pages at once and merges them, deduplicated by link.
+        Failed pages are skipped as long as at least one page came back.
+        """
+        pages = max(1, pages or SERPER_PAGES)
+        numbers = range(start_page, start_page + pages)
+        responses = await asyncio.gather(*[self.search_page(keywords, country, n) for n in numbers], return_exceptions=True)
+
+        organic = []
+        failures = []
+        for number, response in zip(numbers, responses):
+            if isinstance(response, BaseException):
+                logger.warning(f"Serper page {number} failed: {response}")
+                failures.append(response)
+            else:
+                organic.extend(response)
+        if failures and len(failures) == pages:
+            raise failures[0] if isinstance(failures[0], (SerperAPIError, ValueError)) else SerperAPIError(str(failures[0]))
+
+        unique = dedupe_by_link(organic)
+        logger.info(f"Serper returned {len(unique)} unique results from {pages - len(failures)}/{pages} pages.")
+        return unique
+
+    async def discover(self, keywords: str, country: Optional[str] = None, pages: Optional[int] = None, start_page: int = 1) -> list[dict]:
+        """Multi-page search fed into profile discovery, whose batch stats are kept for get_stats."""
+        if not keywords or not keywords.strip():
+            logger.warning("Search attempted with empty keywords.")
+            return []
+
+        warm_data = await self.search_pages(keywords, country, pages, start_page)
         if not warm_data:
             logger.warning("Serper returned 0 results.")
             return []
 
         logger.info("Generating roles and responsibilities for retrieved profiles.")
         try:
-            discovered_roles = await profile_discovery(profile_snippets=warm_data)
+            discovered_roles, stats = await profile_discovery_with_stats(profile_snippets=warm_data)
         except Exception as e:
             logger.error(f"Profile discovery failed: {e}")
             raise SerperAPIError(f"Failed to process profiles: {e}")
+        self._record(stats)
 
         logger.info("Successfully discovered roles and responsibilities.")
-
         return discovered_roles
 
-    except (OSError, TimeoutError) as e:
-        logger.error(f"Connection error: {e}")
-        raise SerperAPIError(f"Cannot connect to Serper API: {e}")
-    except SerperAPIError as e:
-        logger.error(f"Serper API Failure: {e}")
-        raise
-    except Exception as e:
-        logger.error("Error executing Serper search request: %s", e)
-        raise SerperAPIError(f"Failed to execute Serper search request: {e}") from e
-    finally:
-        if conn:
-            conn.close()
+
+    def _record(self, discovery: dict):
+        self.stats["discoveries"] += 1
+        self.stats["batches"] += len(discovery["batches"])
+        for key in ("input_tokens", "output_tokens", "failed_profiles"):
+            self.stats[key] += discovery[key]
+        self.last_discovery = discovery
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "last_discovery": self.last_discovery}
+
+
+serper_client = SerperClient()
+
+async def serper_search(keywords: str = "latest technology trends", country: Optional[str] = None, page: int = 1) -> list[dict]:
+    """Discovered profiles for a single result page."""
+    return await serper_client.discover(keywords, country, pages=1, start_page=page)
+
+async def serper_search_pages(keywords: str, country: Optional[str] = None, pages: Optional[int] = None) -> list[dict]:
+    """Discovered profiles for result pages 1..pages, fetched concurrently."""
+    return await serper_client.discover(keywords, country, pages=pages)
 
 if __name__ == "__main__":
-    import asyncio
-    print(asyncio.run(serper_search(keywords="Jkuat Mechanical Engineering", country="ke", page=2)))
\ No newline at end of file
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    print(asyncio.run(serper_search(keywords="Jkuat Mechanical Engineering", country="ke", page=2)))
@@ -0,0 +1,26 @@
+from urllib.parse import urlsplit, unquote
+import re
+
+LINKEDIN_HOST_PATTERN = re.compile(r"^([a-z0-9-]+\.)?linkedin\.com$", re.IGNORECASE)
+
+
+def normalize_linkedin_url(url: str) -> str:
+    """
+    Canonical form of a LinkedIn URL so variants of one profile share a key.
+    Drops query strings/fragments (tracking params), trailing slashes, locale or
+    mobile subdomains (ke., www., m.) and sub-pages below /in/<slug>.
+    Non-LinkedIn URLs are only trimmed.
+    """
+    if not url or not isinstance(url, str):
+        return ""
+
+    cleaned = url.strip()
+    parts = urlsplit(cleaned if "://" in cleaned else f"https://{cleaned}")
+    host = (parts.hostname or "").lower()
+    if not LINKEDIN_HOST_PATTERN.match(host):
+        return cleaned.rstrip("/")
+
+    segments = [s for s in unquote(parts.path).lower().split("/") if s]
+    if len(segments) >= 2 and segments[0] in ("in", "pub", "company"):
+        segments = segments[:2]
+    return "https://www.linkedin.com/" + "/".join(segments)